@@ -5,8 +5,12 @@ from rdtools.normalization import energy_from_power
 from rdtools.normalization import interpolate
 from rdtools.normalization import normalize_with_expected_power
 from rdtools.degradation import degradation_ols
+from rdtools.degradation import degradation_ols_multi
 from rdtools.degradation import degradation_classical_decomposition
 from rdtools.degradation import degradation_year_on_year
+from rdtools.degradation import degradation_year_on_year_multi
+from rdtools.degradation import degradation_year_on_year_rolling
+from rdtools.degradation import IncrementalYearOnYear
 from rdtools.aggregation import aggregation_insol
 from rdtools.clearsky_temperature import get_clearsky_tamb
 from rdtools.filtering import csi_filter
@@ -0,0 +1,44 @@
+'''Rank statistics shared by the degradation and soiling modules.'''
+
+import numpy as np
+
+
+def count_non_increasing_pairs(values):
+    '''
+    Number of pairs ``i < j`` with ``values[j] <= values[i]``, by bottom-up
+    merge sort.
+
+    At each level, the pairs between every two adjacent sorted blocks are
+    counted with a single binary search of the right block elements in the
+    left blocks, in O(n log n) per level and O(n log^2 n) overall.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Non-negative integer values, e.g. ranks.
+
+    Returns
+    -------
+    int
+    '''
+    n = len(values)
+    scale = np.int64(values.max()) + 1 if n else 1
+    position = np.arange(n)
+    values = values.astype(np.int64)
+    count = 0
+    width = 1
+    while width < n:
+        pair = position // (2 * width)
+        is_right = (position // width) % 2 == 1
+        keys = pair * scale + values
+        # each block is sorted, so the left blocks are sorted by key
+        left_keys = keys[~is_right]
+        right_keys = keys[is_right]
+        right_pair = pair[is_right]
+        left_start = np.searchsorted(left_keys, right_pair * scale)
+        below = np.searchsorted(left_keys, right_keys) - left_start
+        # a right block only exists after a complete left block
+        count += np.sum(width - below)
+        values = np.sort(keys, kind='stable') - pair * scale
+        width *= 2
+    return int(count)
@@ -518,7 +518,8 @@ class TrendAnalysis():
 
         return aggregated, aggregated_insolation
 
-    def _yoy_degradation(self, energy_normalized, **kwargs):
+    def _yoy_degradation(self, energy_normalized,
+                         uncertainty_method='bootstrap', **kwargs):
         '''
         Perform year-on-year degradation analysis on insolation-weighted
         aggregated energy yield.
@@ -527,6 +528,10 @@ class TrendAnalysis():
         ----------
         energy_normalized : pandas.Series
             Time Series of insolation-weighted aggregated normalized PV energy
+        uncertainty_method : {'bootstrap', 'analytic'}, default 'bootstrap'
+            How the confidence interval and exceedance level are calculated
+            (see degradation.degradation_year_on_year() docs). 'analytic' is
+            much faster and avoids resampling.
         kwargs :
             Extra parameters passed to degradation.degradation_year_on_year()
 
@@ -542,7 +547,8 @@ class TrendAnalysis():
         '''
         self._filter_check(energy_normalized)
         yoy_rd, yoy_ci, yoy_info = degradation.degradation_year_on_year(
-            energy_normalized, **kwargs)
+            energy_normalized, uncertainty_method=uncertainty_method,
+            **kwargs)
 
         yoy_results = {
             'p50_rd': yoy_rd,
@@ -1,15 +1,25 @@
 '''Functions for calculating the degradation rate of photovoltaic systems.'''
 
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+import warnings
 import pandas as pd
 import numpy as np
 import statsmodels.api as sm
+from rdtools._ranks import count_non_increasing_pairs
 
 
-def degradation_ols(energy_normalized, confidence_level=68.2):
+# maximum number of values resampled at once for a block of systems in
+# degradation_year_on_year_multi
+_BOOTSTRAP_BLOCK_VALUES = 2**24
+
+
+def degradation_ols(energy_normalized, confidence_level=68.2,
+                    uncertainty_method='monte_carlo', return_ols_result=True):
     '''
     Estimate the trend of a timeseries using ordinary least-squares regression
-    and calculate various statistics including a Monte Carlo-derived confidence
-    interval of slope.
+    and calculate various statistics including a Monte Carlo-derived or
+    analytic confidence interval of slope.
 
     Parameters
     ----------
@@ -17,6 +27,16 @@ def degradation_ols(energy_normalized, confidence_level=68.2):
         Daily or lower frequency time series of normalized system ouput.
     confidence_level: float, default 68.2
         The size of the confidence interval to return, in percent.
+    uncertainty_method : {'monte_carlo', 'analytic'}, default 'monte_carlo'
+        How the confidence interval of the ratio of slope to intercept is
+        calculated. 'monte_carlo' takes percentiles of the ratio of 10000
+        samples of the normal distribution of the regression parameters.
+        'analytic' uses Fieller's theorem for the same distribution, which
+        is deterministic.
+    return_ols_result : bool, default True
+        If False, the regression is calculated with closed-form expressions
+        instead of fitting a statsmodels OLS model, which is much faster,
+        and ``calc_info`` does not contain 'ols_result'.
 
     Returns
     -------
@@ -39,30 +59,39 @@ def degradation_ols(energy_normalized, confidence_level=68.2):
     df['days'] = day_diffs.astype('timedelta64[s]') / (60 * 60 * 24)
     df['years'] = df.days / 365.0
 
-    # add intercept-constant to the exogeneous variable
-    df = sm.add_constant(df)
+    if return_ols_result:
+        # add intercept-constant to the exogeneous variable
+        df = sm.add_constant(df)
 
-    # perform regression
-    ols_model = sm.OLS(endog=df.energy_normalized,
-                       exog=df.loc[:, ['const', 'years']],
-                       hasconst=True, missing='drop')
+        # perform regression
+        ols_model = sm.OLS(endog=df.energy_normalized,
+                           exog=df.loc[:, ['const', 'years']],
+                           hasconst=True, missing='drop')
 
-    results = ols_model.fit()
+        results = ols_model.fit()
+        params, cov_params = results.params, results.cov_params()
+
+        # Calculate RMSE
+        rmse = np.sqrt(results.mse_resid)
+
+        # Collect standrd errors
+        stderr_b, stderr_m = results.bse
+    else:
+        params, cov_params, rmse = _ols_fit(
+            df.years.values, df.energy_normalized.values[:, np.newaxis])
+        params, cov_params, rmse = params[0], cov_params[0], rmse[0]
+        stderr_b, stderr_m = np.sqrt(np.diag(cov_params))
 
     # collect intercept and slope
-    b, m = results.params
+    b, m = params
 
     # rate of degradation in terms of percent/year
     Rd_pct = 100.0 * m / b
 
-    # Calculate RMSE
-    rmse = np.sqrt(results.mse_resid)
-
-    # Collect standrd errors
-    stderr_b, stderr_m = results.bse
-
-    # Monte Carlo for error in degradation rate
-    Rd_CI = _degradation_CI(results, confidence_level=confidence_level)
+    # Monte Carlo or analytic error in degradation rate
+    Rd_CI = _degradation_CI(params, cov_params,
+                            confidence_level=confidence_level,
+                            method=uncertainty_method)
 
     calc_info = {
         'slope': m,
@@ -70,18 +99,99 @@ def degradation_ols(energy_normalized, confidence_level=68.2):
         'rmse': rmse,
         'slope_stderr': stderr_m,
         'intercept_stderr': stderr_b,
-        'ols_result': results,
     }
+    if return_ols_result:
+        calc_info['ols_result'] = results
 
     return (Rd_pct, Rd_CI, calc_info)
 
 
+def degradation_ols_multi(energy_normalized, confidence_level=68.2,
+                          uncertainty_method='monte_carlo',
+                          return_ols_result=False):
+    '''
+    Ordinary least-squares degradation of :py:func:`degradation_ols` for
+    many systems sharing a time index.
+
+    The regressions of all systems are calculated at once with closed-form
+    expressions, ignoring the missing values of each system.
+
+    Parameters
+    ----------
+    energy_normalized : pandas.DataFrame
+        Daily or lower frequency normalized system output with one column
+        per system.
+    confidence_level : float, default 68.2
+        The size of the confidence interval to return, in percent.
+    uncertainty_method : {'monte_carlo', 'analytic'}, default 'monte_carlo'
+        How the confidence interval is calculated. See
+        :py:func:`degradation_ols`.
+    return_ols_result : bool, default False
+        If True, a statsmodels OLS model is also fitted for each system and
+        returned in ``calc_info['ols_result']``, or None for systems with
+        less than three values.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        One row per system, indexed by the columns of `energy_normalized`,
+        with the degradation rate ('rd') and its confidence interval
+        ('rd_low' and 'rd_high'), in %/year. The confidence interval is NaN
+        for systems with less than three values, and all results for systems
+        with less than two.
+    calc_info : dict
+        The 'slope', 'intercept', 'rmse', 'slope_stderr' and
+        'intercept_stderr' of :py:func:`degradation_ols` of each system, as
+        pandas.Series, and 'ols_result' if `return_ols_result` is True.
+    '''
+    index = energy_normalized.index
+    columns = energy_normalized.columns
+
+    # calculate years as x value for regression, ignoring leap years
+    day_diffs = (index - index[0])
+    days = np.asarray(day_diffs.astype('timedelta64[s]') / (60 * 60 * 24))
+    years = days / 365.0
+
+    params, cov_params, rmse = _ols_fit(years,
+                                        energy_normalized.values.astype(float))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stderr = np.sqrt(np.diagonal(cov_params, axis1=1, axis2=2))
+        rd = 100.0 * params[:, 1] / params[:, 0]
+
+    rd_ci = np.full((len(columns), 2), np.nan)
+    for k in range(len(columns)):
+        if np.all(np.isfinite(cov_params[k])):
+            rd_ci[k] = _degradation_CI(params[k], cov_params[k],
+                                       confidence_level=confidence_level,
+                                       method=uncertainty_method)
+
+    results = pd.DataFrame({'rd': rd, 'rd_low': rd_ci[:, 0],
+                            'rd_high': rd_ci[:, 1]}, index=columns)
+    calc_info = {
+        'slope': pd.Series(params[:, 1], index=columns),
+        'intercept': pd.Series(params[:, 0], index=columns),
+        'rmse': pd.Series(rmse, index=columns),
+        'slope_stderr': pd.Series(stderr[:, 1], index=columns),
+        'intercept_stderr': pd.Series(stderr[:, 0], index=columns),
+    }
+    if return_ols_result:
+        calc_info['ols_result'] = pd.Series(
+            [degradation_ols(energy_normalized[column].copy(),
+                             uncertainty_method='analytic')[2]['ols_result']
+             if valid else None
+             for column, valid in zip(columns, np.isfinite(rmse))],
+            index=columns, dtype=object)
+    return results, calc_info
+
+
 def degradation_classical_decomposition(energy_normalized,
-                                        confidence_level=68.2):
+                                        confidence_level=68.2,
+                                        uncertainty_method='monte_carlo'):
     '''
     Estimate the trend of a timeseries using a classical decomposition approach
     (moving average) and calculate various statistics, including the result of
-    a Mann-Kendall test and a Monte Carlo-derived confidence interval of slope.
+    a Mann-Kendall test and a Monte Carlo-derived or analytic confidence
+    interval of slope.
 
     Parameters
     ----------
@@ -90,6 +200,9 @@ def degradation_classical_decomposition(energy_normalized,
         Must be regular time series.
     confidence_level: float, default 68.2
         The size of the confidence interval to return, in percent.
+    uncertainty_method : {'monte_carlo', 'analytic'}, default 'monte_carlo'
+        How the confidence interval is calculated. See
+        :py:func:`degradation_ols`.
 
     Returns
     -------
@@ -126,18 +239,8 @@ def degradation_classical_decomposition(energy_normalized,
 
     # Compute yearly rolling mean to isolate trend component using
     # moving average
-    it = df.iterrows()
-    energy_ma = []
-    for i, row in it:
-        if row.years - 0.5 >= min(df.years) and \
-           row.years + 0.5 <= max(df.years):
-            roll = df[(df.years <= row.years + 0.5) &
-                      (df.years >= row.years - 0.5)]
-            energy_ma.append(roll.energy_normalized.mean())
-        else:
-            energy_ma.append(np.nan)
-
-    df['energy_ma'] = energy_ma
+    df['energy_ma'] = _centered_moving_average(
+        df.years.values, df.energy_normalized.values, 1.0)
 
     # add intercept-constant to the exogeneous variable
     df = sm.add_constant(df)
@@ -163,8 +266,10 @@ def degradation_classical_decomposition(energy_normalized,
     # Perform Mann-Kendall
     test_trend, h, p, z = _mk_test(df.energy_ma.dropna(), alpha=0.05)
 
-    # Monte Carlo for error in degradation rate
-    Rd_CI = _degradation_CI(results, confidence_level=confidence_level)
+    # Monte Carlo or analytic error in degradation rate
+    Rd_CI = _degradation_CI(results.params, results.cov_params(),
+                            confidence_level=confidence_level,
+                            method=uncertainty_method)
 
     calc_info = {
         'slope': m,
@@ -181,10 +286,13 @@ def degradation_classical_decomposition(energy_normalized,
 
 
 def degradation_year_on_year(energy_normalized, recenter=True,
-                             exceedance_prob=95, confidence_level=68.2):
+                             exceedance_prob=95, confidence_level=68.2,
+                             reps=10000, chunk_size=None, n_jobs=1, seed=None,
+                             uncertainty_method='bootstrap'):
     '''
     Estimate the trend of a timeseries using the year-on-year decomposition
-    approach and calculate a Monte Carlo-derived confidence interval of slope.
+    approach and calculate a Monte Carlo-derived or analytic confidence
+    interval of slope.
 
     Parameters
     ----------
@@ -200,6 +308,35 @@ def degradation_year_on_year(energy_normalized, recenter=True,
         in percent.
     confidence_level : float, default 68.2
         The size of the confidence interval to return, in percent.
+    reps : int, default 10000
+        Number of bootstrap samples of the median year-on-year slope.
+    chunk_size : int, default None
+        If given, the bootstrap samples are drawn and reduced in chunks of
+        ``chunk_size`` samples. Each chunk holds ``chunk_size *
+        len(YoY_values)`` resampled values and as many int64 resampling
+        indices, so peak memory is about ``2 * chunk_size *
+        len(YoY_values)`` values per worker thread. Memory is only bounded
+        if ``chunk_size`` is set: by default all ``reps`` samples are drawn
+        at once, as ``reps * len(YoY_values)`` values.
+    n_jobs : int, default 1
+        Number of worker threads calculating bootstrap chunks concurrently.
+        Has no effect unless ``chunk_size`` is set, since there is otherwise
+        a single chunk.
+    seed : None, int or numpy.random.SeedSequence, default None
+        Seed for the bootstrap. Each chunk is drawn from an independent
+        generator spawned from ``seed``, so results are reproducible for a
+        given ``seed`` and ``chunk_size``, and identical for any ``n_jobs``.
+        A SeedSequence is not modified, so reusing it gives the same
+        results. If None, the seed is drawn from the global numpy random
+        state.
+    uncertainty_method : {'bootstrap', 'analytic'}, default 'bootstrap'
+        How the confidence interval and exceedance level are calculated.
+        'bootstrap' takes percentiles of ``reps`` bootstrapped medians of the
+        year-on-year slopes. 'analytic' instead interpolates between the
+        order statistics of the slopes at the binomial probability of the
+        median lying below each of them, which is distribution-free and needs
+        no resampling. ``reps``, ``chunk_size``, ``n_jobs`` and ``seed`` are
+        ignored with 'analytic'.
 
     Returns
     -------
@@ -278,22 +415,681 @@ def degradation_year_on_year(energy_normalized, recenter=True,
 
     Rd_pct = yoy_result.median()
 
-    # bootstrap to determine 68% CI and exceedance probability
-    n1 = len(yoy_result)
-    reps = 10000
-    xb1 = np.random.choice(yoy_result, (n1, reps), replace=True)
-    mb1 = np.median(xb1, axis=0)
-
     half_ci = confidence_level / 2.0
-    Rd_CI = np.percentile(mb1, [50.0 - half_ci, 50.0 + half_ci])
-
-    P_level = np.percentile(mb1, 100.0 - exceedance_prob)
+    percentiles = [50.0 - half_ci, 50.0 + half_ci, 100.0 - exceedance_prob]
+
+    if uncertainty_method == 'bootstrap':
+        # bootstrap to determine 68% CI and exceedance probability
+        n1 = len(yoy_result)
+        if chunk_size is None and n_jobs == 1 and seed is None:
+            xb1 = np.random.choice(yoy_result, (n1, reps), replace=True)
+            mb1 = np.median(xb1, axis=0)
+        else:
+            mb1 = _bootstrap_medians(yoy_result.values, reps, chunk_size,
+                                     n_jobs, seed)
+        Rd_CI = np.percentile(mb1, percentiles[:2])
+        P_level = np.percentile(mb1, percentiles[2])
+    elif uncertainty_method == 'analytic':
+        Rd_CI, P_level = np.split(
+            _median_order_statistic_percentiles(yoy_result.values,
+                                                percentiles), [2])
+        P_level = P_level[0]
+    else:
+        raise ValueError("uncertainty_method must be 'bootstrap' or "
+                         "'analytic'")
 
     calc_info['exceedance_level'] = P_level
 
     return (Rd_pct, Rd_CI, calc_info)
 
 
+def degradation_year_on_year_multi(energy_normalized, recenter=True,
+                                   exceedance_prob=95, confidence_level=68.2,
+                                   reps=10000, chunk_size=None, n_jobs=1,
+                                   seed=None, uncertainty_method='bootstrap'):
+    '''
+    Year-on-year degradation of :py:func:`degradation_year_on_year` for
+    many systems sharing a time index.
+
+    The year-on-year pairs are found once for the shared index, and the
+    slopes of all systems are calculated as one array. Systems with the same
+    number of slopes share the bootstrap resampling. Given a ``seed``, the
+    results of a system without missing values are identical to those of
+    :py:func:`degradation_year_on_year` on its column with the same
+    parameters.
+
+    Parameters
+    ----------
+    energy_normalized : pandas.DataFrame
+        Daily or lower frequency normalized system output with one column
+        per system. Missing values give missing year-on-year slopes; unlike
+        :py:func:`degradation_year_on_year` on a series with the missing
+        values dropped, their pairs are not matched to other points within
+        the 8-day tolerance.
+    recenter : bool, default True
+        Specify whether the data of each system is internally recentered to
+        normalized yield of 1 based on the median of its first year of data.
+    exceedance_prob : float, default 95
+        The probability level to use for exceedance value calculation,
+        in percent.
+    confidence_level : float, default 68.2
+        The size of the confidence interval to return, in percent.
+    reps : int, default 10000
+        Number of bootstrap samples of the median year-on-year slope.
+    chunk_size : int, default None
+        If given, the bootstrap samples are drawn and reduced in chunks of
+        ``chunk_size`` samples. See :py:func:`degradation_year_on_year`.
+    n_jobs : int, default 1
+        Number of worker threads calculating bootstrap chunks concurrently.
+    seed : None, int or numpy.random.SeedSequence, default None
+        Seed for the bootstrap, shared by all systems. If None, it is drawn
+        from the global numpy random state.
+    uncertainty_method : {'bootstrap', 'analytic'}, default 'bootstrap'
+        How the confidence interval and exceedance level are calculated. See
+        :py:func:`degradation_year_on_year`.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        One row per system, indexed by the columns of `energy_normalized`,
+        with the median degradation rate ('p50_rd'), its confidence interval
+        ('rd_low' and 'rd_high') and the 'exceedance_level', in %/year. The
+        results are NaN for systems with less than two years of data or no
+        year-on-year pairs.
+    calc_info : dict
+
+        * `YoY_values` - pandas.DataFrame of right-labeled year on year
+          slopes of each system
+        * `renormalizing_factor` - pandas.Series of the values used to
+          recenter the data of each system
+        * `usage_of_points` - pandas.DataFrame of the number of times each
+          point is used to calculate a degradation slope, see
+          :py:func:`degradation_year_on_year`
+    '''
+    if uncertainty_method not in ('bootstrap', 'analytic'):
+        raise ValueError("uncertainty_method must be 'bootstrap' or "
+                         "'analytic'")
+
+    energy_normalized = energy_normalized.sort_index()
+    index = energy_normalized.index
+
+    # Detect sub-daily data:
+    if min(np.diff(index.values, n=1)) < np.timedelta64(23, 'h'):
+        raise ValueError('energy_normalized must not be '
+                         'more frequent than daily')
+
+    # Detect less than 2 years of data
+    if index[-1] - index[0] < pd.Timedelta('730d'):
+        raise ValueError('must provide at least two years of '
+                         'normalized energy')
+
+    energy = energy_normalized.values.astype(float)
+    has_data = ~np.isnan(energy)
+    valid_system = has_data.any(axis=0)
+    first = np.where(valid_system, has_data.argmax(axis=0), 0)
+    last = np.where(valid_system,
+                    len(index) - 1 - has_data[::-1].argmax(axis=0), 0)
+    valid_system &= (index[last] - index[first]) >= pd.Timedelta('730d')
+
+    # Auto center on the first year of data of each system
+    if recenter:
+        start = index.values[first]
+        first_year_end = start + np.timedelta64(364, 'D')
+        # only the rows up to the end of the latest first year are needed
+        rows = np.searchsorted(index.values, first_year_end.max(), side='right')
+        times = index.values[:rows, np.newaxis]
+        in_first_year = (times >= start) & (times <= first_year_end)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            renorm = np.nanmedian(
+                np.where(in_first_year, energy[:rows], np.nan), axis=0)
+    else:
+        renorm = np.ones(energy.shape[1])
+    energy = energy / renorm
+
+    end, start, time_diff_years = _yoy_pairs(index)
+    yoy = 100.0 * (energy[end] - energy[start]) / time_diff_years[:, np.newaxis]
+    yoy[:, ~valid_system] = np.nan
+    used = ~np.isnan(yoy)
+
+    usage_of_points = np.zeros(energy.shape, dtype=int)
+    usage_of_points[end] += used
+    # as in degradation_year_on_year, a point used as the start of several
+    # slopes is counted once, for the first of them
+    start_unique, first_pair = np.unique(start, return_index=True)
+    usage_of_points[start_unique] += used[first_pair]
+
+    half_ci = confidence_level / 2.0
+    percentiles = [50.0 - half_ci, 50.0 + half_ci, 100.0 - exceedance_prob]
+
+    if uncertainty_method == 'bootstrap' and seed is None:
+        # one seed shared by all the systems
+        seed = np.random.randint(np.iinfo(np.int32).max)
+
+    results = np.full((energy.shape[1], 4), np.nan)
+    n_slopes = used.sum(axis=0)
+    for n in np.unique(n_slopes[n_slopes > 0]):
+        systems = np.flatnonzero(n_slopes == n)
+        # the slopes of each system in time order, without missing values
+        order = np.argsort(~used[:, systems], axis=0, kind='stable')
+        values = np.take_along_axis(yoy[:, systems], order, axis=0)[:n]
+        results[systems, 0] = np.median(values, axis=0)
+        if uncertainty_method == 'bootstrap':
+            # bound the size of the resampled arrays of a block of systems
+            block = max(1, _BOOTSTRAP_BLOCK_VALUES // (n * (chunk_size or reps)))
+            for i in range(0, len(systems), block):
+                # the same chunk generators for every block of systems, as
+                # _bootstrap_medians does not modify seed
+                medians = _bootstrap_medians(values[:, i:i + block], reps,
+                                             chunk_size, n_jobs, seed)
+                results[systems[i:i + block], 1:] = np.percentile(
+                    medians, percentiles, axis=0).T
+        else:
+            results[systems, 1:] = _median_order_statistic_percentiles(
+                values, percentiles).T
+
+    columns = energy_normalized.columns
+    results = pd.DataFrame(results, index=columns,
+                           columns=['p50_rd', 'rd_low', 'rd_high',
+                                    'exceedance_level'])
+    calc_info = {
+        'YoY_values': pd.DataFrame(yoy, index=index[end], columns=columns),
+        'renormalizing_factor': pd.Series(renorm, index=columns),
+        'usage_of_points': pd.DataFrame(usage_of_points, index=index,
+                                        columns=columns),
+    }
+    return results, calc_info
+
+
+def degradation_year_on_year_rolling(energy_normalized, window=2, step='MS',
+                                     recenter=True, exceedance_prob=95,
+                                     confidence_level=68.2):
+    '''
+    Year-on-year degradation rates over sliding windows, to follow the
+    evolution of the degradation rate.
+
+    The year-on-year pairs are found once for the whole series. The slopes
+    of the pairs within each window are kept in a sorted list that is
+    updated as the window slides, and the median and confidence interval of
+    each window are read from its order statistics as with
+    ``uncertainty_method='analytic'`` of :py:func:`degradation_year_on_year`.
+    The results of a window are those of :py:func:`degradation_year_on_year`
+    on the data of the window, except that the data are recentered on the
+    first year of the whole series.
+
+    Parameters
+    ----------
+    energy_normalized : pandas.Series
+        Daily or lower frequency time series of normalized system ouput.
+    window : int, default 2
+        Length of the windows, in years. A window contains the pairs with
+        both points within it.
+    step : str, default 'MS'
+        pandas frequency string of the start of the windows. Windows start
+        from the first date of this frequency within the data, and end no
+        later than one day after its last timestamp.
+    recenter : bool, default True
+        Specify whether data is internally recentered to normalized yield
+        of 1 based on the median of the first year of the whole series.
+    exceedance_prob : float, default 95
+        The probability level to use for exceedance value calculation,
+        in percent.
+    confidence_level : float, default 68.2
+        The size of the confidence interval to return, in percent.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by the start of each window, with columns 'window_end' (the
+        exclusive end of the window), 'p50_rd' (the median degradation
+        rate), 'rd_low' and 'rd_high' (its confidence interval),
+        'exceedance_level' and 'n_pairs' (the number of year-on-year slopes
+        in the window). Rates are in %/year, and NaN for windows without
+        year-on-year slopes.
+    '''
+    energy_normalized = energy_normalized.sort_index()
+    index = energy_normalized.index
+
+    # Detect sub-daily data:
+    if min(np.diff(index.values, n=1)) < np.timedelta64(23, 'h'):
+        raise ValueError('energy_normalized must not be '
+                         'more frequent than daily')
+
+    # Auto center
+    if recenter:
+        start = index[0]
+        oneyear = start + pd.Timedelta('364d')
+        renorm = energy_normalized[start:oneyear].median()
+    else:
+        renorm = 1.0
+    energy = energy_normalized.values / renorm
+
+    end, start, time_diff_years = _yoy_pairs(index)
+    yoy = 100.0 * (energy[end] - energy[start]) / time_diff_years
+    end_times = index.values[end]
+    start_times = index.values[start]
+
+    offset = pd.DateOffset(years=window)
+    window_starts = pd.date_range(index[0], index[-1], freq=step)
+    window_starts = window_starts[window_starts + offset <=
+                                  index[-1] + pd.Timedelta('1D')]
+    window_ends = window_starts + offset
+
+    # the pairs are sorted by both their start and end times, so the pairs
+    # of each window are a contiguous range
+    lows = np.searchsorted(start_times, window_starts.values, side='left')
+    highs = np.searchsorted(end_times, window_ends.values, side='left')
+
+    half_ci = confidence_level / 2.0
+    percentiles = [50.0 - half_ci, 50.0 + half_ci, 100.0 - exceedance_prob]
+    results = np.full((len(window_starts), 5), np.nan)
+    # valid slopes of the pairs current_low to current_high in ascending
+    # order; both bounds only move forward
+    ordered = []
+    current_low = current_high = 0
+    for k, (low, high) in enumerate(zip(lows, np.maximum(highs, lows))):
+        for slope in yoy[current_low:min(low, current_high)]:
+            if not np.isnan(slope):
+                del ordered[bisect.bisect_left(ordered, slope)]
+        for slope in yoy[max(low, current_high):high]:
+            if not np.isnan(slope):
+                bisect.insort(ordered, slope)
+        current_low, current_high = low, high
+
+        n = len(ordered)
+        results[k, 4] = n
+        if n:
+            results[k, 0] = (ordered[(n - 1) // 2] + ordered[n // 2]) / 2
+            results[k, 1:4] = [_sorted_percentile(ordered, q)
+                               for q in percentiles]
+
+    results = pd.DataFrame(results, index=window_starts,
+                           columns=['p50_rd', 'rd_low', 'rd_high',
+                                    'exceedance_level', 'n_pairs'])
+    results['n_pairs'] = results['n_pairs'].astype(int)
+    results.insert(0, 'window_end', window_ends)
+    return results
+
+
+class IncrementalYearOnYear():
+    '''
+    Year-on-year degradation updated as data is appended, for repeated
+    analyses of a growing dataset.
+
+    Each appended point is paired with the point one year earlier and its
+    slope is inserted into a sorted array of the slopes, so that an update
+    costs far less than recalculating :py:func:`degradation_year_on_year`
+    over the full history. The confidence interval and exceedance level are
+    those of ``uncertainty_method='analytic'``, read from the sorted slopes.
+    After each update, the results are those of
+    :py:func:`degradation_year_on_year` on all the data appended so far with
+    ``uncertainty_method='analytic'``.
+
+    Parameters
+    ----------
+    recenter : bool, default True
+        Specify whether data is internally recentered to normalized yield
+        of 1 based on first year median. The renormalizing factor is fixed
+        once the first year of data has been appended.
+    exceedance_prob : float, default 95
+        The probability level to use for exceedance value calculation,
+        in percent.
+    confidence_level : float, default 68.2
+        The size of the confidence interval to return, in percent.
+    '''
+
+    def __init__(self, recenter=True, exceedance_prob=95,
+                 confidence_level=68.2):
+        self.recenter = recenter
+        self.exceedance_prob = exceedance_prob
+        self.confidence_level = confidence_level
+
+        self.renormalizing_factor = None if recenter else 1.0
+        self._n = 0  # number of points appended
+        self._n_sorted = 0  # number of valid slopes
+        self._times = np.empty(0, dtype=np.int64)  # nanoseconds of each point
+        self._shifted = np.empty(0, dtype=np.int64)  # times + one year
+        self._energy = np.empty(0)
+        self._yoy = np.empty(0)  # right-labeled slope of each point, or NaN
+        self._usage = np.empty(0, dtype=np.int64)
+        self._start_counted = np.empty(0, dtype=bool)  # usage as start counted
+        self._sorted_yoy = np.empty(0)  # valid slopes in ascending order
+
+    def _reserve(self, size):
+        '''Grow the buffers to hold at least ``size`` points.'''
+        capacity = len(self._times)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        for name in ['_times', '_shifted', '_energy', '_yoy', '_usage',
+                     '_start_counted', '_sorted_yoy']:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def update(self, energy_normalized):
+        '''
+        Append the data of the next points and return the updated results.
+
+        Parameters
+        ----------
+        energy_normalized : pandas.Series
+            Daily or lower frequency normalized system output, later than
+            the data already appended. Missing values are allowed.
+
+        Returns
+        -------
+        Rd_pct : float
+            Estimated degradation relative to the year 0 median system
+            capacity [%/year]
+        confidence_interval : numpy.array
+            confidence interval (size specified by ``confidence_level``) of
+            degradation rate estimate
+
+        The results are NaN until at least two years of data and a
+        year-on-year pair have been appended. The other results of
+        :py:func:`degradation_year_on_year` are available from
+        :py:attr:`calc_info`.
+        '''
+        energy_normalized = energy_normalized.sort_index()
+        index = energy_normalized.index
+        times = index.values.astype('datetime64[ns]').astype(np.int64)
+        shifted = (index + pd.DateOffset(years=1)).values.astype(
+            'datetime64[ns]').astype(np.int64)
+
+        # Detect sub-daily data, including the step from the previous data:
+        steps = np.diff(np.concatenate([self._times[max(self._n - 1, 0):self._n],
+                                        times]))
+        if len(steps) and min(steps) < _nanoseconds(np.timedelta64(23, 'h')):
+            raise ValueError('energy_normalized must not be more frequent than '
+                             'daily and must follow the data already appended')
+
+        hour = _nanoseconds(np.timedelta64(1, 'h'))
+        tolerance = _nanoseconds(np.timedelta64(8, 'D'))
+        first_year = _nanoseconds(np.timedelta64(364, 'D'))
+
+        self._reserve(self._n + len(times))
+        for t, t_shifted, energy in zip(times, shifted,
+                                        energy_normalized.values.astype(float)):
+            n = self._n
+            if self.renormalizing_factor is None and n and \
+                    t > self._times[0] + first_year:
+                # all the first year of data has been appended
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', category=RuntimeWarning)
+                    self.renormalizing_factor = np.nanmedian(self._energy[:n])
+
+            # the latest point at least one year earlier, within tolerance
+            start = np.searchsorted(self._shifted[:n], t, side='right') - 1
+            yoy = np.nan
+            if start >= 0 and t - self._shifted[start] <= tolerance:
+                time_diff_years = ((t - self._times[start]) // hour) / 8760.0
+                renorm = self.renormalizing_factor
+                yoy = 100.0 * (energy / renorm - self._energy[start] / renorm) \
+                    / time_diff_years
+                # a point used as start of several slopes counts once, for
+                # the first of them
+                if not self._start_counted[start]:
+                    self._start_counted[start] = True
+                    self._usage[start] += int(not np.isnan(yoy))
+                if not np.isnan(yoy):
+                    m = self._n_sorted
+                    i = np.searchsorted(self._sorted_yoy[:m], yoy, side='right')
+                    self._sorted_yoy[i + 1:m + 1] = self._sorted_yoy[i:m]
+                    self._sorted_yoy[i] = yoy
+                    self._n_sorted = m + 1
+
+            self._times[n] = t
+            self._shifted[n] = t_shifted
+            self._energy[n] = energy
+            self._yoy[n] = yoy
+            self._usage[n] = int(not np.isnan(yoy))
+            self._start_counted[n] = False
+            self._n = n + 1
+
+        Rd_pct, values = self._results()
+        return (Rd_pct, values[:2])
+
+    @property
+    def calc_info(self):
+        '''
+        dict : ``calc_info`` of :py:func:`degradation_year_on_year` for the
+        data appended so far. It is built on request, from the whole history.
+        '''
+        n = self._n
+        index = pd.DatetimeIndex(self._times[:n].astype('datetime64[ns]'),
+                                 name='dt')
+        yoy = pd.Series(self._yoy[:n], index=index, name='yoy')
+        return {
+            'YoY_values': yoy.dropna(),
+            'renormalizing_factor': self.renormalizing_factor,
+            'usage_of_points': pd.Series(self._usage[:n], index=index,
+                                         name='usage_of_points'),
+            'exceedance_level': self._results()[1][2],
+        }
+
+    def _results(self):
+        '''Median slope and the percentiles of the CI and exceedance level.'''
+        m = self._n_sorted
+        half_ci = self.confidence_level / 2.0
+        percentiles = [50.0 - half_ci, 50.0 + half_ci,
+                       100.0 - self.exceedance_prob]
+        if not m or self._times[self._n - 1] - self._times[0] < \
+                _nanoseconds(np.timedelta64(730, 'D')):
+            return np.nan, np.full(3, np.nan)
+        ordered = self._sorted_yoy[:m]
+        Rd_pct = (ordered[(m - 1) // 2] + ordered[m // 2]) / 2
+        values = np.array([_sorted_percentile(ordered, q)
+                           for q in percentiles])
+        return Rd_pct, values
+
+
+def _nanoseconds(timedelta):
+    '''Integer nanoseconds of a numpy.timedelta64.'''
+    return timedelta.astype('timedelta64[ns]').astype(np.int64)
+
+
+def _sorted_percentile(ordered, percentile):
+    '''
+    Percentile of :py:func:`_median_order_statistic_percentiles` for
+    already sorted values, calculated from the two order statistics next
+    to it.
+
+    Parameters
+    ----------
+    ordered : list or numpy.ndarray
+        Sample values in ascending order, not containing NaN.
+    percentile : float
+        Percentile to calculate, in percent.
+
+    Returns
+    -------
+    float
+    '''
+    from scipy.stats import binom
+
+    n = len(ordered)
+    q = percentile / 100.0
+    # the first order statistic k with binomial cdf(k) >= q
+    k = int(np.clip(binom.ppf(q, n, 0.5), 0, n))
+    while k > 0 and binom.cdf(k - 1, n, 0.5) >= q:
+        k -= 1
+    while k < n and binom.cdf(k, n, 0.5) < q:
+        k += 1
+    if k == 0:
+        return ordered[0]
+    if k == n:
+        return ordered[-1]
+    cdf_low, cdf_high = binom.cdf([k - 1, k], n, 0.5)
+    return np.interp(q, [cdf_low, cdf_high], ordered[k - 1:k + 1])
+
+
+def _yoy_pairs(index):
+    '''
+    Year-on-year pairs of the points of a time index.
+
+    Each point is paired with the latest point at least one calendar year
+    earlier, within a tolerance of 8 days, as in
+    :py:func:`degradation_year_on_year`.
+
+    Parameters
+    ----------
+    index : pandas.DatetimeIndex
+        Sorted time index.
+
+    Returns
+    -------
+    end : numpy.ndarray
+        Positions of the right (later) points of the pairs.
+    start : numpy.ndarray
+        Positions of the left (earlier) points of the pairs.
+    time_diff_years : numpy.ndarray
+        Time between the points of each pair, in years of 8760 hours.
+    '''
+    dt = pd.DataFrame({'dt': index, 'position': np.arange(len(index))})
+    dt['dt_shifted'] = dt.dt + pd.DateOffset(years=1)
+    df = pd.merge_asof(dt[['dt']], dt, left_on='dt', right_on='dt_shifted',
+                       suffixes=['', '_right'],
+                       tolerance=pd.Timedelta('8D'))
+    end = np.flatnonzero(df.position.notnull().values)
+    df = df.iloc[end]
+    time_diff_years = (df.dt - df.dt_right).astype('timedelta64[h]') / 8760.0
+    return end, df.position.values.astype(int), time_diff_years.values
+
+
+def _bootstrap_medians(values, reps, chunk_size=None, n_jobs=1, seed=None):
+    '''
+    Medians of bootstrap samples of ``values``, calculated in chunks.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Values to resample. If 2-D, the rows of each column are resampled
+        with the same indices.
+    reps : int
+        Number of bootstrap samples.
+    chunk_size : int, default None
+        Number of samples per chunk. If None, a single chunk.
+    n_jobs : int, default 1
+        Number of worker threads calculating chunks concurrently.
+    seed : None, int or numpy.random.SeedSequence, default None
+        Seed from which the generator of each chunk is spawned. A
+        SeedSequence is copied before spawning, so it is not modified. If
+        None, it is drawn from the global numpy random state.
+
+    Returns
+    -------
+    numpy.ndarray
+        The ``reps`` bootstrap medians (of each column), independent of
+        ``n_jobs``.
+    '''
+    if chunk_size is None:
+        chunk_size = reps
+    chunk_reps = [chunk_size] * (reps // chunk_size)
+    if reps % chunk_size:
+        chunk_reps.append(reps % chunk_size)
+
+    if seed is None:
+        seed = np.random.randint(np.iinfo(np.int32).max)
+    if isinstance(seed, np.random.SeedSequence):
+        # spawning modifies a SeedSequence, so spawn from a copy
+        seed = np.random.SeedSequence(
+            seed.entropy, spawn_key=seed.spawn_key,
+            n_children_spawned=seed.n_children_spawned)
+    else:
+        seed = np.random.SeedSequence(seed)
+    rngs = [np.random.default_rng(s) for s in seed.spawn(len(chunk_reps))]
+
+    n = len(values)
+    # middle order statistics, both for an even number of values
+    kth = [(n - 1) // 2, n // 2]
+
+    def calc_chunk(size, rng):
+        sample = values[rng.integers(0, n, (n, size))]
+        sample.partition(kth, axis=0)
+        return sample[kth].mean(axis=0)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        return np.concatenate(list(pool.map(calc_chunk, chunk_reps, rngs)))
+
+
+def _median_order_statistic_percentiles(values, percentiles):
+    '''
+    Distribution-free percentiles of the sampling distribution of the median.
+
+    The probability that the true median lies below the k-th smallest of
+    ``n`` values is the probability of fewer than k of them lying below it,
+    i.e. the binomial ``P(B <= k - 1)`` with ``B ~ Binomial(n, 0.5)``.
+    Percentiles are linearly interpolated between the order statistics at
+    these probabilities.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Sample values, not containing NaN. If 2-D, the percentiles of each
+        column are calculated.
+    percentiles : array-like
+        Percentiles to calculate, in percent.
+
+    Returns
+    -------
+    numpy.ndarray
+        The values at ``percentiles`` (along the first axis for 2-D
+        ``values``).
+    '''
+    from scipy.stats import binom
+
+    values = np.sort(values, axis=0)
+    n = len(values)
+    cdf = binom.cdf(np.arange(n), n, 0.5)
+    if values.ndim == 1:
+        return np.interp(np.asarray(percentiles) / 100.0, cdf, values)
+    position = np.interp(np.asarray(percentiles) / 100.0, cdf, np.arange(n))
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, n - 1)
+    weight = (position - lower)[:, np.newaxis]
+    return values[lower] + weight * (values[upper] - values[lower])
+
+
+def _centered_moving_average(x, y, window):
+    '''
+    Mean of ``y`` over ``x`` values within ``window / 2`` of each ``x``.
+
+    Window sums are differences of cumulative sums, with the window edges
+    located by binary search. Points closer than ``window / 2`` to either end
+    of ``x`` get NaN.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        Sorted positions.
+    y : numpy.ndarray
+        Values to average. NaN values are excluded from the means.
+    window : float
+        Full width of the window, in units of ``x``.
+
+    Returns
+    -------
+    numpy.ndarray
+    '''
+    half = window / 2.0
+    lo = np.searchsorted(x, x - half, side='left')
+    hi = np.searchsorted(x, x + half, side='right')
+
+    valid = ~np.isnan(y)
+    # center the values to limit the rounding error of the cumulative sums
+    center = np.mean(y[valid]) if valid.any() else 0.0
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, y - center, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ma = (sums[hi] - sums[lo]) / (counts[hi] - counts[lo]) + center
+    edge = (x - half < x[0]) | (x + half > x[-1])
+    ma[edge] = np.nan
+    return ma
+
+
 def _mk_test(x, alpha=0.05):
     '''
     Mann-Kendall test of significance for trend (used in classical
@@ -320,27 +1116,26 @@ def _mk_test(x, alpha=0.05):
 
     from scipy.stats import norm
 
+    x = np.asarray(x)
     n = len(x)
 
-    # calculate S
-    s = 0
-    for k in range(n - 1):
-        for j in range(k + 1, n):
-            s += np.sign(x[j] - x[k])
-
-    # calculate the unique data
-    unique_x = np.unique(x)
+    # calculate the unique data and the number of ties of each
+    unique_x, ranks, tp = np.unique(x, return_inverse=True,
+                                    return_counts=True)
     g = len(unique_x)
 
+    # calculate S, the number of increasing minus the number of decreasing
+    # pairs, from the number of decreasing or tied pairs
+    n_pairs = n * (n - 1) // 2
+    n_tied_pairs = int(np.sum(tp * (tp - 1) // 2))
+    s = n_pairs + n_tied_pairs - 2 * count_non_increasing_pairs(ranks)
+
     # calculate the var(s)
     if n == g:
         # there is no tie
         var_s = (n * (n - 1) * (2 * n + 5)) / 18
     else:
         # there are some ties in data
-        tp = np.zeros(unique_x.shape)
-        for i in range(len(unique_x)):
-            tp[i] = sum(unique_x[i] == x)
         var_s = (n * (n - 1) * (2 * n + 5) +
                  np.sum(tp * (tp - 1) * (2 * tp + 5))) / 18
 
@@ -365,16 +1160,72 @@ def _mk_test(x, alpha=0.05):
     return trend, h, p, z
 
 
-def _degradation_CI(results, confidence_level):
+def _ols_fit(x, y):
+    '''
+    Closed-form ordinary least-squares fits of each column of ``y`` against
+    ``x``, ignoring missing values.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        1-D regressor.
+    y : numpy.ndarray
+        2-D array of dependent values, one column per fit, with NaN for
+        missing values.
+
+    Returns
+    -------
+    params : numpy.ndarray
+        Intercept and slope of each fit, shape (n_fits, 2).
+    cov_params : numpy.ndarray
+        Covariance matrix of the parameters of each fit, as
+        ``OLSResults.cov_params()``, shape (n_fits, 2, 2).
+    rmse : numpy.ndarray
+        Root mean square error of the residuals of each fit, with the
+        degrees of freedom of the residuals.
+    '''
+    valid = ~np.isnan(y)
+    x = np.where(valid, x[:, np.newaxis], 0.0)
+    y = np.where(valid, y, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = valid.sum(axis=0)
+        x_mean = x.sum(axis=0) / n
+        y_mean = y.sum(axis=0) / n
+        x_centered = np.where(valid, x - x_mean, 0.0)
+        sxx = np.sum(x_centered ** 2, axis=0)
+        slope = np.sum(x_centered * (y - y_mean), axis=0) / sxx
+        intercept = y_mean - slope * x_mean
+
+        residuals = np.where(valid, y - intercept - slope * x, 0.0)
+        mse = np.sum(residuals ** 2, axis=0) / (n - 2)
+        mse[n <= 2] = np.nan
+
+        cov_params = np.empty((y.shape[1], 2, 2))
+        cov_params[:, 0, 0] = mse * (1.0 / n + x_mean ** 2 / sxx)
+        cov_params[:, 0, 1] = cov_params[:, 1, 0] = -mse * x_mean / sxx
+        cov_params[:, 1, 1] = mse / sxx
+
+    return np.column_stack([intercept, slope]), cov_params, np.sqrt(mse)
+
+
+def _degradation_CI(params, cov_params, confidence_level,
+                    method='monte_carlo'):
     '''
-    Monte Carlo estimation of uncertainty in degradation rate from OLS results
+    Monte Carlo or analytic estimation of uncertainty in degradation rate from
+    OLS results
 
     Parameters
     ----------
-    results: OLSResults object from fitting a model of the form:
+    params: intercept and slope of a model of the form:
         results = sm.OLS(endog = df.energy_ma,
                          exog = df.loc[:,['const','years']]).fit()
+    cov_params: covariance matrix of ``params``, e.g.
+        ``results.cov_params()``
     confidence_level: the size of the confidence interval to return, in percent
+    method: 'monte_carlo' or 'analytic'. With 'analytic', the interval of
+        Fieller's theorem for the ratio of the normally distributed slope and
+        intercept is returned. It is unbounded, (-inf, inf), if the intercept
+        is not significantly different from zero at ``confidence_level``.
 
     Returns
     -------
@@ -382,10 +1233,29 @@ def _degradation_CI(results, confidence_level):
 
     '''
 
-    sampled_normal = np.random.multivariate_normal(results.params,
-                                                   results.cov_params(),
-                                                   10000)
-    dist = sampled_normal[:, 1] / sampled_normal[:, 0]
-    half_ci = confidence_level / 2.0
-    Rd_CI = np.percentile(dist, [50.0 - half_ci, 50.0 + half_ci]) * 100.0
+    if method == 'monte_carlo':
+        sampled_normal = np.random.multivariate_normal(params, cov_params,
+                                                       10000)
+        dist = sampled_normal[:, 1] / sampled_normal[:, 0]
+        half_ci = confidence_level / 2.0
+        Rd_CI = np.percentile(dist, [50.0 - half_ci, 50.0 + half_ci]) * 100.0
+    elif method == 'analytic':
+        from scipy.stats import norm
+
+        b, m = np.asarray(params)
+        (var_b, cov_bm), (_, var_m) = np.asarray(cov_params)
+        z2 = norm.ppf(0.5 + confidence_level / 200.0) ** 2
+        # the ratios r with (m - r * b)^2 <= z2 * var(m - r * b)
+        a = b ** 2 - z2 * var_b
+        half_b = m * b - z2 * cov_bm
+        c = m ** 2 - z2 * var_m
+        discriminant = half_b ** 2 - a * c
+        if a <= 0 or discriminant < 0:
+            Rd_CI = np.array([-np.inf, np.inf])
+        else:
+            root = np.sqrt(discriminant)
+            Rd_CI = np.array([half_b - root, half_b + root]) / a * 100.0
+    else:
+        raise ValueError("uncertainty_method must be 'monte_carlo' or "
+                         "'analytic'")
     return Rd_CI
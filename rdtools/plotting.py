@@ -139,7 +139,8 @@ def soiling_monte_carlo_plot(soiling_info, normalized_yield, point_alpha=0.5,
     ----------
     soiling_info : dict
         ``soiling_info`` returned by :py:meth:`.soiling.SRRAnalysis.run` or
-        :py:func:`.soiling.soiling_srr`.
+        :py:func:`.soiling.soiling_srr`, calculated with
+        ``store_profiles=True``.
     normalized_yield : pandas.Series
         PV yield data that is normalized, filtered and aggregated.
     point_alpha : float, default 0.5
@@ -168,19 +169,31 @@ def soiling_monte_carlo_plot(soiling_info, normalized_yield, point_alpha=0.5,
         'and PATCH releases) as the code matures.'
     )
 
+    stochastic_profiles = soiling_info['stochastic_soiling_profiles']
+    if stochastic_profiles is None:
+        raise ValueError("soiling_info contains no stochastic soiling "
+                         "profiles; run the SRR analysis with "
+                         "store_profiles=True")
+
     fig, ax = plt.subplots()
     renormalized = normalized_yield / soiling_info['renormalizing_factor']
     ax.plot(renormalized.index, renormalized, 'o', alpha=point_alpha,
             color=point_color)
     ax.set_ylim(ymin, ymax)
 
-    if profiles is not None:
-        to_plot = soiling_info['stochastic_soiling_profiles'][:profiles]
-    else:
-        to_plot = soiling_info['stochastic_soiling_profiles']
-    for profile in to_plot:
-        ax.plot(profile.index, profile, color=profile_color,
+    if isinstance(stochastic_profiles, pd.DataFrame):
+        # one realization per column, plotted in a single call
+        to_plot = stochastic_profiles.iloc[:, :profiles]
+        ax.plot(to_plot.index, to_plot.values, color=profile_color,
                 alpha=profile_alpha)
+    else:
+        if profiles is not None:
+            to_plot = stochastic_profiles[:profiles]
+        else:
+            to_plot = stochastic_profiles
+        for profile in to_plot:
+            ax.plot(profile.index, profile, color=profile_color,
+                    alpha=profile_alpha)
     ax.set_ylabel('Renormalized energy')
     fig.autofmt_xdate()
 
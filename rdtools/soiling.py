@@ -6,10 +6,16 @@ and default behaviors may change in future releases (including MINOR
 and PATCH releases) as the code matures.
 '''
 
+import copy
+import inspect
+import itertools
+import os
+import tempfile
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from scipy.stats.mstats import theilslopes
+from rdtools._ranks import count_non_increasing_pairs
 
 warnings.warn(
     'The soiling module is currently experimental. The API, results, '
@@ -53,18 +59,8 @@ class SRRAnalysis():
         # insolation-weighted soiling ratios in _calc_monte:
         self.monte_losses = []
 
-        if pd.infer_freq(self.pm.index) != 'D':
-            raise ValueError('Daily performance metric series must have '
-                             'daily frequency')
-
-        if pd.infer_freq(self.insolation_daily.index) != 'D':
-            raise ValueError('Daily insolation series must have '
-                             'daily frequency')
-
-        if self.precipitation_daily is not None:
-            if pd.infer_freq(self.precipitation_daily.index) != 'D':
-                raise ValueError('Precipitation series must have '
-                                 'daily frequency')
+        _check_daily_frequency(self.pm, self.insolation_daily,
+                               self.precipitation_daily)
 
     def _calc_daily_df(self, day_scale=13, clean_threshold='infer',
                        recenter=True, clean_criterion='shift', precip_threshold=0.01,
@@ -106,36 +102,47 @@ class SRRAnalysis():
             in the rolling median used for cleaning detection. A smaller value will cause more and
             smaller shifts to be classified as cleaning events.
         '''
-        if (day_scale % 2 == 0) and ('shift' in clean_criterion):
-            warnings.warn('An even value of day_scale was passed. An odd value is '
-                          'recommended, otherwise, consecutive days may be erroneously '
-                          'flagged as cleaning events. '
-                          'See https://github.com/NREL/rdtools/issues/189')
+        _warn_even_day_scale(day_scale, clean_criterion)
 
-        df = self.pm.to_frame()
-        df.columns = ['pi']
-        df_insol = self.insolation_daily.to_frame()
-        df_insol.columns = ['insol']
+        df, renorm, outage = self._calc_daily_base(day_scale, recenter)
+        self._delta = df['delta'].values
 
-        df = df.join(df_insol)
-        precip = self.precipitation_daily
-        if precip is not None:
-            df_precip = precip.to_frame()
-            df_precip.columns = ['precip']
-            df = df.join(df_precip)
-        else:
-            df['precip'] = 0
+        # Detect steps in rolling median
+        if clean_threshold == 'infer':
+            clean_threshold = _infer_clean_threshold(df.delta, outlier_factor)
 
-        # find first and last valid data point
-        start = df[~df.pi.isnull()].index[0]
-        end = df[~df.pi.isnull()].index[-1]
-        df = df[start:end]
+        df = _label_intervals(df, df.delta > clean_threshold,
+                              df['precip'] > precip_threshold,
+                              clean_criterion, outage)
+
+        self.renorm_factor = renorm
+        self.daily_df = df
+
+    def _calc_daily_base(self, day_scale=13, recenter=True):
+        '''
+        Calculates the part of the daily dataframe that does not depend on
+        the cleaning detection parameters. See :py:meth:`_calc_daily_df` for
+        the parameters.
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            Daily dataframe with the normalized performance metric
+            ('pi_norm'), its rolling median ('pi_roll_med') and the daily
+            change of the rolling median ('delta')
+        renorm : float
+            The renormalization factor of the daily performance
+        outage : pandas.Series
+            Output of :py:func:`_calc_rolling_median`
+        '''
+        df = self._join_daily()
 
         # create a day count column
         df['day'] = range(len(df))
 
         # Recenter to median of first year, as in YoY degradation
         if recenter:
+            start = df.index[0]
             oneyear = start + pd.Timedelta('364d')
             renorm = df.loc[start:oneyear, 'pi'].median()
         else:
@@ -143,64 +150,134 @@ class SRRAnalysis():
 
         df['pi_norm'] = df['pi'] / renorm
 
-        # Find the beginning and ends of outages longer than dayscale
-        bfill = df['pi_norm'].fillna(method='bfill', limit=day_scale)
-        ffill = df['pi_norm'].fillna(method='ffill', limit=day_scale)
-        out_start = (~df['pi_norm'].isnull() & bfill.shift(-1).isnull())
-        out_end = (~df['pi_norm'].isnull() & ffill.shift(1).isnull())
+        outage = _calc_rolling_median(df, day_scale)
+        return df, renorm, outage
 
-        # clean up the first and last elements
-        out_start.iloc[-1] = False
-        out_end.iloc[0] = False
+    def _join_daily(self, start=None):
+        '''
+        Joins the daily performance metric, insolation and precipitation into
+        a dataframe spanning from the first (or ``start``) to the last valid
+        performance metric value.
 
-        # Make a forward filled copy, just for use in
-        # step, slope change detection
-        df_ffill = df.fillna(method='ffill', limit=day_scale).copy()
+        Parameters
+        ----------
+        start : pandas.Timestamp, default None
+            First day of the dataframe. If None, the first day with a valid
+            performance metric.
 
-        # Calculate rolling median
-        df['pi_roll_med'] = \
-            df_ffill.pi_norm.rolling(day_scale, center=True).median()
+        Returns
+        -------
+        pandas.DataFrame
+            with columns 'pi', 'insol' and 'precip'
+        '''
+        pm = self.pm if start is None else self.pm[start:]
+        df = pm.to_frame()
+        df.columns = ['pi']
+        df_insol = self.insolation_daily.to_frame()
+        df_insol.columns = ['insol']
 
-        # Detect steps in rolling median
-        df['delta'] = df.pi_roll_med.diff()
-        if clean_threshold == 'infer':
-            deltas = abs(df.delta)
-            clean_threshold = deltas.quantile(0.75) + \
-                outlier_factor * (deltas.quantile(0.75) - deltas.quantile(0.25))
-
-        df['clean_event_detected'] = (df.delta > clean_threshold)
-        precip_event = (df['precip'] > precip_threshold)
-
-        if clean_criterion == 'precip_and_shift':
-            # Detect which cleaning events are associated with rain
-            # within a 3 day window
-            precip_event = precip_event.rolling(
-                3, center=True, min_periods=1).apply(any).astype(bool)
-            df['clean_event'] = (df['clean_event_detected'] & precip_event)
-        elif clean_criterion == 'precip_or_shift':
-            df['clean_event'] = (df['clean_event_detected'] | precip_event)
-        elif clean_criterion == 'precip':
-            df['clean_event'] = precip_event
-        elif clean_criterion == 'shift':
-            df['clean_event'] = df['clean_event_detected']
+        df = df.join(df_insol)
+        precip = self.precipitation_daily
+        if precip is not None:
+            df_precip = precip.to_frame()
+            df_precip.columns = ['precip']
+            df = df.join(df_precip)
         else:
-            raise ValueError('clean_criterion must be one of '
-                             '{"precip_and_shift", "precip_or_shift", '
-                             '"precip", "shift"}')
+            df['precip'] = 0
 
-        df['clean_event'] = df.clean_event | out_start | out_end
+        # find first and last valid data point
+        if start is None:
+            start = df[~df.pi.isnull()].index[0]
+        end = df[~df.pi.isnull()].index[-1]
+        return df[start:end]
 
-        df = df.fillna(0)
+    def _calc_interval_stats(self, daily_df, min_interval_length=7):
+        '''
+        Summarizes each soiling interval (run) of a daily_df in a single pass
+        over the run boundaries, fitting the soiling rate only for intervals
+        with enough data.
 
-        # Give an index to each soiling interval/run
-        df['run'] = df.clean_event.cumsum()
-        df.index.name = 'date'  # this gets used by name
+        Parameters
+        ----------
+        daily_df : pandas.DataFrame
+            self.daily_df or a subset of it containing complete runs
+        min_interval_length : int, default 7
+            The minimum number of days with positive performance for an
+            interval to be fit.
 
-        self.renorm_factor = renorm
-        self.daily_df = df
+        Returns
+        -------
+        pandas.DataFrame
+            One row per run, before the validity filters of
+            :py:meth:`_calc_result_df` are applied.
+        '''
+        if daily_df.empty:
+            return pd.DataFrame()
+
+        run = daily_df['run'].values
+        day = daily_df['day'].values
+        pi_norm = daily_df['pi_norm'].values
+        delta = daily_df['delta'].values
+
+        # segment boundaries of the sorted run column
+        first = np.flatnonzero(np.r_[True, run[1:] != run[:-1]])
+        last = np.append(first[1:], len(run)) - 1
+
+        # statistics over positive performance where available, otherwise
+        # over all points to populate a valid=False row
+        positive = pi_norm > 0
+        n_positive = np.add.reduceat(positive, first)
+        use_positive = n_positive > 0
+        max_neg_step = np.where(
+            use_positive,
+            np.minimum.reduceat(np.where(positive, delta, np.inf), first),
+            np.minimum.reduceat(delta, first))
+
+        n_runs = len(first)
+        run_slope = np.zeros(n_runs)
+        run_slope_low = np.zeros(n_runs)
+        run_slope_high = np.zeros(n_runs)
+        inferred_start_loss = np.zeros(n_runs)
+        inferred_end_loss = np.zeros(n_runs)
+        valid = n_positive > min_interval_length
+
+        # fit all intervals with enough data in one batch
+        fit_points = positive & np.repeat(valid, np.diff(np.append(first, len(run))))
+        fit_bounds = np.append(0, np.cumsum(n_positive[valid]))
+        slope, intercept, slope_low, slope_high = _theil_sen(
+            pi_norm[fit_points], day[fit_points], fit_bounds)
+        run_slope[valid] = slope
+        run_slope_low[valid] = slope_low
+        run_slope_high[valid] = np.fmin(0.0, slope_high)
+        inferred_start_loss[valid] = slope * day[first[valid]] + intercept
+        inferred_end_loss[valid] = slope * day[last[valid]] + intercept
+
+        for i in np.flatnonzero(~valid):
+            segment = slice(first[i], last[i] + 1)
+            points = positive[segment] if use_positive[i] else slice(None)
+            inferred_start_loss[i] = inferred_end_loss[i] = \
+                pi_norm[segment][points].mean()
+
+        results = pd.DataFrame({
+            'start': daily_df.index[first],
+            'end': daily_df.index[last],
+            'length': day[last] - day[first],
+            'run': run[first],
+            'run_slope': run_slope,
+            'run_slope_low': run_slope_low,
+            'run_slope_high': run_slope_high,
+            'max_neg_step': max_neg_step,
+            'start_loss': np.ones(n_runs, dtype=int),
+            'inferred_start_loss': inferred_start_loss,
+            'inferred_end_loss': inferred_end_loss,
+            'valid': valid,
+        })
+
+        return results
 
     def _calc_result_df(self, trim=False, max_relative_slope_error=500.0,
-                        max_negative_step=0.05, min_interval_length=7):
+                        max_negative_step=0.05, min_interval_length=7,
+                        first_run=None, interval_stats=None):
         '''
         Calculates self.result_df, a pandas dataframe summarizing the soiling
         intervals identified and self.analyzed_daily_df, a version of
@@ -221,55 +298,36 @@ class SRRAnalysis():
         min_interval_length : int, default 7
             The minimum duration for an interval to be considered
             valid.  Cannot be less than 2 (days).
+        first_run : int, default None
+            If given, only the intervals from run ``first_run`` onward are
+            summarized and the earlier ones are reused from the previous call.
+        interval_stats : pandas.DataFrame, default None
+            The interval statistics (self._interval_stats) of a previous
+            call with the same daily dataframe, ``trim`` and
+            ``min_interval_length``, to reuse instead of refitting the
+            intervals.
         '''
 
         daily_df = self.daily_df
-        result_list = []
         if trim:
             # ignore first and last interval
-            res_loop = sorted(list(set(daily_df['run'])))[1:-1]
+            runs = daily_df['run']
+            daily_df = daily_df[(runs > runs.iloc[0]) & (runs < runs.iloc[-1])]
+
+        if interval_stats is not None:
+            results = interval_stats
+        elif first_run is None:
+            results = self._calc_interval_stats(daily_df, min_interval_length)
         else:
-            res_loop = sorted(list(set(daily_df['run'])))
-
-        for r in res_loop:
-            run = daily_df[daily_df['run'] == r]
-            length = (run.day[-1] - run.day[0])
-            start_day = run.day[0]
-            end_day = run.day[-1]
-            start = run.index[0]
-            end = run.index[-1]
-            run_filtered = run[run.pi_norm > 0]
-            # use the filtered version if it contains any points
-            # otherwise use the unfiltered version to populate a
-            # valid=False row
-            if not run_filtered.empty:
-                run = run_filtered
-            result_dict = {
-                'start': start,
-                'end': end,
-                'length': length,
-                'run': r,
-                'run_slope': 0,
-                'run_slope_low': 0,
-                'run_slope_high': 0,
-                'max_neg_step': min(run.delta),
-                'start_loss': 1,
-                'inferred_start_loss': run.pi_norm.mean(),
-                'inferred_end_loss': run.pi_norm.mean(),
-                'valid': False
-            }
-            if len(run) > min_interval_length and run.pi_norm.sum() > 0:
-                fit = theilslopes(run.pi_norm, run.day)
-                fit_poly = np.poly1d(fit[0:2])
-                result_dict['run_slope'] = fit[0]
-                result_dict['run_slope_low'] = fit[2]
-                result_dict['run_slope_high'] = min([0.0, fit[3]])
-                result_dict['inferred_start_loss'] = fit_poly(start_day)
-                result_dict['inferred_end_loss'] = fit_poly(end_day)
-                result_dict['valid'] = True
-            result_list.append(result_dict)
-
-        results = pd.DataFrame(result_list)
+            previous = self._interval_stats
+            parts = [previous[previous['run'] < first_run],
+                     self._calc_interval_stats(
+                         daily_df[daily_df['run'] >= first_run],
+                         min_interval_length)]
+            results = pd.concat([part for part in parts if not part.empty],
+                                ignore_index=True)
+        self._interval_stats = results
+        results = results.copy()
 
         if results.empty:
             raise NoValidIntervalError('No valid soiling intervals were found')
@@ -334,7 +392,25 @@ class SRRAnalysis():
         self.result_df = results
         self.analyzed_daily_df = pm_frame_out
 
-    def _calc_monte(self, monte, method='half_norm_clean'):
+    def _warn_invalid_fraction(self, method):
+        '''
+        Raise a warning if there is >20% invalid data with a cleaning
+        assumption that randomizes the recovery.
+        '''
+        if (method == 'half_norm_clean') or (method == 'random_clean'):
+            valid_fraction = self.analyzed_daily_df['valid'].mean()
+            if valid_fraction <= 0.8:
+                warnings.warn('20% or more of the daily data is assigned to invalid soiling '
+                              'intervals. This can be problematic with the "half_norm_clean" '
+                              'and "random_clean" cleaning assumptions. Consider more permissive '
+                              'validity criteria such as increasing "max_relative_slope_error" '
+                              'and/or "max_negative_step" and/or decreasing "min_interval_length".'
+                              ' Alternatively, consider using method="perfect_clean". For more'
+                              ' info see https://github.com/NREL/rdtools/issues/272'
+                              )
+
+    def _calc_monte(self, monte, method='half_norm_clean', profile_format='list',
+                    profile_dir=None, rollups=None):
         '''
         Runs the Monte Carlo step of the SRR method. Calculates
         self.random_profiles, a list of the random soiling profiles realized in
@@ -357,23 +433,22 @@ class SRRAnalysis():
               mode (mu) at 1 and
               its sigma equal to 1/3 * (1-b) where b is the intercept
               of the fit to the interval.
+        profile_format : str, {'list', 'array', 'lazy'}, default 'list'
+            How to store self.random_profiles. See :py:meth:`run`.
+        profile_dir : str, default None
+            Directory of the file backing the profiles with
+            ``profile_format='array'``. See :py:meth:`run`.
+        rollups : _SoilingRollups, default None
+            If given, each realization is added to it as it is calculated.
         '''
 
-        # Raise a warning if there is >20% invalid data
-        if (method == 'half_norm_clean') or (method == 'random_clean'):
-            valid_fraction = self.analyzed_daily_df['valid'].mean()
-            if valid_fraction <= 0.8:
-                warnings.warn('20% or more of the daily data is assigned to invalid soiling '
-                              'intervals. This can be problematic with the "half_norm_clean" '
-                              'and "random_clean" cleaning assumptions. Consider more permissive '
-                              'validity criteria such as increasing "max_relative_slope_error" '
-                              'and/or "max_negative_step" and/or decreasing "min_interval_length".'
-                              ' Alternatively, consider using method="perfect_clean". For more'
-                              ' info see https://github.com/NREL/rdtools/issues/272'
-                              )
+        self._warn_invalid_fraction(method)
+
         monte_losses = []
         random_profiles = []
-        for _ in range(monte):
+        if profile_format == 'array':
+            profile_array = self._allocate_profiles(monte, profile_dir)
+        for rep in range(monte):
             results_rand = self.result_df.copy()
             df_rand = self.analyzed_daily_df.copy()
             # only really need this column from the original frame:
@@ -486,18 +561,400 @@ class SRRAnalysis():
                     ~df_rand.soil_insol.isnull()].sum()
             )
             monte_losses.append(soiling_ratio)
-            random_profile = df_rand['loss'].copy()
-            random_profile.name = 'stochastic_soiling_profile'
-            random_profiles.append(random_profile)
-
+            if rollups is not None:
+                rollups.add(results_rand['run_slope'].values[np.newaxis],
+                            results_rand['start_loss'].values[np.newaxis],
+                            df_rand['loss'].values[np.newaxis])
+            if profile_format == 'array':
+                profile_array[:, rep] = df_rand['loss'].values
+            elif profile_format == 'lazy':
+                random_profiles.append((results_rand['run_slope'].values,
+                                        results_rand['start_loss'].values))
+            else:
+                random_profile = df_rand['loss'].copy()
+                random_profile.name = 'stochastic_soiling_profile'
+                random_profiles.append(random_profile)
+
+        if profile_format == 'array':
+            random_profiles = self._profile_frame(profile_array, monte)
+        elif profile_format == 'lazy':
+            run_slope, start_loss = zip(*random_profiles)
+            random_profiles = self._lazy_profiles(np.array(run_slope),
+                                                  np.array(start_loss))
         self.random_profiles = random_profiles
         self.monte_losses = monte_losses
 
+    def _lazy_profiles(self, run_slope, start_loss):
+        '''
+        Wraps the (reps, intervals) random parameters of realizations in a
+        :py:class:`StochasticSoilingProfiles` over self.analyzed_daily_df.
+        '''
+        df = self.analyzed_daily_df
+        interval = pd.Index(self.result_df['run']).get_indexer(df['run'])
+        return StochasticSoilingProfiles(df.index, interval,
+                                         df['days_since_clean'].values,
+                                         run_slope, start_loss)
+
+    def _allocate_profiles(self, reps, profile_dir=None):
+        '''
+        Allocates a (days, reps) float32 array for the daily soiling profiles
+        of ``reps`` realizations, each stored contiguously (Fortran order).
+
+        Parameters
+        ----------
+        reps : int
+            number of realizations
+        profile_dir : str, default None
+            If given, the array is a numpy.memmap backed by a new file in this
+            directory. The file is not deleted: it belongs to the caller.
+
+        Returns
+        -------
+        numpy.ndarray
+        '''
+        shape = (len(self.analyzed_daily_df), reps)
+        if profile_dir is None:
+            return np.empty(shape, dtype=np.float32, order='F')
+        fd, filename = tempfile.mkstemp(prefix='srr_profiles_', suffix='.dat',
+                                        dir=profile_dir)
+        os.close(fd)
+        return np.memmap(filename, dtype=np.float32, mode='w+', shape=shape,
+                         order='F')
+
+    def _profile_frame(self, profile_array, reps):
+        '''
+        Wraps the first ``reps`` realizations of an array from
+        :py:meth:`_allocate_profiles` in a DataFrame without copying. If
+        fewer realizations were calculated than allocated, the array is first
+        trimmed to them. The name of the file backing the array, if any, is
+        stored in self.profile_file.
+        '''
+        self.profile_file = getattr(profile_array, 'filename', None)
+        if reps < profile_array.shape[1]:
+            profile_array = self._trim_profiles(profile_array, reps)
+        return pd.DataFrame(profile_array, index=self.analyzed_daily_df.index,
+                            copy=False)
+
+    def _trim_profiles(self, profile_array, reps):
+        '''
+        Keeps only the first ``reps`` realizations of an array from
+        :py:meth:`_allocate_profiles`, releasing the memory or file space
+        of the others.
+        '''
+        shape = (profile_array.shape[0], reps)
+        if not isinstance(profile_array, np.memmap):
+            return np.array(profile_array[:, :reps], order='F')
+        # the realizations are stored contiguously, so those calculated are
+        # at the start of the file
+        profile_array.flush()
+        trimmed = np.memmap(profile_array.filename, dtype=np.float32,
+                            mode='r+', shape=shape, order='F')
+        try:
+            os.truncate(profile_array.filename, trimmed.nbytes)
+        except OSError:
+            # a file still mapped cannot be truncated on some platforms
+            pass
+        return trimmed
+
+    def _draw_monte_params(self, reps, method, rng=np.random):
+        '''
+        Draws the random soiling rate and starting soiling ratio of every
+        soiling interval for ``reps`` Monte Carlo realizations at once.
+
+        Parameters
+        ----------
+        reps : int
+            number of Monte Carlo realizations to draw
+        method : str, {'half_norm_clean', 'random_clean', 'perfect_clean'}
+            How to treat the recovery of each cleaning event. See
+            :py:meth:`_calc_monte`.
+        rng : numpy.random.Generator or module, default numpy.random
+            Source of random numbers.
+
+        Returns
+        -------
+        run_slope : numpy.ndarray
+            (reps, intervals) array of the randomized soiling rates
+        start_loss : numpy.ndarray
+            (reps, intervals) array of the randomized soiling ratios at the
+            start of each interval
+        '''
+        results = self.result_df
+        n_intervals = len(results)
+        valid = results['valid'].values.astype(bool)
+
+        run_slope = rng.uniform(results['run_slope_low'].values,
+                                results['run_slope_high'].values,
+                                size=(reps, n_intervals))
+        run_loss = run_slope * results['length'].values
+        start_loss = np.ones((reps, n_intervals))
+
+        if (method == 'half_norm_clean') or (method == 'random_clean'):
+            valid_pos = np.flatnonzero(valid)
+            recovery = results['inferred_recovery'].fillna(1.0).values
+            end_loss = np.ones((reps, n_intervals))
+
+            # draw the randomness of every cleaning event up front, the
+            # recovery itself depends on the end of the preceding interval
+            if method == 'half_norm_clean':
+                draws = np.abs(rng.standard_normal((reps, len(valid_pos))))
+            else:
+                draws = rng.uniform(size=(reps, len(valid_pos)))
+
+            inter_start = np.ones(reps)
+            for k, i in enumerate(valid_pos):
+                start_loss[:, i] = inter_start
+                end = inter_start + run_loss[:, i]
+                end_loss[:, i] = end
+
+                if method == 'half_norm_clean':
+                    # Use a half normal with the inferred clean at the
+                    # 3sigma point
+                    x = np.clip(end + recovery[i], 0, 1)
+                    inter_start = 1 - draws[:, k] * (1 - x) / 3
+                else:
+                    inter_start = end + draws[:, k] * (1 - end)
+
+            # Invalid intervals following the same valid interval (or
+            # preceding the first one) share a random constant derate
+            # between the previous valid end and the next valid start
+            invalid_pos = np.flatnonzero(~valid)
+            if len(invalid_pos) > 0:
+                group = np.cumsum(valid)[invalid_pos]
+                groups, group_idx = np.unique(group, return_inverse=True)
+
+                # group g > 0 follows the g-th valid interval
+                low = np.ones((reps, len(groups)))
+                high = np.ones((reps, len(groups)))
+                follows = groups > 0
+                low[:, follows] = end_loss[:, valid_pos[groups[follows] - 1]]
+                precedes = groups < len(valid_pos)
+                high[:, precedes] = start_loss[:, valid_pos[groups[precedes]]]
+
+                levels = low + rng.uniform(size=low.shape) * (high - low)
+                start_loss[:, invalid_pos] = levels[:, group_idx]
+
+        elif method != 'perfect_clean':
+            raise ValueError("Invalid method specification")
+
+        return run_slope, start_loss
+
+    def _calc_interval_sums(self, first_run=None):
+        '''
+        Calculates the per-interval sufficient statistics of the
+        insolation-weighted soiling ratio. Within an interval the daily
+        soiling ratio is ``start_loss + days_since_clean * run_slope``, so its
+        insolation-weighted sum is ``start_loss * insol_sum + run_slope *
+        insol_days_sum``.
+
+        Parameters
+        ----------
+        first_run : int, default None
+            If given, only the intervals from run ``first_run`` onward are
+            summed and the sums of the earlier ones are reused from the
+            previous call.
+
+        Returns
+        -------
+        insol_sum : numpy.ndarray
+            Total insolation of each interval in self.result_df
+        insol_days_sum : numpy.ndarray
+            Total of insolation times days since cleaning of each interval in
+            self.result_df
+        '''
+        df = self.analyzed_daily_df
+        runs = self.result_df['run']
+        if first_run is not None:
+            df = df[df['run'] >= first_run]
+        interval = pd.Index(runs).get_indexer(df['run'])
+        insol = df['insol'].values
+        has_insol = ~np.isnan(insol)
+        interval = interval[has_insol]
+        insol = insol[has_insol]
+        days_since_clean = df['days_since_clean'].values[has_insol]
+
+        n_intervals = len(self.result_df)
+        insol_sum = np.bincount(interval, weights=insol,
+                                minlength=n_intervals)
+        insol_days_sum = np.bincount(interval,
+                                     weights=insol * days_since_clean,
+                                     minlength=n_intervals)
+        if first_run is not None:
+            n_previous = (runs < first_run).sum()
+            previous_sum, previous_days_sum = self._interval_sums
+            insol_sum = np.concatenate([previous_sum[:n_previous],
+                                        insol_sum[n_previous:]])
+            insol_days_sum = np.concatenate([previous_days_sum[:n_previous],
+                                             insol_days_sum[n_previous:]])
+
+        self._interval_sums = (insol_sum, insol_days_sum)
+        return insol_sum, insol_days_sum
+
+    def _calc_monte_vectorized(self, monte, method='half_norm_clean',
+                               store_profiles=True, n_jobs=1, seed=None,
+                               batch_size=100, convergence_tol=None,
+                               percentiles=(50,), first_run=None,
+                               profile_format='list', profile_dir=None,
+                               rollups=None):
+        '''
+        Vectorized equivalent of :py:meth:`_calc_monte`. All random draws
+        of a batch of realizations are made as (reps, intervals) arrays and
+        expanded to daily soiling profiles through the interval index of
+        each day, so that every insolation-weighted soiling ratio is
+        computed in a single array reduction. Results are statistically,
+        but not numerically, equivalent to :py:meth:`_calc_monte` for a
+        given random seed.
+
+        Parameters
+        ----------
+        monte : int
+            number of Monte Carlo simulations to run
+        method : str, {'half_norm_clean', 'random_clean', 'perfect_clean'} \
+                default 'half_norm_clean'
+            How to treat the recovery of each cleaning event. See
+            :py:meth:`_calc_monte`.
+        store_profiles : bool, default True
+            Whether to materialize the daily soiling profiles. If False,
+            self.random_profiles is set to None and the soiling ratios are
+            computed from the per-interval sums of
+            :py:meth:`_calc_interval_sums`, in O(intervals) per realization
+            rather than O(days).
+        n_jobs : int, default 1
+            Number of worker threads calculating batches concurrently.
+        seed : None, int or numpy.random.SeedSequence, default None
+            Seed for the random generators of the batches. If None and
+            ``n_jobs=1``, all realizations are drawn in one batch from the
+            global numpy random state.
+        batch_size : int, default 100
+            Number of realizations per batch when ``seed`` is given or
+            ``n_jobs > 1``. The realizations depend on ``seed`` and
+            ``batch_size`` but not on ``n_jobs``.
+        convergence_tol : float, default None
+            If given, ``monte`` is the maximum number of realizations.
+            Batches are calculated until ``percentiles`` of the soiling
+            ratios change by less than ``convergence_tol`` from one batch to
+            the next. The estimates after each batch are stored in
+            self.convergence_trace.
+        percentiles : sequence of float, default (50,)
+            Percentiles of the soiling ratios tracked for convergence.
+        first_run : int, default None
+            Passed to :py:meth:`_calc_interval_sums`.
+        profile_format : str, {'list', 'array', 'lazy'}, default 'list'
+            How to store self.random_profiles. See :py:meth:`run`.
+        profile_dir : str, default None
+            Directory of the file backing the profiles with
+            ``profile_format='array'``. See :py:meth:`run`.
+        rollups : _SoilingRollups, default None
+            If given, each batch of realizations is added to it, in order, as
+            soon as it is calculated. Daily profiles calculated only for
+            ``rollups`` are then discarded.
+        '''
+        self._warn_invalid_fraction(method)
+
+        df = self.analyzed_daily_df
+        interval = pd.Index(self.result_df['run']).get_indexer(df['run'])
+        days_since_clean = df['days_since_clean'].values
+        insol = df['insol'].values
+        has_insol = ~np.isnan(insol)
+        insol_sum, insol_days_sum = self._calc_interval_sums(first_run)
+        to_array = store_profiles and profile_format == 'array'
+        if to_array:
+            profile_array = self._allocate_profiles(monte, profile_dir)
+
+        lazy = store_profiles and profile_format == 'lazy'
+        keep_list = store_profiles and profile_format == 'list'
+        daily_rollups = rollups is not None and rollups.daily
+
+        def calc_batch(reps, rng, offset=0):
+            run_slope, start_loss = self._draw_monte_params(reps, method, rng)
+            params = (run_slope, start_loss)
+            if not store_profiles or lazy:
+                monte_losses = (start_loss @ insol_sum +
+                                run_slope @ insol_days_sum) / insol_sum.sum()
+                return monte_losses, params, None
+
+            profiles = start_loss[:, interval] + \
+                days_since_clean * run_slope[:, interval]
+            monte_losses = profiles[:, has_insol] @ insol[has_insol] / \
+                insol[has_insol].sum()
+            if to_array:
+                # batches fill disjoint columns, so no lock is needed
+                profile_array[:, offset:offset + reps] = profiles.T
+            return monte_losses, params, profiles
+
+        def consume(batch):
+            # add a batch to the rollups and drop what is not returned
+            monte_losses, params, profiles = batch
+            if rollups is not None:
+                rollups.add(*params, profiles if daily_rollups else None)
+            return (monte_losses, params if lazy else None,
+                    profiles if keep_list else None)
+
+        self.convergence_trace = None
+        if seed is None and n_jobs == 1 and convergence_tol is None:
+            batches = [consume(calc_batch(monte, np.random))]
+        else:
+            batch_reps = [batch_size] * (monte // batch_size)
+            if monte % batch_size:
+                batch_reps.append(monte % batch_size)
+            rngs = _batch_generators(seed, len(batch_reps))
+            offsets = np.cumsum([0] + batch_reps[:-1])
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                if convergence_tol is None:
+                    batches = [consume(batch) for batch in
+                               pool.map(calc_batch, batch_reps, rngs, offsets)]
+                else:
+                    batches = []
+                    self.convergence_trace = []
+                    losses = np.empty(0)
+                    previous = None
+                    converged = False
+                    # batches are evaluated n_jobs at a time but checked in
+                    # order, so the stopping point does not depend on n_jobs
+                    for i in range(0, len(batch_reps), n_jobs):
+                        results = pool.map(calc_batch, batch_reps[i:i + n_jobs],
+                                           rngs[i:i + n_jobs],
+                                           offsets[i:i + n_jobs])
+                        for batch in results:
+                            batch = consume(batch)
+                            batches.append(batch)
+                            losses = np.concatenate([losses, batch[0]])
+                            estimate = np.percentile(losses, percentiles)
+                            self.convergence_trace.append(
+                                [len(losses)] + list(estimate))
+                            converged = previous is not None and \
+                                np.all(np.abs(estimate - previous) < convergence_tol)
+                            previous = estimate
+                            if converged:
+                                break
+                        if converged:
+                            break
+
+        self.monte_losses = [x for losses, _, _ in batches for x in losses]
+        if to_array:
+            self.random_profiles = self._profile_frame(profile_array,
+                                                       len(self.monte_losses))
+        elif lazy:
+            self.random_profiles = self._lazy_profiles(
+                np.concatenate([params[0] for _, params, _ in batches]),
+                np.concatenate([params[1] for _, params, _ in batches]))
+        elif store_profiles:
+            self.random_profiles = [
+                pd.Series(profile, index=df.index,
+                          name='stochastic_soiling_profile')
+                for _, _, profiles in batches for profile in profiles
+            ]
+        else:
+            self.random_profiles = None
+
     def run(self, reps=1000, day_scale=13, clean_threshold='infer',
             trim=False, method='half_norm_clean',
             clean_criterion='shift', precip_threshold=0.01, min_interval_length=7,
             exceedance_prob=95.0, confidence_level=68.2, recenter=True,
-            max_relative_slope_error=500.0, max_negative_step=0.05, outlier_factor=1.5):
+            max_relative_slope_error=500.0, max_negative_step=0.05, outlier_factor=1.5,
+            engine='loop', store_profiles=True, n_jobs=1, seed=None, batch_size=100,
+            convergence_tol=None, profile_format='list', profile_dir=None,
+            rollup_periods=None, daily_percentiles=None):
         '''
         Run the SRR method from beginning to end.  Perform the stochastic rate
         and recovery soiling loss calculation. Based on the methods presented
@@ -566,6 +1023,73 @@ class SRRAnalysis():
             The factor used in the Tukey fence definition of outliers for flagging positive shifts
             in the rolling median used for cleaning detection. A smaller value will cause more and
             smaller shifts to be classified as cleaning events.
+        engine : str, {'loop', 'vectorized'}, default 'loop'
+            How to compute the Monte Carlo realizations.
+
+            * 'loop' - calculate each realization in turn
+            * 'vectorized' - draw the random parameters of all realizations
+              at once and calculate them with array operations. Much faster
+              for large ``reps``. Results are statistically equivalent to,
+              but not numerically identical with, those of 'loop' for a
+              given random seed.
+        store_profiles : bool, default True
+            Whether to keep the daily soiling profile of every realization.
+            If False, ``calc_info['stochastic_soiling_profiles']`` is None and
+            each realization is reduced to its insolation-weighted soiling
+            ratio from per-interval insolation sums, without materializing
+            the daily profile. This is much faster and lighter for large
+            ``reps`` and always uses the 'vectorized' engine.
+        n_jobs : int, default 1
+            Number of worker threads calculating batches of realizations
+            concurrently. Values other than 1 use the 'vectorized' engine.
+        seed : None, int or numpy.random.SeedSequence, default None
+            Seed for the Monte Carlo. If given, the realizations are split into
+            batches of ``batch_size``, each drawn from an independent generator
+            spawned from ``seed``, so results are reproducible and identical for
+            any ``n_jobs``. Uses the 'vectorized' engine. If None, the global
+            numpy random state is used.
+        batch_size : int, default 100
+            Number of realizations per batch when ``seed``, ``convergence_tol``
+            or ``n_jobs`` other than 1 is given.
+        convergence_tol : float, default None
+            If given, ``reps`` becomes the maximum number of realizations.
+            Realizations are calculated in batches of ``batch_size`` until the
+            P50, the confidence interval bounds and the exceedance level all
+            change by less than ``convergence_tol`` from one batch to the next.
+            The achieved number of realizations and the estimates after each
+            batch are reported in ``calc_info``. Uses the 'vectorized' engine.
+        profile_format : str, {'list', 'array', 'lazy'}, default 'list'
+            How to return ``calc_info['stochastic_soiling_profiles']``.
+
+            * 'list' - a list of pandas Series, one per realization
+            * 'array' - a single pandas DataFrame with one float32 column per
+              realization, sharing one daily index. Much lighter for large
+              ``reps``.
+            * 'lazy' - a :py:class:`StochasticSoilingProfiles` storing only the
+              random soiling rate and starting soiling ratio of each interval
+              and realization, from which daily profiles are calculated on
+              demand. With the 'vectorized' engine no daily profiles are
+              materialized during the Monte Carlo, and the soiling ratios are
+              calculated as with ``store_profiles=False``.
+        profile_dir : str, default None
+            With ``profile_format='array'``, store the profiles in a
+            ``numpy.memmap`` file created in this directory instead of in
+            memory. The file belongs to the caller: it is not deleted
+            automatically, and its path is returned as
+            ``calc_info['profile_file']``.
+        rollup_periods : list, default None
+            Periods over which to aggregate the insolation-weighted soiling ratio
+            of every realization, each ``'year'``, ``'quarter'``, ``'month'`` or
+            an array-like of bin edges as in
+            :py:func:`rdtools.soiling.annual_soiling_ratios`. The period sums are
+            accumulated as the realizations are calculated, so the profiles need
+            not be stored (see ``store_profiles``).
+        daily_percentiles : list of float, default None
+            Percentiles (e.g. ``[5, 50, 95]``) of the daily soiling ratio across
+            realizations to estimate. They are estimated as the realizations are
+            calculated with the P-square algorithm (Jain and Chlamtac 1985),
+            without storing the profiles, and are exact for five realizations or
+            fewer.
 
         Returns
         -------
@@ -581,10 +1105,29 @@ class SRRAnalysis():
               was outperformed with probability of exceedance_prob
             * 'stochastic_soiling_profiles' - List of Pandas series
               corresponding to the Monte Carlo realizations of soiling ratio
-              profiles
+              profiles, a Pandas dataframe with one column per realization if
+              ``profile_format='array'``, or a StochasticSoilingProfiles if
+              ``profile_format='lazy'``. None if ``store_profiles=False``.
             * 'soiling_ratio_perfect_clean' - Pandas series of the soiling
               ratio during valid soiling intervals assuming perfect cleaning
               and P50 slopes
+            * 'profile_file' - Path of the file backing
+              'stochastic_soiling_profiles'. Only if ``profile_dir`` is given.
+            * 'reps' - Number of realizations calculated. Only if
+              ``convergence_tol`` is given.
+            * 'convergence_trace' - Pandas dataframe of the number of
+              realizations ('reps') and the resulting 'soiling_ratio_median',
+              'soiling_ratio_low', 'soiling_ratio_high' and 'exceedance_level'
+              after each batch. Only if ``convergence_tol`` is given.
+            * 'period_soiling_ratios' - List of Pandas dataframes, one for each
+              entry of ``rollup_periods``, of the median and confidence interval
+              of the insolation-weighted soiling ratio in each period, formatted
+              as the output of :py:func:`rdtools.soiling.annual_soiling_ratios`.
+              Only if ``rollup_periods`` is given.
+            * 'daily_soiling_ratio_percentiles' - Pandas dataframe of the
+              estimated percentiles of the daily soiling ratio, with one column
+              per entry of ``daily_percentiles``. Only if ``daily_percentiles``
+              is given.
             * 'soiling_interval_summary' - Pandas dataframe summarizing the
               soiling intervals identified. The columns of the dataframe are
               as follows:
@@ -620,6 +1163,19 @@ class SRRAnalysis():
               +------------------------+----------------------------------------------+
 
         '''
+        self._run_kwargs = dict(
+            reps=reps, day_scale=day_scale, clean_threshold=clean_threshold,
+            trim=trim, method=method, clean_criterion=clean_criterion,
+            precip_threshold=precip_threshold,
+            min_interval_length=min_interval_length,
+            exceedance_prob=exceedance_prob, confidence_level=confidence_level,
+            recenter=recenter, max_relative_slope_error=max_relative_slope_error,
+            max_negative_step=max_negative_step, outlier_factor=outlier_factor,
+            engine=engine, store_profiles=store_profiles, n_jobs=n_jobs,
+            seed=seed, batch_size=batch_size, convergence_tol=convergence_tol,
+            profile_format=profile_format, profile_dir=profile_dir,
+            rollup_periods=rollup_periods, daily_percentiles=daily_percentiles)
+
         self._calc_daily_df(day_scale=day_scale,
                             clean_threshold=clean_threshold,
                             recenter=recenter,
@@ -630,15 +1186,58 @@ class SRRAnalysis():
                              max_relative_slope_error=max_relative_slope_error,
                              max_negative_step=max_negative_step,
                              min_interval_length=min_interval_length)
-        self._calc_monte(reps, method=method)
+        return self._calc_monte_summary(
+            reps, method=method, exceedance_prob=exceedance_prob,
+            confidence_level=confidence_level, engine=engine,
+            store_profiles=store_profiles, n_jobs=n_jobs, seed=seed,
+            batch_size=batch_size, convergence_tol=convergence_tol,
+            profile_format=profile_format, profile_dir=profile_dir,
+            rollup_periods=rollup_periods, daily_percentiles=daily_percentiles)
+
+    def _calc_monte_summary(self, reps, method, exceedance_prob,
+                            confidence_level, engine, store_profiles, n_jobs,
+                            seed, batch_size, convergence_tol,
+                            profile_format='list', profile_dir=None,
+                            first_run=None, rollup_periods=None,
+                            daily_percentiles=None):
+        '''
+        Runs the Monte Carlo step and summarizes the results of
+        :py:meth:`run`. See :py:meth:`run` for the parameters and return
+        values. ``first_run`` is passed to :py:meth:`_calc_interval_sums`.
+        '''
+        if engine not in ('loop', 'vectorized'):
+            raise ValueError("engine must be one of {'loop', 'vectorized'}")
+        if profile_format not in ('list', 'array', 'lazy'):
+            raise ValueError("profile_format must be one of "
+                             "{'list', 'array', 'lazy'}")
+        if profile_dir is not None and profile_format != 'array':
+            raise ValueError("profile_dir requires profile_format='array'")
+        rollups = None
+        if rollup_periods is not None or daily_percentiles is not None:
+            rollups = _SoilingRollups(self, rollup_periods, daily_percentiles)
+        # Percentiles for the P50, confidence interval and exceedance level
+        half_ci = confidence_level / 2.0
+        percentiles = [50, 50.0 - half_ci, 50.0 + half_ci, 100 - exceedance_prob]
+
+        use_loop = (engine == 'loop' and store_profiles and seed is None and
+                    n_jobs == 1 and convergence_tol is None)
+        if use_loop:
+            self._calc_monte(reps, method=method, profile_format=profile_format,
+                             profile_dir=profile_dir, rollups=rollups)
+        else:
+            self._calc_monte_vectorized(reps, method=method,
+                                        store_profiles=store_profiles,
+                                        n_jobs=n_jobs, seed=seed,
+                                        batch_size=batch_size,
+                                        convergence_tol=convergence_tol,
+                                        percentiles=percentiles,
+                                        first_run=first_run,
+                                        profile_format=profile_format,
+                                        profile_dir=profile_dir,
+                                        rollups=rollups)
 
         # Calculate the P50 and confidence interval
-        half_ci = confidence_level / 2.0
-        result = np.percentile(self.monte_losses,
-                               [50,
-                                50.0 - half_ci,
-                                50.0 + half_ci,
-                                100 - exceedance_prob])
+        result = np.percentile(self.monte_losses, percentiles)
         P_level = result[3]
 
         # Construct calc_info output
@@ -661,16 +1260,619 @@ class SRRAnalysis():
             'soiling_interval_summary': intervals_out,
             'soiling_ratio_perfect_clean': sr_perfect
         }
+        if profile_dir is not None:
+            calc_info['profile_file'] = self.profile_file
+        if convergence_tol is not None:
+            calc_info['reps'] = len(self.monte_losses)
+            calc_info['convergence_trace'] = pd.DataFrame(
+                self.convergence_trace,
+                columns=['reps', 'soiling_ratio_median', 'soiling_ratio_low',
+                         'soiling_ratio_high', 'exceedance_level'])
+        if rollup_periods is not None:
+            calc_info['period_soiling_ratios'] = \
+                rollups.period_soiling_ratios(confidence_level)
+        if daily_percentiles is not None:
+            calc_info['daily_soiling_ratio_percentiles'] = \
+                rollups.daily_soiling_ratio_percentiles()
 
         return (result[0], result[1:3], calc_info)
 
+    def update(self, energy_normalized_daily, insolation_daily,
+               precipitation_daily=None):
+        '''
+        Append daily data and update the results of the last call to
+        :py:meth:`run`, with the same parameters.
+
+        Only the part of the analysis that the new data can affect is
+        recalculated. The rolling median and the cleaning and outage
+        detection are calculated over the last ``3 * day_scale + 5`` days
+        only, the soiling intervals are refit from the last interval that
+        these calculations change onward, and the Monte Carlo is rerun with
+        the ``engine`` of the last :py:meth:`run`. Only with
+        ``engine='vectorized'`` are the insolation sums of the unchanged
+        intervals reused. The results are identical to those of
+        :py:meth:`run` on the combined data. The full analysis is repeated
+        instead if ``recenter=True`` and the data previously analyzed
+        spans less than a year, or if ``clean_threshold='infer'`` and the
+        threshold inferred from the combined data changes the cleaning
+        events detected in the unchanged data.
+
+        Parameters
+        ----------
+        energy_normalized_daily : pandas.Series
+            Daily performance metric following the existing data.
+        insolation_daily : pandas.Series
+            Daily plane-of-array insolation corresponding to
+            `energy_normalized_daily`.
+        precipitation_daily : pandas.Series, default None
+            Daily total precipitation corresponding to
+            `energy_normalized_daily`. Required if precipitation was passed
+            at initialization, ignored otherwise.
+
+        Returns
+        -------
+        Same as :py:meth:`run`
+        '''
+        if not hasattr(self, '_run_kwargs'):
+            raise ValueError('run must be called before update')
+        if self.precipitation_daily is not None and precipitation_daily is None:
+            raise ValueError('precipitation_daily must be given to update '
+                             'an analysis with precipitation')
+
+        new_data = [(self.pm, energy_normalized_daily),
+                    (self.insolation_daily, insolation_daily)]
+        if self.precipitation_daily is not None:
+            new_data.append((self.precipitation_daily, precipitation_daily))
+        for existing, new in new_data:
+            if len(new) and new.index[0] <= existing.index[-1]:
+                raise ValueError('Data passed to update must follow the '
+                                 'existing data')
+        pm = pd.concat([self.pm, energy_normalized_daily])
+        insol = pd.concat([self.insolation_daily, insolation_daily])
+        precip = self.precipitation_daily
+        if precip is not None:
+            precip = pd.concat([precip, precipitation_daily])
+        _check_daily_frequency(pm, insol, precip)
+        self.pm = pm
+        self.insolation_daily = insol
+        self.precipitation_daily = precip
+
+        kwargs = self._run_kwargs
+        day_scale = kwargs['day_scale']
+        clean_threshold = kwargs['clean_threshold']
+        previous = self.daily_df
+
+        # Rows from `first` onward may depend on the new data, and are
+        # recalculated from a slice of the data starting `context` days
+        # earlier to include all the history they depend on
+        first = len(previous) - day_scale - 2
+        context = 2 * day_scale + 3
+        one_year = previous.index[0] + pd.Timedelta('364d')
+        if first - context < 0 or (kwargs['recenter'] and
+                                   one_year > previous.index[-1]):
+            return self.run(**kwargs)
+
+        tail = self._join_daily(start=previous.index[first - context])
+        tail['day'] = range(first - context, first - context + len(tail))
+        tail['pi_norm'] = tail['pi'] / self.renorm_factor
+        outage = _calc_rolling_median(tail, day_scale)
+        delta = np.concatenate([self._delta[:first],
+                                tail['delta'].values[context:]])
+
+        if clean_threshold == 'infer':
+            clean_threshold = _infer_clean_threshold(delta,
+                                                     kwargs['outlier_factor'])
+            detected = self._delta[:first] > clean_threshold
+            if not np.array_equal(
+                    detected, previous['clean_event_detected'].values[:first]):
+                return self.run(**kwargs)
+
+        tail = _label_intervals(tail, tail.delta > clean_threshold,
+                                tail['precip'] > kwargs['precip_threshold'],
+                                kwargs['clean_criterion'], outage)
+        first_run = previous['run'].iloc[first - 1]
+        tail['run'] += first_run - tail['run'].iloc[context - 1]
+        tail = tail.iloc[context:]
+
+        daily_df = pd.concat([previous.iloc[:first], tail])
+        daily_df.index.name = 'date'
+        self.daily_df = daily_df
+        self._delta = delta
+
+        if first_run <= daily_df['run'].iloc[0]:
+            first_run = None
+        return self._calc_from_daily_df(kwargs, first_run=first_run)
+
+    def _calc_from_daily_df(self, kwargs, first_run=None, interval_stats=None):
+        '''
+        Completes the analysis of :py:meth:`run` from self.daily_df.
+
+        Parameters
+        ----------
+        kwargs : dict
+            All parameters of :py:meth:`run`
+        first_run : int, default None
+            Passed to :py:meth:`_calc_result_df` and
+            :py:meth:`_calc_interval_sums`.
+        interval_stats : pandas.DataFrame, default None
+            Passed to :py:meth:`_calc_result_df`.
+
+        Returns
+        -------
+        Same as :py:meth:`run`
+        '''
+        self._calc_result_df(
+            trim=kwargs['trim'],
+            max_relative_slope_error=kwargs['max_relative_slope_error'],
+            max_negative_step=kwargs['max_negative_step'],
+            min_interval_length=kwargs['min_interval_length'],
+            first_run=first_run, interval_stats=interval_stats)
+        return self._calc_monte_summary(
+            kwargs['reps'], method=kwargs['method'],
+            exceedance_prob=kwargs['exceedance_prob'],
+            confidence_level=kwargs['confidence_level'],
+            engine=kwargs['engine'], store_profiles=kwargs['store_profiles'],
+            n_jobs=kwargs['n_jobs'], seed=kwargs['seed'],
+            batch_size=kwargs['batch_size'],
+            convergence_tol=kwargs['convergence_tol'],
+            profile_format=kwargs['profile_format'],
+            profile_dir=kwargs['profile_dir'], first_run=first_run,
+            rollup_periods=kwargs['rollup_periods'],
+            daily_percentiles=kwargs['daily_percentiles'])
+
+    def sweep(self, parameters, n_jobs=1, **kwargs):
+        '''
+        Run the SRR analysis for every combination of the given parameter
+        values.
+
+        The data are joined and renormalized and the rolling median is
+        calculated once for each distinct ``day_scale`` and ``recenter``.
+        The cleaning events for all the cleaning and precipitation
+        thresholds are then detected at once, the intervals are fit once
+        for each resulting set of soiling intervals, and the configurations
+        are completed concurrently. Given a ``seed``, each row is identical to
+        the result of :py:meth:`run` with the same parameters, and all
+        configurations share the same random numbers.
+
+        Parameters
+        ----------
+        parameters : dict
+            Maps names of :py:meth:`run` parameters to sequences of values to
+            evaluate, e.g. ``{'day_scale': [7, 13], 'outlier_factor': [1, 1.5]}``
+        n_jobs : int, default 1
+            Number of configurations calculated concurrently in worker
+            threads.
+        **kwargs
+            Other parameters of :py:meth:`run`, shared by all configurations.
+            ``store_profiles`` defaults to False.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per configuration, with a column for each parameter in
+            ``parameters``, followed by the P50 insolation-weighted soiling
+            ratio ('soiling_ratio'), its confidence interval
+            ('soiling_ratio_low' and 'soiling_ratio_high') and the
+            'exceedance_level'. The results are NaN for configurations
+            without valid soiling intervals.
+        '''
+        defaults = {name: parameter.default for name, parameter in
+                    inspect.signature(self.run).parameters.items()}
+        for name in list(parameters) + list(kwargs):
+            if name not in defaults:
+                raise ValueError(f'{name} is not a parameter of SRRAnalysis.run')
+        fixed = dict(defaults, store_profiles=False)
+        fixed.update(kwargs)
+        names = list(parameters)
+        configs = [dict(fixed, **dict(zip(names, values)))
+                   for values in itertools.product(*parameters.values())]
+
+        # the daily dataframe of each distinct set of detection parameters
+        daily_parameters = ['day_scale', 'recenter', 'clean_threshold',
+                            'outlier_factor', 'clean_criterion',
+                            'precip_threshold']
+        groups = {}
+        for config in configs:
+            _warn_even_day_scale(config['day_scale'], config['clean_criterion'])
+            key = tuple(config[name] for name in daily_parameters)
+            groups.setdefault(key[:2], set()).add(key)
+
+        daily = {}
+        for (day_scale, recenter), keys in groups.items():
+            df, renorm, outage = self._calc_daily_base(day_scale, recenter)
+
+            # cleaning and precipitation masks of every threshold at once
+            thresholds = sorted({key[2:4] for key in keys}, key=str)
+            clean_threshold = np.array(
+                [threshold for threshold, _ in thresholds], dtype=object)
+            infer = clean_threshold == 'infer'
+            outlier_factor = np.array([factor for _, factor in thresholds],
+                                      dtype=float)
+            clean_threshold[infer] = _infer_clean_threshold(
+                df.delta, outlier_factor[infer])
+            detected = df['delta'].values[:, np.newaxis] > \
+                clean_threshold.astype(float)
+
+            precip_thresholds = sorted({key[5] for key in keys})
+            precip_event = df['precip'].values[:, np.newaxis] > \
+                np.array(precip_thresholds, dtype=float)
+
+            for key in keys:
+                daily[key] = (_label_intervals(
+                    df.copy(), detected[:, thresholds.index(key[2:4])],
+                    precip_event[:, precip_thresholds.index(key[5])],
+                    key[4], outage), renorm)
+
+        # configurations sharing the interval fits are calculated together
+        fit_groups = {}
+        for i, config in enumerate(configs):
+            key = tuple(config[name] for name in daily_parameters)
+            fit_groups.setdefault(
+                key + (config['trim'], config['min_interval_length']),
+                []).append(i)
+
+        def calc_group(indices):
+            interval_stats = None
+            results = []
+            for i in indices:
+                config = configs[i]
+                srr = copy.copy(self)
+                srr.daily_df, srr.renorm_factor = \
+                    daily[tuple(config[name] for name in daily_parameters)]
+                try:
+                    sr, sr_ci, calc_info = srr._calc_from_daily_df(
+                        config, interval_stats=interval_stats)
+                    results.append([sr, sr_ci[0], sr_ci[1],
+                                    calc_info['exceedance_level']])
+                except NoValidIntervalError:
+                    results.append([np.nan] * 4)
+                interval_stats = getattr(srr, '_interval_stats', None)
+            return results
+
+        results = [None] * len(configs)
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            groups = list(fit_groups.values())
+            for indices, group_results in zip(groups,
+                                              pool.map(calc_group, groups)):
+                for i, result in zip(indices, group_results):
+                    results[i] = result
+
+        return pd.DataFrame(
+            [[config[name] for name in names] + result
+             for config, result in zip(configs, results)],
+            columns=names + ['soiling_ratio', 'soiling_ratio_low',
+                             'soiling_ratio_high', 'exceedance_level'])
+
+
+class StochasticSoilingProfiles():
+    '''
+    Stochastic soiling profiles of the SRR Monte Carlo, stored as the random
+    parameters of each realization rather than as daily values. Within
+    soiling interval ``j``, the soiling ratio of realization ``i`` on a day
+    ``d`` days after the start of the interval is
+    ``start_loss[i, j] + d * run_slope[i, j]``, so any profile can be
+    reconstructed exactly on demand.
+
+    Behaves like the list of profiles of
+    ``calc_info['stochastic_soiling_profiles']``: ``len`` is the number of
+    realizations, and iterating or indexing with an integer gives the daily
+    profile of a realization as a pandas Series. Indexing with a slice or
+    array selects realizations without materializing them.
+
+    Parameters
+    ----------
+    index : pandas.DatetimeIndex
+        Days of the profiles
+    interval : numpy.ndarray
+        Position of the soiling interval of each day in the columns of
+        ``run_slope`` and ``start_loss``
+    days_since_clean : numpy.ndarray
+        Number of days since the start of the soiling interval on each day
+    run_slope : numpy.ndarray
+        (reps, intervals) array of the soiling rate of each realization and
+        interval
+    start_loss : numpy.ndarray
+        (reps, intervals) array of the soiling ratio at the start of each
+        realization and interval
+    '''
+
+    def __init__(self, index, interval, days_since_clean, run_slope,
+                 start_loss):
+        self.index = index
+        self.interval = interval
+        self.days_since_clean = days_since_clean
+        self.run_slope = run_slope
+        self.start_loss = start_loss
+
+    def __len__(self):
+        return len(self.run_slope)
+
+    def __iter__(self):
+        for rep in range(len(self)):
+            yield self[rep]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            profile = self.to_array(reps=[key])[:, 0]
+            return pd.Series(profile, index=self.index,
+                             name='stochastic_soiling_profile')
+        return StochasticSoilingProfiles(self.index, self.interval,
+                                         self.days_since_clean,
+                                         self.run_slope[key],
+                                         self.start_loss[key])
+
+    def to_array(self, reps=None, rows=None):
+        '''
+        Calculate daily soiling ratios.
+
+        Parameters
+        ----------
+        reps : slice or array-like, default None
+            Realizations to calculate. All if None.
+        rows : slice or array-like, default None
+            Positions of the days to calculate. All if None.
+
+        Returns
+        -------
+        numpy.ndarray
+            (days, reps) array of soiling ratios
+        '''
+        run_slope = self.run_slope
+        start_loss = self.start_loss
+        if reps is not None:
+            run_slope = run_slope[reps]
+            start_loss = start_loss[reps]
+        interval = self.interval
+        days_since_clean = self.days_since_clean
+        if rows is not None:
+            interval = interval[rows]
+            days_since_clean = days_since_clean[rows]
+        profiles = start_loss[:, interval] + \
+            days_since_clean * run_slope[:, interval]
+        return profiles.T
+
+    def to_frame(self, reps=None, start=None, end=None):
+        '''
+        Calculate daily soiling ratios as a DataFrame with one column per
+        realization.
+
+        Parameters
+        ----------
+        reps : slice or array-like, default None
+            Realizations to calculate. All if None.
+        start, end : str or pandas.Timestamp, default None
+            First and last day to calculate. The first and last day of the
+            profiles if None.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Soiling ratios with the realization numbers as columns
+        '''
+        rows = self.index.slice_indexer(start, end)
+        columns = np.arange(len(self))
+        if reps is not None:
+            columns = columns[reps]
+        return pd.DataFrame(self.to_array(reps, rows), index=self.index[rows],
+                            columns=columns)
+
+
+class OnlineSoilingEstimator():
+    '''
+    Streaming estimator of the soiling ratio and soiling rate, updated one
+    day at a time at constant cost, for real-time monitoring.
+
+    The renormalized daily performance metric is tracked with a Kalman
+    filter of a local linear trend: the state is the performance level and
+    the soiling rate (its slope, per day), both following random walks, and
+    each day's performance metric is a noisy measurement of the level.
+    Cleaning events are detected from the filter innovations, the difference
+    between the measured and predicted level, and/or from precipitation as
+    in :py:class:`SRRAnalysis`. At a cleaning event, the level restarts at
+    the measured value and the soiling rate uncertainty is reset. Gaps in
+    the data longer than ``max_gap`` days are treated as cleaning events, as
+    outages are in :py:class:`SRRAnalysis`. Assuming perfect cleaning, the
+    soiling ratio is ``1 + days_since_clean * soiling_rate``, as
+    ``calc_info['soiling_ratio_perfect_clean']`` of :py:func:`soiling_srr`.
+
+    Parameters
+    ----------
+    renorm_factor : float, default 1.0
+        The daily performance metric is divided by this value, e.g. the
+        ``calc_info['renormalizing_factor']`` of a previous
+        :py:func:`soiling_srr` analysis of the system.
+    measurement_noise : float, default 1e-4
+        Variance of the daily renormalized performance metric around the
+        soiling ratio.
+    level_noise : float, default 1e-6
+        Daily variance of the random walk of the soiling ratio.
+    slope_noise : float, default 1e-8
+        Daily variance of the random walk of the soiling rate.
+    clean_threshold : float, default 0.02
+        The minimum positive shift in the performance level for a cleaning
+        event to be detected from the performance metric.
+    clean_sigma : float, default 3.0
+        The minimum positive shift for a cleaning event to be detected, in
+        standard deviations of the innovation.
+    clean_criterion : str, {'shift', 'precip_and_shift', 'precip_or_shift', 'precip'} \
+            default 'shift'
+        How cleaning events are detected, as in :py:meth:`SRRAnalysis.run`.
+        With 'precip_and_shift', the precipitation must occur on the day of
+        the shift or the day before, since later days are not yet available.
+    precip_threshold : float, default 0.01
+        The daily precipitation threshold for defining precipitation
+        cleaning events.
+    max_gap : int, default 13
+        The longest gap in the performance metric, in days, that is not
+        treated as a cleaning event.
+    '''
+
+    def __init__(self, renorm_factor=1.0, measurement_noise=1e-4,
+                 level_noise=1e-6, slope_noise=1e-8, clean_threshold=0.02,
+                 clean_sigma=3.0, clean_criterion='shift', precip_threshold=0.01,
+                 max_gap=13):
+        if clean_criterion not in ('precip_and_shift', 'precip_or_shift',
+                                   'precip', 'shift'):
+            raise ValueError('clean_criterion must be one of '
+                             '{"precip_and_shift", "precip_or_shift", '
+                             '"precip", "shift"}')
+        self.renorm_factor = renorm_factor
+        self.measurement_noise = measurement_noise
+        self.process_noise = np.diag([level_noise, slope_noise])
+        self.clean_threshold = clean_threshold
+        self.clean_sigma = clean_sigma
+        self.clean_criterion = clean_criterion
+        self.precip_threshold = precip_threshold
+        self.max_gap = max_gap
+
+        self.state = None  # performance level and soiling rate
+        self.covariance = None
+        self.last_date = None  # last day processed
+        self.days_since_clean = 0
+        self.gap = 0  # days since the last valid performance metric
+        self.previous_precip_event = False
+        self.insolation_sum = 0.0
+        self.soiling_insolation_sum = 0.0
+
+    def update(self, energy_normalized_daily, insolation_daily,
+               precipitation_daily=None):
+        '''
+        Process the data of the next days and return the estimates of each.
+
+        Parameters
+        ----------
+        energy_normalized_daily : pandas.Series
+            Daily performance metric of consecutive days following those
+            already processed. Missing values are allowed.
+        insolation_daily : pandas.Series
+            Daily plane-of-array insolation corresponding to
+            `energy_normalized_daily`. Arbitrary units.
+        precipitation_daily : pandas.Series, default None
+            Daily total precipitation corresponding to
+            `energy_normalized_daily`. Ignored if
+            ``clean_criterion='shift'``.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Indexed like `energy_normalized_daily`, with columns
+
+            * 'performance_level' - estimated renormalized performance
+              metric
+            * 'soiling_ratio' - estimated soiling ratio
+            * 'soiling_ratio_std' - standard deviation of 'soiling_ratio'
+            * 'soiling_rate' - estimated soiling rate, in day^−1
+            * 'soiling_rate_std' - standard deviation of 'soiling_rate'
+            * 'days_since_clean' - days since the last cleaning event
+            * 'clean_event' - whether a cleaning event was detected
+            * 'insolation_weighted_soiling_ratio' - insolation-weighted
+              average of 'soiling_ratio' over all days processed so far
+
+            The estimates are NaN before the first valid performance metric.
+        '''
+        index = energy_normalized_daily.index
+        steps = np.diff(index.values)
+        first_step = None if self.last_date is None or not len(index) \
+            else index[0] - self.last_date
+        if np.any(steps != np.timedelta64(1, 'D')) or \
+                first_step not in (None, pd.Timedelta('1d')):
+            raise ValueError('Data passed to update must be consecutive days '
+                             'following the days already processed')
+
+        pm = energy_normalized_daily.values / self.renorm_factor
+        insol = insolation_daily.reindex(index).values
+        precip_event = np.zeros(len(index), dtype=bool)
+        if precipitation_daily is not None:
+            precip_event = \
+                precipitation_daily.reindex(index).values > self.precip_threshold
+
+        out = np.full((len(index), 8), np.nan)
+        for i in range(len(index)):
+            out[i] = self._step(pm[i], insol[i], precip_event[i])
+        if len(index):
+            self.last_date = index[-1]
+
+        out = pd.DataFrame(out, index=index,
+                           columns=['performance_level', 'soiling_ratio',
+                                    'soiling_ratio_std', 'soiling_rate',
+                                    'soiling_rate_std', 'days_since_clean',
+                                    'clean_event',
+                                    'insolation_weighted_soiling_ratio'])
+        out['clean_event'] = out['clean_event'] == 1
+        return out
+
+    def _step(self, pm, insol, precip_event):
+        '''
+        Processes one day, returning the values of a row of :py:meth:`update`.
+        '''
+        R = self.measurement_noise
+        clean = False
+        if self.state is None:
+            if np.isnan(pm):
+                return [np.nan] * 8
+            self.state = np.array([pm, 0.0])
+            self.covariance = np.diag([R, R])
+        else:
+            # predict
+            F = np.array([[1.0, 1.0], [0.0, 1.0]])
+            self.state = F @ self.state
+            self.covariance = F @ self.covariance @ F.T + self.process_noise
+            self.days_since_clean += 1
+
+            if np.isnan(pm):
+                self.gap += 1
+            else:
+                innovation = pm - self.state[0]
+                variance = self.covariance[0, 0] + R
+                shift = (innovation > self.clean_threshold and
+                         innovation > self.clean_sigma * np.sqrt(variance))
+                if self.clean_criterion == 'shift':
+                    clean = shift
+                elif self.clean_criterion == 'precip':
+                    clean = precip_event
+                elif self.clean_criterion == 'precip_or_shift':
+                    clean = shift or precip_event
+                else:
+                    clean = shift and (precip_event or
+                                       self.previous_precip_event)
+                clean = clean or self.gap > self.max_gap
+                self.gap = 0
+
+                if clean:
+                    self.state[0] = pm
+                    self.covariance = np.diag([R, R])
+                    self.days_since_clean = 0
+                else:
+                    gain = self.covariance[:, 0] / variance
+                    self.state = self.state + gain * innovation
+                    self.covariance = self.covariance - \
+                        np.outer(gain, self.covariance[0])
+        self.previous_precip_event = precip_event
+
+        days = self.days_since_clean
+        soiling_ratio = 1 + days * self.state[1]
+        slope_std = np.sqrt(self.covariance[1, 1])
+
+        # Days without insolation carry no weight
+        if not np.isnan(insol):
+            self.insolation_sum += insol
+            self.soiling_insolation_sum += soiling_ratio * insol
+        iwsr = np.nan
+        if self.insolation_sum > 0:
+            iwsr = self.soiling_insolation_sum / self.insolation_sum
+        return [self.state[0], soiling_ratio, days * slope_std, self.state[1],
+                slope_std, days, clean, iwsr]
+
 
 def soiling_srr(energy_normalized_daily, insolation_daily, reps=1000,
                 precipitation_daily=None, day_scale=13, clean_threshold='infer',
                 trim=False, method='half_norm_clean',
                 clean_criterion='shift', precip_threshold=0.01, min_interval_length=7,
                 exceedance_prob=95.0, confidence_level=68.2, recenter=True,
-                max_relative_slope_error=500.0, max_negative_step=0.05, outlier_factor=1.5):
+                max_relative_slope_error=500.0, max_negative_step=0.05, outlier_factor=1.5,
+                engine='loop', store_profiles=True, n_jobs=1, seed=None, batch_size=100,
+                convergence_tol=None, profile_format='list', profile_dir=None,
+                rollup_periods=None, daily_percentiles=None):
     '''
     Functional wrapper for :py:class:`~rdtools.soiling.SRRAnalysis`. Perform
     the stochastic rate and recovery soiling loss calculation. Based on the
@@ -749,6 +1951,73 @@ def soiling_srr(energy_normalized_daily, insolation_daily, reps=1000,
         The factor used in the Tukey fence definition of outliers for flagging positive shifts
         in the rolling median used for cleaning detection. A smaller value will cause more and
         smaller shifts to be classified as cleaning events.
+    engine : str, {'loop', 'vectorized'}, default 'loop'
+        How to compute the Monte Carlo realizations.
+
+        * 'loop' - calculate each realization in turn
+        * 'vectorized' - draw the random parameters of all realizations
+          at once and calculate them with array operations. Much faster
+          for large ``reps``. Results are statistically equivalent to,
+          but not numerically identical with, those of 'loop' for a
+          given random seed.
+    store_profiles : bool, default True
+        Whether to keep the daily soiling profile of every realization.
+        If False, ``calc_info['stochastic_soiling_profiles']`` is None and
+        each realization is reduced to its insolation-weighted soiling
+        ratio from per-interval insolation sums, without materializing
+        the daily profile. This is much faster and lighter for large
+        ``reps`` and always uses the 'vectorized' engine.
+    n_jobs : int, default 1
+        Number of worker threads calculating batches of realizations
+        concurrently. Values other than 1 use the 'vectorized' engine.
+    seed : None, int or numpy.random.SeedSequence, default None
+        Seed for the Monte Carlo. If given, the realizations are split into
+        batches of ``batch_size``, each drawn from an independent generator
+        spawned from ``seed``, so results are reproducible and identical for
+        any ``n_jobs``. Uses the 'vectorized' engine. If None, the global
+        numpy random state is used.
+    batch_size : int, default 100
+        Number of realizations per batch when ``seed``, ``convergence_tol``
+        or ``n_jobs`` other than 1 is given.
+    convergence_tol : float, default None
+        If given, ``reps`` becomes the maximum number of realizations.
+        Realizations are calculated in batches of ``batch_size`` until the
+        P50, the confidence interval bounds and the exceedance level all
+        change by less than ``convergence_tol`` from one batch to the next.
+        The achieved number of realizations and the estimates after each
+        batch are reported in ``calc_info``. Uses the 'vectorized' engine.
+    profile_format : str, {'list', 'array', 'lazy'}, default 'list'
+        How to return ``calc_info['stochastic_soiling_profiles']``.
+
+        * 'list' - a list of pandas Series, one per realization
+        * 'array' - a single pandas DataFrame with one float32 column per
+          realization, sharing one daily index. Much lighter for large
+          ``reps``.
+        * 'lazy' - a :py:class:`StochasticSoilingProfiles` storing only the
+          random soiling rate and starting soiling ratio of each interval
+          and realization, from which daily profiles are calculated on
+          demand. With the 'vectorized' engine no daily profiles are
+          materialized during the Monte Carlo, and the soiling ratios are
+          calculated as with ``store_profiles=False``.
+    profile_dir : str, default None
+        With ``profile_format='array'``, store the profiles in a
+        ``numpy.memmap`` file created in this directory instead of in
+        memory. The file belongs to the caller: it is not deleted
+        automatically, and its path is returned as
+        ``calc_info['profile_file']``.
+    rollup_periods : list, default None
+        Periods over which to aggregate the insolation-weighted soiling ratio
+        of every realization, each ``'year'``, ``'quarter'``, ``'month'`` or
+        an array-like of bin edges as in
+        :py:func:`rdtools.soiling.annual_soiling_ratios`. The period sums are
+        accumulated as the realizations are calculated, so the profiles need
+        not be stored (see ``store_profiles``).
+    daily_percentiles : list of float, default None
+        Percentiles (e.g. ``[5, 50, 95]``) of the daily soiling ratio across
+        realizations to estimate. They are estimated as the realizations are
+        calculated with the P-square algorithm (Jain and Chlamtac 1985),
+        without storing the profiles, and are exact for five realizations or
+        fewer.
 
     Returns
     -------
@@ -764,10 +2033,29 @@ def soiling_srr(energy_normalized_daily, insolation_daily, reps=1000,
           was outperformed with probability of exceedance_prob
         * 'stochastic_soiling_profiles' - List of Pandas series
           corresponding to the Monte Carlo realizations of soiling ratio
-          profiles
+          profiles, a Pandas dataframe with one column per realization if
+          ``profile_format='array'``, or a StochasticSoilingProfiles if
+          ``profile_format='lazy'``. None if ``store_profiles=False``.
         * 'soiling_ratio_perfect_clean' - Pandas series of the soiling
           ratio during valid soiling intervals assuming perfect cleaning
           and P50 slopes
+        * 'profile_file' - Path of the file backing
+          'stochastic_soiling_profiles'. Only if ``profile_dir`` is given.
+        * 'reps' - Number of realizations calculated. Only if
+          ``convergence_tol`` is given.
+        * 'convergence_trace' - Pandas dataframe of the number of
+          realizations ('reps') and the resulting 'soiling_ratio_median',
+          'soiling_ratio_low', 'soiling_ratio_high' and 'exceedance_level'
+          after each batch. Only if ``convergence_tol`` is given.
+        * 'period_soiling_ratios' - List of Pandas dataframes, one for each
+          entry of ``rollup_periods``, of the median and confidence interval
+          of the insolation-weighted soiling ratio in each period, formatted
+          as the output of :py:func:`rdtools.soiling.annual_soiling_ratios`.
+          Only if ``rollup_periods`` is given.
+        * 'daily_soiling_ratio_percentiles' - Pandas dataframe of the
+          estimated percentiles of the daily soiling ratio, with one column
+          per entry of ``daily_percentiles``. Only if ``daily_percentiles``
+          is given.
         * 'soiling_interval_summary' - Pandas dataframe summarizing the
           soiling intervals identified. The columns of the dataframe are
           as follows:
@@ -821,25 +2109,929 @@ def soiling_srr(energy_normalized_daily, insolation_daily, reps=1000,
         recenter=recenter,
         max_relative_slope_error=max_relative_slope_error,
         max_negative_step=max_negative_step,
-        outlier_factor=outlier_factor)
+        outlier_factor=outlier_factor,
+        engine=engine,
+        store_profiles=store_profiles,
+        n_jobs=n_jobs,
+        seed=seed,
+        batch_size=batch_size,
+        convergence_tol=convergence_tol,
+        profile_format=profile_format,
+        profile_dir=profile_dir,
+        rollup_periods=rollup_periods,
+        daily_percentiles=daily_percentiles)
 
     return sr, sr_ci, soiling_info
 
 
-def _count_month_days(start, end):
-    '''Return a dict of number of days between start and end
-    (inclusive) in each month'''
-    days = pd.date_range(start, end)
-    months = [x.month for x in days]
-    out_dict = {}
-    for month in range(1, 13):
-        out_dict[month] = months.count(month)
+def soiling_srr_multi(energy_normalized_daily, insolation_daily,
+                      precipitation_daily=None, n_jobs=1, **kwargs):
+    '''
+    Perform the stochastic rate and recovery soiling loss calculation of
+    :py:func:`soiling_srr` for many systems sharing a daily calendar.
+
+    The daily dataframes, rolling medians and cleaning detection of all the
+    systems are calculated together with column-wise operations. The
+    soiling interval fits and Monte Carlo of the systems are then calculated
+    concurrently. Given a ``seed``, the result of each system is identical
+    to that of :py:func:`soiling_srr` on its column with the same
+    parameters, and all systems share the same random numbers.
+
+    Parameters
+    ----------
+    energy_normalized_daily : pandas.DataFrame
+        Daily performance metric with one column per system. See
+        :py:func:`soiling_srr`.
+    insolation_daily : pandas.DataFrame or pandas.Series
+        Daily plane-of-array insolation with the same columns as
+        `energy_normalized_daily`, or a Series shared by all systems.
+    precipitation_daily : pandas.DataFrame or pandas.Series, default None
+        Daily total precipitation with the same columns as
+        `energy_normalized_daily`, or a Series shared by all systems.
+    n_jobs : int, default 1
+        Number of systems analyzed concurrently in worker threads. The
+        Monte Carlo of each system runs in a single thread. Without a
+        ``seed``, the systems share the global numpy random state, so their
+        results then depend on the order in which the threads run.
+    **kwargs
+        Other parameters of :py:func:`soiling_srr`, shared by all systems.
+        ``store_profiles`` defaults to False.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        One row per system, indexed by the columns of
+        `energy_normalized_daily`, with the P50 insolation-weighted soiling
+        ratio ('soiling_ratio'), its confidence interval
+        ('soiling_ratio_low' and 'soiling_ratio_high') and the
+        'exceedance_level'. The results are NaN for systems without data or
+        valid soiling intervals.
+    calc_info : dict
+        Maps each system to the ``calc_info`` of :py:func:`soiling_srr`, or
+        to None if its results are NaN.
+    '''
+    defaults = {name: parameter.default for name, parameter in
+                inspect.signature(SRRAnalysis.run).parameters.items()
+                if name != 'self'}
+    for name in kwargs:
+        if name not in defaults:
+            raise ValueError(f'{name} is not a parameter of soiling_srr')
+    config = dict(defaults, store_profiles=False)
+    config.update(kwargs)
+    config['n_jobs'] = 1
+
+    pm = energy_normalized_daily
+    _check_daily_frequency(pm, insolation_daily, precipitation_daily)
+
+    def as_frame(data):
+        if data is None:
+            return None
+        if isinstance(data, pd.Series):
+            data = pd.concat([data] * len(pm.columns), axis=1, keys=pm.columns)
+        elif not data.columns.equals(pm.columns):
+            raise ValueError('insolation_daily and precipitation_daily must '
+                             'have the same columns as energy_normalized_daily')
+        return data.reindex(pm.index)
+
+    insol = as_frame(insolation_daily)
+    precip = as_frame(precipitation_daily)
+
+    _warn_even_day_scale(config['day_scale'], config['clean_criterion'])
+    spans, renorm, roll_med, delta, outage = _calc_daily_bases(
+        pm, config['day_scale'], config['recenter'])
+
+    # cleaning detection of every system at once
+    clean_threshold = config['clean_threshold']
+    if clean_threshold == 'infer':
+        has_data = np.array([span is not None for span in spans])
+        clean_threshold = np.full(len(spans), np.nan)
+        clean_threshold[has_data] = _infer_clean_threshold(
+            delta[:, has_data], config['outlier_factor'])
+    with np.errstate(invalid='ignore'):
+        detected = delta > clean_threshold
+        if precip is None:
+            precip_event = np.zeros(pm.shape, dtype=bool)
+        else:
+            precip_event = precip.values > config['precip_threshold']
+
+    def calc_system(k):
+        if spans[k] is None:
+            return [np.nan] * 4, None
+        rows = slice(*spans[k])
+        column = pm.columns[k]
+        srr = SRRAnalysis(
+            pm.iloc[:, k], insolation_daily[column]
+            if isinstance(insolation_daily, pd.DataFrame) else insolation_daily,
+            None if precipitation_daily is None else
+            precipitation_daily[column]
+            if isinstance(precipitation_daily, pd.DataFrame)
+            else precipitation_daily)
+
+        df = pd.DataFrame({'pi': pm.iloc[rows, k],
+                           'insol': insol.iloc[rows, k]})
+        if precip is None:
+            df['precip'] = 0
+        else:
+            df['precip'] = precip.iloc[rows, k]
+        df['day'] = range(len(df))
+        df['pi_norm'] = df['pi'] / renorm[k]
+        df['pi_roll_med'] = roll_med[rows, k]
+        df['delta'] = delta[rows, k]
+        srr._delta = df['delta'].values
+        srr.renorm_factor = renorm[k]
+        srr.daily_df = _label_intervals(
+            df, detected[rows, k], precip_event[rows, k],
+            config['clean_criterion'],
+            pd.Series(outage[rows, k], index=df.index))
+        srr._run_kwargs = config
+        try:
+            sr, sr_ci, calc_info = srr._calc_from_daily_df(config)
+        except NoValidIntervalError:
+            return [np.nan] * 4, None
+        return [sr, sr_ci[0], sr_ci[1], calc_info['exceedance_level']], \
+            calc_info
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        systems = list(pool.map(calc_system, range(len(pm.columns))))
+
+    results = pd.DataFrame([result for result, _ in systems],
+                           index=pm.columns,
+                           columns=['soiling_ratio', 'soiling_ratio_low',
+                                    'soiling_ratio_high', 'exceedance_level'])
+    calc_info = {column: info for column, (_, info) in
+                 zip(pm.columns, systems)}
+    return results, calc_info
+
+
+def _check_daily_frequency(energy_normalized_daily, insolation_daily,
+                           precipitation_daily):
+    '''
+    Raise an error if any of the SRRAnalysis input series is not daily.
+    '''
+    if pd.infer_freq(energy_normalized_daily.index) != 'D':
+        raise ValueError('Daily performance metric series must have '
+                         'daily frequency')
+
+    if pd.infer_freq(insolation_daily.index) != 'D':
+        raise ValueError('Daily insolation series must have '
+                         'daily frequency')
+
+    if precipitation_daily is not None:
+        if pd.infer_freq(precipitation_daily.index) != 'D':
+            raise ValueError('Precipitation series must have '
+                             'daily frequency')
+
+
+def _warn_even_day_scale(day_scale, clean_criterion):
+    '''
+    Warn that an even ``day_scale`` can flag consecutive cleaning events.
+    '''
+    if (day_scale % 2 == 0) and ('shift' in clean_criterion):
+        warnings.warn('An even value of day_scale was passed. An odd value is '
+                      'recommended, otherwise, consecutive days may be erroneously '
+                      'flagged as cleaning events. '
+                      'See https://github.com/NREL/rdtools/issues/189')
+
+
+def _calc_rolling_median(df, day_scale):
+    '''
+    Adds the rolling median of the normalized performance metric ('pi_roll_med')
+    and its daily change ('delta') to a daily dataframe, and finds the
+    beginning and ends of outages longer than ``day_scale``.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Daily dataframe with column 'pi_norm'. Modified in place.
+    day_scale : int
+        The number of days in the rolling median and the longest
+        gap in the data that is filled before it is taken.
+
+    Returns
+    -------
+    pandas.Series
+        Boolean series, True on the first and last day of data around each
+        outage.
+    '''
+    # Find the beginning and ends of outages longer than dayscale
+    bfill = df['pi_norm'].fillna(method='bfill', limit=day_scale)
+    ffill = df['pi_norm'].fillna(method='ffill', limit=day_scale)
+    out_start = (~df['pi_norm'].isnull() & bfill.shift(-1).isnull())
+    out_end = (~df['pi_norm'].isnull() & ffill.shift(1).isnull())
+
+    # clean up the first and last elements
+    out_start.iloc[-1] = False
+    out_end.iloc[0] = False
+
+    # Make a forward filled copy, just for use in
+    # step, slope change detection
+    df_ffill = df.fillna(method='ffill', limit=day_scale).copy()
+
+    # Calculate rolling median
+    df['pi_roll_med'] = \
+        df_ffill.pi_norm.rolling(day_scale, center=True).median()
+    df['delta'] = df.pi_roll_med.diff()
+
+    return out_start | out_end
+
+
+def _infer_clean_threshold(delta, outlier_factor):
+    '''
+    The Tukey fence of the absolute rolling median shifts ``delta``, used as
+    the cleaning detection threshold with ``clean_threshold='infer'``. For a
+    2-D ``delta``, the fence of each column. Missing values are ignored.
+    '''
+    deltas = np.abs(np.asarray(delta, dtype=float))
+    q25, q75 = np.nanquantile(deltas, [0.25, 0.75], axis=0)
+    return q75 + outlier_factor * (q75 - q25)
+
+
+def _calc_daily_bases(energy_normalized_daily, day_scale, recenter):
+    '''
+    Column-wise equivalent of :py:meth:`SRRAnalysis._calc_daily_base` for
+    the daily performance metric of many systems sharing a calendar.
+
+    Each column is analyzed from its first to its last valid value, as in
+    :py:meth:`SRRAnalysis._join_daily`. Values outside this span are NaN
+    (or False) in the returned arrays.
+
+    Parameters
+    ----------
+    energy_normalized_daily : pandas.DataFrame
+        Daily performance metric with one column per system.
+    day_scale : int
+        See :py:meth:`SRRAnalysis._calc_daily_df`.
+    recenter : bool
+        See :py:meth:`SRRAnalysis._calc_daily_df`.
+
+    Returns
+    -------
+    spans : list
+        (first, last + 1) rows of the span of each column, None for columns
+        without valid values
+    renorm : numpy.ndarray
+        The renormalization factor of each column
+    roll_med : numpy.ndarray
+        Rolling median of the normalized performance metric
+    delta : numpy.ndarray
+        Daily change of ``roll_med``
+    outage : numpy.ndarray
+        Boolean, True on the first and last day of data around each outage
+    '''
+    index = energy_normalized_daily.index
+    pi = energy_normalized_daily.values.astype(float)
+    n_days, n_systems = pi.shape
+    valid = ~np.isnan(pi)
+    has_data = valid.any(axis=0)
+    first = np.argmax(valid, axis=0)
+    last = n_days - 1 - np.argmax(valid[::-1], axis=0)
+    columns = np.arange(n_systems)
+    spans = [(first[k], last[k] + 1) if has_data[k] else None
+             for k in columns]
+
+    # Recenter to median of first year, as in YoY degradation
+    renorm = np.ones(n_systems)
+    if recenter and has_data.any():
+        year_end = index.searchsorted(
+            index[first[has_data]] + pd.Timedelta('364d'), side='right')
+        rows = np.arange(n_days)[:, np.newaxis]
+        first_year = (rows >= first[has_data]) & (rows < year_end)
+        renorm[has_data] = np.nanmedian(
+            np.where(first_year, pi[:, has_data], np.nan), axis=0)
+    pi_norm = pd.DataFrame(pi / renorm, index=index)
+
+    # Find the beginning and ends of outages longer than dayscale
+    bfill = pi_norm.fillna(method='bfill', limit=day_scale)
+    ffill = pi_norm.fillna(method='ffill', limit=day_scale)
+    out_start = (valid & bfill.shift(-1).isnull().values)
+    out_end = (valid & ffill.shift(1).isnull().values)
+    out_start[last, columns] = False
+    out_end[first, columns] = False
+
+    # Rolling median of the forward filled metric, within each span only
+    after_last = np.arange(n_days)[:, np.newaxis] > last
+    ffill = ffill.mask(after_last)
+    roll_med = ffill.rolling(day_scale, center=True).median()
+    delta = roll_med.diff()
+
+    return spans, renorm, roll_med.values, delta.values, out_start | out_end
+
+
+def _label_intervals(df, clean_event_detected, precip_event, clean_criterion,
+                     outage):
+    '''
+    Identifies the cleaning events and soiling intervals of a daily dataframe.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Daily dataframe from :py:meth:`SRRAnalysis._calc_daily_base`
+    clean_event_detected : pandas.Series or numpy.ndarray
+        Boolean, whether a shift in the rolling median exceeds the cleaning
+        threshold on each day
+    precip_event : pandas.Series or numpy.ndarray
+        Boolean, whether the precipitation exceeds the precipitation
+        threshold on each day
+    clean_criterion : str
+        See :py:meth:`SRRAnalysis._calc_daily_df`
+    outage : pandas.Series
+        Output of :py:func:`_calc_rolling_median`, whose days are always
+        cleaning events.
+
+    Returns
+    -------
+    pandas.DataFrame
+        ``df`` with the 'clean_event_detected', 'clean_event' and 'run'
+        columns added and missing values filled with zero
+    '''
+    df['clean_event_detected'] = clean_event_detected
+    precip_event = pd.Series(precip_event, index=df.index)
+
+    if clean_criterion == 'precip_and_shift':
+        # Detect which cleaning events are associated with rain
+        # within a 3 day window
+        precip_event = (precip_event |
+                        precip_event.shift(1).fillna(False).astype(bool) |
+                        precip_event.shift(-1).fillna(False).astype(bool))
+        df['clean_event'] = (df['clean_event_detected'] & precip_event)
+    elif clean_criterion == 'precip_or_shift':
+        df['clean_event'] = (df['clean_event_detected'] | precip_event)
+    elif clean_criterion == 'precip':
+        df['clean_event'] = precip_event
+    elif clean_criterion == 'shift':
+        df['clean_event'] = df['clean_event_detected']
+    else:
+        raise ValueError('clean_criterion must be one of '
+                         '{"precip_and_shift", "precip_or_shift", '
+                         '"precip", "shift"}')
+
+    df['clean_event'] = df.clean_event | outage
+
+    df = df.fillna(0)
+
+    # Give an index to each soiling interval/run
+    df['run'] = df.clean_event.cumsum()
+    df.index.name = 'date'  # this gets used by name
+    return df
+
+
+def _batch_generators(seed, n_batches):
+    '''
+    Return a list of ``n_batches`` independent random generators spawned
+    from ``seed``. If ``seed`` is None, the entropy is drawn from the global
+    numpy random state so that ``np.random.seed`` still controls the result.
+    '''
+    if seed is None:
+        seed = np.random.randint(np.iinfo(np.int32).max)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(s) for s in seed.spawn(n_batches)]
+
+
+class _SoilingRollups():
+    '''
+    Accumulates period soiling ratios and daily soiling ratio percentiles of
+    SRR Monte Carlo realizations as they are calculated.
+
+    Within a soiling interval the daily soiling ratio is ``start_loss +
+    days_since_clean * run_slope``, so the insolation-weighted sum of a
+    realization over the days of an interval falling in a period is
+    ``start_loss * insol_sum + run_slope * insol_days_sum`` with sums over
+    those days. Only these (intervals, periods) sums and the (reps, periods)
+    period sums are stored.
 
-    return out_dict
+    Parameters
+    ----------
+    srr : SRRAnalysis
+        Analysis with ``analyzed_daily_df`` and ``result_df`` calculated.
+    periods : list or None
+        Periods accepted by :py:func:`annual_soiling_ratios`.
+    percentiles : list of float or None
+        Percentiles of the daily soiling ratio to estimate.
+    '''
+
+    def __init__(self, srr, periods=None, percentiles=None):
+        df = srr.analyzed_daily_df
+        self.index = df.index
+        self.interval = pd.Index(srr.result_df['run']).get_indexer(df['run'])
+        self.days_since_clean = df['days_since_clean'].values
+        n_intervals = len(srr.result_df)
+        insol = np.nan_to_num(df['insol'].values)
+
+        self.periods = []
+        insol_sums = []
+        insol_days_sums = []
+        for period in (periods or []):
+            codes, labels, label_name = _rollup_periods(df.index, period)
+            keep = codes >= 0
+            present, codes = np.unique(codes[keep], return_inverse=True)
+            n_periods = len(present)
+            cell = self.interval[keep] * n_periods + codes
+            shape = (n_intervals, n_periods)
+            insol_sums.append(np.bincount(
+                cell, weights=insol[keep],
+                minlength=n_intervals * n_periods).reshape(shape))
+            insol_days_sums.append(np.bincount(
+                cell, weights=insol[keep] * self.days_since_clean[keep],
+                minlength=n_intervals * n_periods).reshape(shape))
+            self.periods.append((labels[present], label_name, n_periods))
+        self.insol_sum = np.hstack(insol_sums or [np.empty((n_intervals, 0))])
+        self.insol_days_sum = np.hstack(
+            insol_days_sums or [np.empty((n_intervals, 0))])
+        self.period_sums = []
+
+        self.percentiles = None
+        self.daily = percentiles is not None
+        if self.daily:
+            percentiles = np.asarray(percentiles, dtype=float)
+            if np.any((percentiles < 0) | (percentiles > 100)):
+                raise ValueError('daily_percentiles must be between 0 and 100')
+            self.percentiles = _RunningPercentiles(percentiles, len(df))
+
+    def add(self, run_slope, start_loss, profiles=None):
+        '''
+        Adds realizations from their (reps, intervals) random parameters and,
+        if available, their (reps, days) daily profiles.
+        '''
+        self.period_sums.append(start_loss @ self.insol_sum +
+                                run_slope @ self.insol_days_sum)
+        if self.daily:
+            if profiles is None:
+                profiles = start_loss[:, self.interval] + \
+                    self.days_since_clean * run_slope[:, self.interval]
+            for profile in profiles:
+                self.percentiles.update(profile)
+
+    def period_soiling_ratios(self, confidence_level):
+        '''
+        Returns a DataFrame per period, formatted as the output of
+        :py:func:`annual_soiling_ratios`.
+        '''
+        sums = np.concatenate(self.period_sums)
+        weights = self.insol_sum.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iwsr = sums / weights
+        quantiles = [0.5, 0.5 - confidence_level/2/100,
+                     0.5 + confidence_level/2/100]
+
+        out = []
+        start = 0
+        for labels, label_name, n_periods in self.periods:
+            ratios = np.quantile(iwsr[:, start:start + n_periods], quantiles,
+                                 axis=0).T
+            frame = pd.DataFrame(ratios, columns=['soiling_ratio_median',
+                                                  'soiling_ratio_low',
+                                                  'soiling_ratio_high'])
+            frame.insert(0, label_name, labels)
+            out.append(frame)
+            start += n_periods
+        return out
+
+    def daily_soiling_ratio_percentiles(self):
+        '''
+        Returns a DataFrame of the estimated daily soiling ratio percentiles.
+        '''
+        return pd.DataFrame(self.percentiles.estimate(), index=self.index,
+                            columns=list(self.percentiles.percentiles))
+
+
+class _RunningPercentiles():
+    '''
+    P-square estimates (Jain and Chlamtac 1985) of percentiles of many
+    streams of observations at once, in constant memory.
+
+    Each of the ``size`` streams has five markers per percentile, whose
+    heights approximate the percentile and the quantiles half way to the
+    minimum and maximum. Each observation moves the markers, with piecewise
+    parabolic interpolation of the marker heights.
+
+    Parameters
+    ----------
+    percentiles : numpy.ndarray
+        Percentiles to estimate, between 0 and 100.
+    size : int
+        Number of streams, observed together.
+    '''
+
+    def __init__(self, percentiles, size):
+        self.percentiles = percentiles
+        p = percentiles[:, np.newaxis] / 100
+        zero = np.zeros_like(p)
+        # desired marker positions and their increments per observation
+        self.desired = np.stack([zero, 2 * p, 4 * p, 2 + 2 * p, zero + 4])
+        self.increment = np.stack([zero, p / 2, p, (1 + p) / 2, zero + 1])
+        self.size = size
+        self.first = []
+
+    def update(self, x):
+        '''
+        Adds one observation of each stream, an array of length ``size``.
+        '''
+        if len(self.first) < 5:
+            self.first.append(x)
+            if len(self.first) == 5:
+                shape = (5, len(self.percentiles), self.size)
+                self.heights = np.broadcast_to(
+                    np.sort(self.first, axis=0)[:, np.newaxis], shape).copy()
+                self.positions = np.broadcast_to(
+                    np.arange(5.0)[:, np.newaxis, np.newaxis], shape).copy()
+            return
+
+        q = self.heights
+        n = self.positions
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+        # cell k of the observation, q[k] <= x < q[k + 1]
+        k = (q[1] <= x).astype(int) + (q[2] <= x) + (q[3] <= x)
+        for i in range(1, 5):
+            n[i] += k < i
+        self.desired = self.desired + self.increment
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i in range(1, 4):
+                d = self.desired[i] - n[i]
+                move = (((d >= 1) & (n[i + 1] - n[i] > 1)) |
+                        ((d <= -1) & (n[i - 1] - n[i] < -1)))
+                if not move.any():
+                    continue
+                d = np.sign(d)
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) /
+                    (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) /
+                    (n[i] - n[i - 1]))
+                neighbor_q = np.where(d > 0, q[i + 1], q[i - 1])
+                neighbor_n = np.where(d > 0, n[i + 1], n[i - 1])
+                linear = q[i] + d * (neighbor_q - q[i]) / (neighbor_n - n[i])
+                inside = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+                q[i] = np.where(move, np.where(inside, parabolic, linear),
+                                q[i])
+                n[i] += np.where(move, d, 0)
+
+    def estimate(self):
+        '''
+        Returns the (size, percentiles) array of estimates. The estimates of
+        each percentile are independent, so they are made non-decreasing in
+        the percentile.
+        '''
+        if not self.first:
+            return np.full((self.size, len(self.percentiles)), np.nan)
+        if len(self.first) < 5:
+            return np.percentile(self.first, self.percentiles, axis=0).T
+        estimate = self.heights[2].T.copy()
+        order = np.argsort(self.percentiles)
+        estimate[:, order] = np.maximum.accumulate(estimate[:, order], axis=1)
+        return estimate
+
+
+# Segments with more points than this are fit by randomized selection in
+# _theil_sen rather than by enumerating every pair of points
+_THEIL_SEN_MAX_ENUMERATED = 2000
+
+
+def _theil_sen(y, x, bounds, alpha=0.95):
+    '''
+    Theil-Sen estimator of a batch of segments, equivalent to calling
+    :py:func:`scipy.stats.theilslopes` on each segment.
+
+    Segments with up to ``_THEIL_SEN_MAX_ENUMERATED`` points are fit
+    together by enumerating all pairs of points, which reproduces
+    :py:func:`scipy.stats.theilslopes` exactly. For longer segments the
+    required order statistics of the pairwise slopes are found without
+    enumerating the pairs by randomized bracketing and bisection, counting
+    the slopes below a candidate value in O(n log^2 n) at each of up to
+    about 60 bisection steps per order statistic. This reproduces
+    :py:func:`scipy.stats.theilslopes` to floating point precision.
+
+    Parameters
+    ----------
+    y : numpy.ndarray
+        Concatenated dependent variable of all segments
+    x : numpy.ndarray
+        Concatenated independent variable of all segments
+    bounds : numpy.ndarray
+        Position of the first point of each segment in ``y`` and ``x``,
+        followed by ``len(y)``
+    alpha : float, default 0.95
+        Confidence degree of the slope confidence interval
+
+    Returns
+    -------
+    slope : numpy.ndarray
+        Theil-Sen slope of each segment
+    intercept : numpy.ndarray
+        Intercept of each segment
+    low_slope : numpy.ndarray
+        Lower bound of the confidence interval of each slope
+    high_slope : numpy.ndarray
+        Upper bound of the confidence interval of each slope
+    '''
+    from scipy.stats import norm
+
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    bounds = np.asarray(bounds)
+    n_points = np.diff(bounds)
+    segment = np.repeat(np.arange(len(n_points)), n_points)
+
+    median_y, ties_y = _segment_median_ties(y, segment, bounds)
+    median_x, ties_x = _segment_median_ties(x, segment, bounds)
+
+    # number of pairs with distinct x, and positions in the sorted pairwise
+    # slopes of the median and confidence interval bounds (Sen 1968)
+    n_pairs = n_points * (n_points - 1) // 2 - ties_x[1]
+    if alpha > 0.5:
+        alpha = 1. - alpha
+    z = norm.ppf(alpha / 2.)
+    sigsq = 1/18. * (n_points * (n_points - 1) * (2 * n_points + 5) -
+                     ties_x[0] - ties_y[0])
+    with np.errstate(invalid='ignore'):
+        sigma = np.sqrt(sigsq)
+        rank_high = np.minimum(np.round((n_pairs - z * sigma) / 2.), n_pairs - 1)
+        rank_low = np.maximum(np.round((n_pairs + z * sigma) / 2.) - 1, 0)
+    ci_defined = np.isfinite(sigma) & (n_pairs > 0) & (rank_high >= 0)
+    rank_high = np.where(ci_defined, rank_high, 0).astype(int)
+    rank_low = np.where(ci_defined, rank_low, 0).astype(int)
+    rank_median = (n_pairs - 1) // 2, n_pairs // 2
+
+    ranks = np.stack([rank_median[0], rank_median[1], rank_low, rank_high],
+                     axis=1)
+    order_stats = np.full(ranks.shape, np.nan)
+
+    enumerated = np.flatnonzero(n_points <= _THEIL_SEN_MAX_ENUMERATED)
+    for segments in _split_by_pair_count(enumerated, n_points, 2**22):
+        order_stats[segments] = _theil_sen_enumerate(
+            y, x, bounds, segments, ranks[segments])
+
+    rng = np.random.default_rng(0)
+    for i in np.flatnonzero(n_points > _THEIL_SEN_MAX_ENUMERATED):
+        points = slice(bounds[i], bounds[i + 1])
+        order_stats[i] = _theil_sen_select(y[points], x[points], ranks[i],
+                                           rng)
+
+    slope = np.where(rank_median[0] == rank_median[1], order_stats[:, 0],
+                     (order_stats[:, 0] + order_stats[:, 1]) / 2)
+    slope = np.where(n_pairs > 0, slope, np.nan)
+    intercept = median_y - slope * median_x
+    low_slope = np.where(ci_defined, order_stats[:, 2], np.nan)
+    high_slope = np.where(ci_defined, order_stats[:, 3], np.nan)
+
+    return slope, intercept, low_slope, high_slope
+
+
+def _segment_median_ties(values, segment, bounds):
+    '''
+    Median of each segment of ``values``, and the tie statistics of each
+    segment: the sum of k*(k-1)*(2k+5) and of k*(k-1)/2 over groups of k
+    repeated values.
+    '''
+    values = values[np.lexsort((values, segment))]
+    n_points = np.diff(bounds)
+    lower = values[bounds[:-1] + (n_points - 1) // 2]
+    upper = values[bounds[:-1] + n_points // 2]
+    median = np.where(n_points % 2 == 1, lower, (lower + upper) / 2)
+
+    change = np.ones(len(values), dtype=bool)
+    change[1:] = (values[1:] != values[:-1]) | (segment[1:] != segment[:-1])
+    group_start = np.flatnonzero(change)
+    k = np.diff(np.append(group_start, len(values)))
+    group_segment = segment[group_start]
+    ties = np.zeros((2, len(n_points)), dtype=np.int64)
+    np.add.at(ties[0], group_segment, k * (k - 1) * (2 * k + 5))
+    np.add.at(ties[1], group_segment, k * (k - 1) // 2)
+
+    return median, ties
+
+
+def _split_by_pair_count(segments, n_points, max_pairs):
+    '''
+    Split ``segments`` into consecutive groups of at most ``max_pairs``
+    pairs of points, or of a single segment.
+    '''
+    pairs = np.cumsum(n_points[segments] * (n_points[segments] - 1) // 2)
+    group = pairs // max_pairs
+    for g in np.unique(group):
+        yield segments[group == g]
+
+
+def _theil_sen_enumerate(y, x, bounds, segments, ranks):
+    '''
+    Order statistics ``ranks`` of the pairwise slopes of ``segments``,
+    found by enumerating all pairs of points.
+    '''
+    pair_i = []
+    pair_j = []
+    pair_segment = []
+    for k, i in enumerate(segments):
+        first, second = np.triu_indices(bounds[i + 1] - bounds[i], 1)
+        pair_i.append(first + bounds[i])
+        pair_j.append(second + bounds[i])
+        pair_segment.append(np.full(len(first), k))
+    pair_i = np.concatenate(pair_i)
+    pair_j = np.concatenate(pair_j)
+    pair_segment = np.concatenate(pair_segment)
+
+    delta_x = x[pair_j] - x[pair_i]
+    distinct = delta_x != 0
+    slopes = (y[pair_j] - y[pair_i])[distinct] / delta_x[distinct]
+    pair_segment = pair_segment[distinct]
+
+    if len(slopes) == 0:
+        return np.full(ranks.shape, np.nan)
+    slopes = slopes[np.lexsort((slopes, pair_segment))]
+    counts = np.bincount(pair_segment, minlength=len(segments))
+    positions = (np.cumsum(counts) - counts)[:, np.newaxis] + ranks
+    return slopes[np.clip(positions, 0, len(slopes) - 1)]
+
+
+def _theil_sen_select(y, x, ranks, rng):
+    '''
+    Order statistics ``ranks`` of the pairwise slopes of one segment, found
+    without enumerating the pairs. Initial brackets come from the sorted
+    slopes of a random sample of pairs and are narrowed by bisection on
+    the number of pairwise slopes at or below the midpoint.
+
+    Each count costs O(n log^2 n), and the bisection continues until the
+    bracket cannot be split in floating point, typically about 60 steps, so
+    each order statistic costs about 60 O(n log^2 n) counts. This is only
+    worthwhile over enumerating the O(n^2) pairs for long segments, so it
+    is used above ``_THEIL_SEN_MAX_ENUMERATED`` points.
+    '''
+    order = np.argsort(x, kind='stable')
+    x = x[order]
+    y = y[order]
+    _, x_counts = np.unique(x, return_counts=True)
+    tied_pairs = np.sum(x_counts * (x_counts - 1) // 2)
+    n_pairs = len(x) * (len(x) - 1) // 2 - tied_pairs
+
+    def count_at_or_below(t):
+        # slope_ij <= t for x_i < x_j  <=>  y_j - t*x_j <= y_i - t*x_i.
+        # Within tied x, order by decreasing u so every tied pair counts.
+        u = y - t * x
+        u_rank = np.unique(u, return_inverse=True)[1]
+        u_rank = u_rank[np.lexsort((-u_rank, x))]
+        return count_non_increasing_pairs(u_rank) - tied_pairs
+
+    limit = np.ptp(y) / np.diff(np.unique(x)).min() + 1
+
+    sample_i = rng.integers(0, len(x), size=20 * len(x))
+    sample_j = rng.integers(0, len(x), size=20 * len(x))
+    delta_x = x[sample_j] - x[sample_i]
+    distinct = delta_x != 0
+    sample = np.sort((y[sample_j] - y[sample_i])[distinct] / delta_x[distinct])
+    margin = 3 * np.sqrt(len(sample))
+
+    order_stats = []
+    for rank in ranks:
+        position = (rank + 0.5) / n_pairs * len(sample)
+        low = int(np.floor(position - margin))
+        high = int(np.ceil(position + margin))
+        low = sample[low] if low >= 0 else -limit
+        high = sample[high] if high < len(sample) else limit
+        if count_at_or_below(low) > rank:
+            low = -limit
+        if count_at_or_below(high) <= rank:
+            high = limit
+
+        # the rank-th slope is in (low, high]
+        while True:
+            middle = low + (high - low) / 2
+            if not low < middle < high:
+                break
+            if count_at_or_below(middle) > rank:
+                high = middle
+            else:
+                low = middle
+        order_stats.append(high)
+
+    return order_stats
+
+
+def _month_overlap_days(start, end):
+    """
+    Count the days between ``start`` and ``end`` (inclusive) falling in
+    each calendar month.
+
+    Parameters
+    ----------
+    start, end : pandas.Series
+        Interval start and end timestamps.
+
+    Returns
+    -------
+    numpy.ndarray
+        Integer array of shape ``(len(start), 12)``; column ``m`` holds the
+        number of days in month ``m + 1``.
+    """
+    start = pd.DatetimeIndex(start)
+    end = pd.DatetimeIndex(end)
+    if start.tz is not None:
+        start = start.tz_localize(None)
+        end = end.tz_localize(None)
+    counts = np.zeros((len(start), 12), dtype=int)
+    if len(start) == 0:
+        return counts
+
+    # the days counted are start + k days, as with pd.date_range
+    start_day = start.values.astype('datetime64[D]')
+    n_days = (end - start).days.values + 1
+    end_day = start_day + np.maximum(n_days - 1, -1)
+
+    # every calendar month spanned by the data, as day ordinals
+    months = np.arange(start_day.min().astype('datetime64[M]'),
+                       end_day.max().astype('datetime64[M]') + 2)
+    bounds = months.astype('datetime64[D]')
+    lower = np.maximum(start_day[:, None], bounds[None, :-1])
+    upper = np.minimum(end_day[:, None], bounds[None, 1:] - 1)
+    overlap = np.maximum((upper - lower).astype(int) + 1, 0)
+
+    month_of_year = months[:-1].astype(int) % 12
+    for month in range(12):
+        counts[:, month] = overlap[:, month_of_year == month].sum(axis=1)
+    return counts
+
+
+def _uniform_mixture_quantiles(low, high, weights, quantiles):
+    """
+    Exact quantiles of a weighted mixture of uniform distributions.
+
+    The mixture CDF is piecewise linear between the sorted interval
+    endpoints (with jumps at degenerate intervals where ``low == high``), so
+    it is evaluated at those breakpoints with cumulative sums and inverted
+    by linear interpolation.
+
+    Parameters
+    ----------
+    low, high : numpy.ndarray
+        Lower and upper bounds of each uniform component.
+    weights : numpy.ndarray
+        Non-negative component weights of shape ``(len(low), n_mixtures)``.
+    quantiles : array-like
+        Quantiles to compute, between 0 and 1.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape ``(n_mixtures, len(quantiles))``; rows with zero
+        total weight are NaN.
+    """
+    quantiles = np.asarray(quantiles, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    total = weights.sum(axis=0)
+    out = np.full((weights.shape[1], len(quantiles)), np.nan)
+    if len(low) == 0:
+        return out
+
+    low, high = np.minimum(low, high), np.maximum(low, high)
+    width = high - low
+    point = width == 0
+    density = np.zeros_like(weights)
+    density[~point] = weights[~point] / width[~point, None]
+
+    breaks, inverse = np.unique(np.concatenate([low, high]),
+                                return_inverse=True)
+    n_breaks = len(breaks)
+    n = len(low)
+    # slope changes at each breakpoint and jumps from point masses
+    dslope = np.zeros((n_breaks, weights.shape[1]))
+    np.add.at(dslope, inverse[:n], density)
+    np.add.at(dslope, inverse[n:], -density)
+    jump = np.zeros_like(dslope)
+    np.add.at(jump, inverse[:n][point], weights[point])
+
+    slope = np.cumsum(dslope, axis=0)
+    increment = jump.copy()
+    increment[1:] += slope[:-1] * np.diff(breaks)[:, None]
+    cdf = np.cumsum(increment, axis=0)
+    cdf_left = cdf - jump
+
+    # interleave the left limits and values to allow jumps
+    xs = np.repeat(breaks, 2)
+    for k in np.flatnonzero(total > 0):
+        ys = np.empty(2 * n_breaks)
+        ys[0::2] = cdf_left[:, k]
+        ys[1::2] = cdf[:, k]
+        ys = np.maximum.accumulate(np.clip(ys / total[k], 0, 1))
+        ys[-1] = 1
+        idx = np.clip(np.searchsorted(ys, quantiles, side='left'),
+                      1, 2 * n_breaks - 1)
+        y0, y1 = ys[idx - 1], ys[idx]
+        x0, x1 = xs[idx - 1], xs[idx]
+        rise = y1 - y0
+        frac = np.divide(quantiles - y0, rise, out=np.zeros_like(rise),
+                         where=rise > 0)
+        out[k] = x0 + np.clip(frac, 0, 1) * (x1 - x0)
+    return out
+
+
+# annual_soiling_ratios materializes profiles in blocks of roughly this many
+# days (whole periods at a time) to bound memory use
+_ROLLUP_BLOCK_DAYS = 366
 
 
 def annual_soiling_ratios(stochastic_soiling_profiles,
-                          insolation_daily, confidence_level=68.2):
+                          insolation_daily, confidence_level=68.2,
+                          period='year'):
     '''
     Return annualized soiling ratios and associated confidence intervals based
     on stochastic soiling profiles from SRR. Note that each year
@@ -848,8 +3040,11 @@ def annual_soiling_ratios(stochastic_soiling_profiles,
 
     Parameters
     ----------
-    stochastic_soiling_profiles : list
-        List of pd.Series representing profile realizations from the SRR monte carlo.
+    stochastic_soiling_profiles : list, DataFrame, numpy.ndarray or StochasticSoilingProfiles
+        List of pd.Series representing profile realizations from the SRR monte carlo,
+        a DataFrame with one realization per column, a 2-D array of shape
+        ``(days, realizations)`` aligned with ``insolation_daily``, or a
+        :py:class:`StochasticSoilingProfiles`, which is materialized in blocks.
         Typically ``soiling_interval_summary['stochastic_soiling_profiles']`` obtained with
         :py:func:`rdtools.soiling.soiling_srr` or :py:meth:`rdtools.soiling.SRRAnalysis.run`
     insolation_daily : pandas.Series
@@ -858,6 +3053,10 @@ def annual_soiling_ratios(stochastic_soiling_profiles,
         The size of the confidence interval to use in determining the
         upper and lower quantiles reported in the returned DataFrame.
         (The median is always included in the result.)
+    period : {'year', 'quarter', 'month'} or array-like of datetimes, default 'year'
+        The periods over which to aggregate the insolation-weighted soiling
+        ratio. An array-like is interpreted as sorted bin edges; each bin
+        includes its left edge and days outside the edges are ignored.
 
     Returns
     -------
@@ -880,48 +3079,137 @@ def annual_soiling_ratios(stochastic_soiling_profiles,
         |                        | for insolation-weighted soiling ratio for |
         |                        | the year                                  |
         +------------------------+-------------------------------------------+
-    '''
 
-    # Create a df with each realization as a column
-    all_profiles = pd.concat(stochastic_soiling_profiles, axis=1)
-    all_profiles = all_profiles.dropna()
+        When ``period`` is not ``'year'``, the ``'year'`` column is replaced
+        by a ``'period'`` column holding a :py:class:`pandas.Period` for
+        ``'quarter'`` and ``'month'``, or the left bin edge for custom bins.
+    '''
 
-    if not all_profiles.index.isin(insolation_daily.index).all():
+    if isinstance(stochastic_soiling_profiles, StochasticSoilingProfiles):
+        all_index = stochastic_soiling_profiles.index
+        complete = np.ones(len(all_index), dtype=bool)
+
+        def take(rows):
+            return stochastic_soiling_profiles.to_array(rows=rows)
+    else:
+        if isinstance(stochastic_soiling_profiles, np.ndarray):
+            if (stochastic_soiling_profiles.ndim != 2 or
+                    len(stochastic_soiling_profiles) != len(insolation_daily)):
+                raise ValueError('A stochastic_soiling_profiles array must be '
+                                 '2-D with one row per day of insolation_daily')
+            # Use the array as is (it may be memory mapped)
+            profiles = stochastic_soiling_profiles
+            all_index = insolation_daily.index
+        else:
+            if isinstance(stochastic_soiling_profiles, pd.DataFrame):
+                all_profiles = stochastic_soiling_profiles
+            else:
+                # Create a df with each realization as a column
+                all_profiles = pd.concat(stochastic_soiling_profiles, axis=1)
+            # Work on the array (a view for single-dtype frames, such as
+            # memory mapped profiles) rather than copying the frame
+            profiles = all_profiles.values
+            all_index = all_profiles.index
+        complete = ~np.isnan(profiles).any(axis=1)
+
+        def take(rows):
+            return profiles[rows]
+    index = all_index[complete]
+
+    if not index.isin(insolation_daily.index).all():
         warnings.warn(
             'The indexes of stochastic_soiling_profiles are not entirely '
             'contained within the index of insolation_daily. Every day in '
             'stochastic_soiling_profiles should be represented in '
             'insolation_daily. This may cause erroneous results.')
 
-    insolation_daily = insolation_daily.reindex(all_profiles.index)
-
-    # Weight each day by insolation
-    all_profiles_weighted = all_profiles.multiply(insolation_daily, axis=0)
-
-    # Compute the insolation-weighted soiling ratio (IWSR) for each realization
-    annual_insolation = insolation_daily.groupby(
-                        insolation_daily.index.year).sum()
-    all_annual_weighted_sums = all_profiles_weighted.groupby(
-                                all_profiles_weighted.index.year).sum()
-    all_annual_iwsr = all_annual_weighted_sums.multiply(
-                            1/annual_insolation, axis=0)
-
-    annual_soiling = pd.DataFrame({
-        'soiling_ratio_median': all_annual_iwsr.quantile(0.5, axis=1),
-        'soiling_ratio_low': all_annual_iwsr.quantile(
-                            0.5 - confidence_level/2/100, axis=1),
-        'soiling_ratio_high': all_annual_iwsr.quantile(
-                            0.5 + confidence_level/2/100, axis=1),
-    })
-    annual_soiling.index.name = 'year'
-    annual_soiling = annual_soiling.reset_index()
+    codes, labels, label_name = _rollup_periods(index, period)
+    keep = codes >= 0
+    # Days without insolation carry no weight
+    insolation = np.nan_to_num(insolation_daily.reindex(index).values)[keep]
+    order = np.argsort(codes[keep], kind='stable')
+    rows = np.flatnonzero(complete)[keep][order]
+    insolation = insolation[order]
+    codes = codes[keep][order]
+
+    # Compute the insolation-weighted soiling ratio (IWSR) for each
+    # realization with one reduceat per block of whole periods
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    starts = starts[:len(codes)]
+    bounds = np.r_[starts, len(codes)]
+    period_sums = []
+    first = 0
+    while first < len(starts):
+        last = np.searchsorted(bounds, bounds[first] + _ROLLUP_BLOCK_DAYS,
+                               side='right') - 1
+        last = max(last, first + 1)
+        lo, hi = bounds[first], bounds[last]
+        block = take(rows[lo:hi]) * insolation[lo:hi, None]
+        period_sums.append(np.add.reduceat(block, starts[first:last] - lo,
+                                           axis=0))
+        first = last
+
+    quantiles = [0.5, 0.5 - confidence_level/2/100,
+                 0.5 + confidence_level/2/100]
+    if period_sums:
+        weights = np.add.reduceat(insolation, starts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iwsr = np.concatenate(period_sums) / weights[:, None]
+        ratios = np.quantile(iwsr, quantiles, axis=1).T
+    else:
+        ratios = np.empty((0, 3))
+
+    annual_soiling = pd.DataFrame(ratios, columns=['soiling_ratio_median',
+                                                   'soiling_ratio_low',
+                                                   'soiling_ratio_high'])
+    annual_soiling.insert(0, label_name, labels[codes[starts]])
 
     return annual_soiling
 
 
+def _rollup_periods(index, period):
+    '''
+    Assign each day of ``index`` to an annual_soiling_ratios period.
+
+    Returns integer period codes (-1 for days outside custom bins), an array
+    of labels indexed by code, and the name of the label column.
+    '''
+    if isinstance(period, str):
+        year = np.asarray(index.year)
+        if period == 'year':
+            offset = year.min() if len(year) else 0
+            labels = np.arange(offset, year.max() + 1 if len(year) else 0)
+            return year - offset, labels, 'year'
+        elif period in ('quarter', 'month'):
+            per_year = 4 if period == 'quarter' else 12
+            sub = np.asarray(index.month - 1) * per_year // 12
+            codes = year * per_year + sub
+            offset = codes.min() if len(codes) else 0
+            span = np.arange(offset, codes.max() + 1 if len(codes) else 0)
+            if period == 'quarter':
+                labels = pd.PeriodIndex(year=span // 4,
+                                        quarter=span % 4 + 1, freq='Q')
+            else:
+                labels = pd.PeriodIndex(year=span // 12,
+                                        month=span % 12 + 1, freq='M')
+            return codes - offset, np.asarray(labels), 'period'
+        raise ValueError("period must be 'year', 'quarter', 'month' or an "
+                         "array-like of bin edges")
+
+    edges = pd.DatetimeIndex(period)
+    if index.tz is not None and edges.tz is None:
+        edges = edges.tz_localize(index.tz)
+    if not edges.is_monotonic_increasing or len(edges) < 2:
+        raise ValueError('period bin edges must be increasing and contain '
+                         'at least two values')
+    codes = np.searchsorted(edges, index, side='right') - 1
+    codes[codes == len(edges) - 1] = -1
+    return codes, np.asarray(edges[:-1]), 'period'
+
+
 def monthly_soiling_rates(soiling_interval_summary, min_interval_length=14,
                           max_relative_slope_error=500.0, reps=100000,
-                          confidence_level=68.2):
+                          confidence_level=68.2, method='monte_carlo'):
     '''
     Use Monte Carlo to calculate typical monthly soiling rates.
     Samples possible soiling rates from soiling rate confidence
@@ -929,6 +3217,11 @@ def monthly_soiling_rates(soiling_interval_summary, min_interval_length=14,
     distribution. Soiling intervals get samples proportionally
     to their overlap with each calendar month.
 
+    With ``method='exact'`` the sampling is skipped: each month's
+    distribution is the mixture of the interval uniform distributions
+    weighted by their overlap (in days) with the month, and its quantiles
+    are computed exactly from the mixture CDF.
+
     Parameters
     ----------
     soiling_interval_summary : pandas.DataFrame
@@ -951,13 +3244,19 @@ def monthly_soiling_rates(soiling_interval_summary, min_interval_length=14,
         interval to be included in the calculation (percentage).
 
     reps : int, default 100000
-        The number of Monte Carlo samples to take for each month.
+        The number of Monte Carlo samples to take for each month. Ignored
+        when ``method='exact'``.
 
     confidence_level : float, default 68.2
         The size of the confidence interval, as a percentage, to use
         in determining the upper and lower quantiles reported in the
         returned DataFrame. (The median is always included in the result.)
 
+    method : {'monte_carlo', 'exact'}, default 'monte_carlo'
+        ``'monte_carlo'`` samples the monthly distributions.
+        ``'exact'`` computes their quantiles deterministically without
+        sampling.
+
     Returns
     -------
     pandas.DataFrame
@@ -989,6 +3288,9 @@ def monthly_soiling_rates(soiling_interval_summary, min_interval_length=14,
         +-----------------------+--------------------------------------------------+
     '''
 
+    if method not in ('monte_carlo', 'exact'):
+        raise ValueError("method must be 'monte_carlo' or 'exact'")
+
     # filter to intervals of interest
     high = soiling_interval_summary['soiling_rate_high']
     low = soiling_interval_summary['soiling_rate_low']
@@ -1001,13 +3303,21 @@ def monthly_soiling_rates(soiling_interval_summary, min_interval_length=14,
     ].copy()
 
     # count the overlap of each interval with each month
-    month_counts = []
-    for _, row in intervals.iterrows():
-        month_counts.append(_count_month_days(row['start'], row['end']))
+    month_counts = _month_overlap_days(intervals['start'], intervals['end'])
+    ci_quantiles = [0.5 - confidence_level/2/100, 0.5 + confidence_level/2/100]
+
+    if method == 'exact':
+        monthly_rate_data = _uniform_mixture_quantiles(
+            intervals['soiling_rate_low'].values,
+            intervals['soiling_rate_high'].values,
+            month_counts, [0.5, ci_quantiles[0], ci_quantiles[1]])
+        relevant_interval_count = (month_counts > 0).sum(axis=0)
+        return _monthly_soiling_frame(monthly_rate_data,
+                                      relevant_interval_count)
 
     # divy up the monte carlo reps based on overlap
     for month in range(1, 13):
-        days_in_month = np.array([x[month] for x in month_counts])
+        days_in_month = month_counts[:, month - 1]
         sample_col = f'samples_for_month_{month}'
         if days_in_month.sum() > 0:
             intervals[sample_col] = np.ceil(
@@ -1017,7 +3327,6 @@ def monthly_soiling_rates(soiling_interval_summary, min_interval_length=14,
         intervals[sample_col] = intervals[sample_col].astype(int)
 
     # perform the monte carlo month by month
-    ci_quantiles = [0.5 - confidence_level/2/100, 0.5 + confidence_level/2/100]
     monthly_rate_data = []
     relevant_interval_count = []
     for month in range(1, 13):
@@ -1043,7 +3352,11 @@ def monthly_soiling_rates(soiling_interval_summary, min_interval_length=14,
         relevant_interval_count.append(len(relevant_intervals))
     monthly_rate_data = np.array(monthly_rate_data)
 
-    # make a dataframe out of the results
+    return _monthly_soiling_frame(monthly_rate_data, relevant_interval_count)
+
+
+def _monthly_soiling_frame(monthly_rate_data, relevant_interval_count):
+    '''Assemble the monthly_soiling_rates output DataFrame'''
     monthly_soiling_df = pd.DataFrame(data=monthly_rate_data,
                                       columns=['soiling_rate_median',
                                                'soiling_rate_low',
@@ -1052,3 +3365,135 @@ def monthly_soiling_rates(soiling_interval_summary, min_interval_length=14,
     monthly_soiling_df['interval_count'] = relevant_interval_count
 
     return monthly_soiling_df
+
+
+def simulate_cleaning_schedules(monthly_soiling_rates, insolation_daily,
+                                schedules, natural_cleanings=None, reps=1000,
+                                confidence_level=68.2, seed=None):
+    '''
+    Monte Carlo evaluation of manual cleaning schedules from typical monthly
+    soiling rates.
+
+    In each realization, a soiling rate is drawn for every calendar month
+    of ``insolation_daily`` from a normal distribution matching the median
+    and confidence interval of the month in ``monthly_soiling_rates``. The
+    soiling ratio is then ``1 +`` the soiling rates accumulated since the
+    last cleaning, with every cleaning assumed to be perfect. The energy
+    recovered by a schedule is its insolation-weighted soiling ratio gain
+    over soiling with ``natural_cleanings`` only. All the schedules and
+    realizations are evaluated together with a single matrix product, in
+    O((reps + schedules) * days) memory.
+
+    Parameters
+    ----------
+    monthly_soiling_rates : pandas.DataFrame
+        Monthly soiling rate distributions, as returned by
+        :py:func:`monthly_soiling_rates`. Months without a soiling rate
+        use the average median and interval half-widths of the other months.
+    insolation_daily : pandas.Series
+        Daily plane-of-array insolation (or clean energy production) over
+        the simulated period, with DatetimeIndex. Missing values carry no
+        weight. The energy recovered has the same units.
+    schedules : pandas.DataFrame
+        Boolean, with the index of ``insolation_daily`` and one column per
+        schedule, True on the days of manual cleanings.
+    natural_cleanings : array-like of datetimes, default None
+        Days of cleanings common to all schedules, e.g. cleanings by rain
+        from ``soiling_interval_summary['start']`` of a representative year.
+    reps : int, default 1000
+        Number of Monte Carlo realizations
+    confidence_level : float, default 68.2
+        The size of the confidence interval of ``monthly_soiling_rates``, and
+        of the energy recovered in the returned DataFrame, as a percentage.
+    seed : None, int or numpy.random.SeedSequence, default None
+        Seed of the random numbers. If None, they are drawn from the global
+        numpy random state.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per schedule, indexed by the columns of ``schedules``.
+
+        +-------------------------------------+----------------------------------------+
+        | Column Name                         | Description                            |
+        +=====================================+========================================+
+        | 'cleanings'                         | Number of manual cleanings             |
+        +-------------------------------------+----------------------------------------+
+        | 'energy_recovered'                  | Expected insolation-weighted soiling   |
+        |                                     | ratio gain, in the units of            |
+        |                                     | ``insolation_daily``                   |
+        +-------------------------------------+----------------------------------------+
+        | 'energy_recovered_low'              | Lower edge of the confidence interval  |
+        |                                     | of 'energy_recovered'                  |
+        +-------------------------------------+----------------------------------------+
+        | 'energy_recovered_high'             | Upper edge of the confidence interval  |
+        |                                     | of 'energy_recovered'                  |
+        +-------------------------------------+----------------------------------------+
+        | 'insolation_weighted_soiling_ratio' | Expected insolation-weighted soiling   |
+        |                                     | ratio with the schedule                |
+        +-------------------------------------+----------------------------------------+
+    '''
+    from scipy.stats import norm
+
+    if not schedules.index.equals(insolation_daily.index):
+        raise ValueError('schedules must have the index of insolation_daily')
+    index = insolation_daily.index
+    n_days = len(index)
+    insol = np.nan_to_num(insolation_daily.values.astype(float))
+
+    # normal distribution of the soiling rate of each calendar month
+    rates = monthly_soiling_rates.set_index('month').reindex(range(1, 13))
+    z = norm.ppf(0.5 + confidence_level / 2 / 100)
+    median = rates['soiling_rate_median'].values
+    std = (rates['soiling_rate_high'] - rates['soiling_rate_low']).values / 2 / z
+    if np.isnan(median).all():
+        raise ValueError('monthly_soiling_rates has no soiling rates')
+    missing = np.isnan(median) | np.isnan(std)
+    median[missing] = np.nanmean(median[~missing])
+    std[missing] = np.nanmean(std[~missing])
+
+    # soiling rates accumulated since the start on each day of each
+    # realization, drawn independently for every month of the period
+    period = (index.year - index.year[0]) * 12 + index.month - index.month[0]
+    period = np.asarray(period)
+    month = np.asarray(index.month) - 1
+    first_day = np.r_[0, np.flatnonzero(np.diff(period)) + 1]
+    rng = _batch_generators(seed, 1)[0]
+    draws = rng.standard_normal((reps, len(first_day)))
+    daily_rates = median[month] + std[month] * draws[:, period]
+    daily_rates[:, 0] = 0
+    accumulated = np.cumsum(daily_rates, axis=1)
+
+    # The soiling ratio on day t is 1 + accumulated[t] - accumulated[c] for
+    # the last cleaning day c, so the insolation-weighted sum of a schedule
+    # is linear in accumulated: the weight of day c is the insolation of
+    # the days it was the last cleaning for
+    clean = np.asarray(schedules.values, dtype=bool).T
+    natural = np.zeros(n_days, dtype=bool)
+    if natural_cleanings is not None:
+        natural = index.isin(pd.DatetimeIndex(natural_cleanings))
+    clean = np.vstack([clean | natural, natural])
+    days = np.arange(n_days)
+    last_clean = np.maximum.accumulate(np.where(clean, days, 0), axis=1)
+    n_schedules = len(clean)
+    cell = np.arange(n_schedules)[:, np.newaxis] * n_days + last_clean
+    weights = np.bincount(cell.ravel(), weights=np.tile(insol, n_schedules),
+                          minlength=n_schedules * n_days)
+    weights = weights.reshape(n_schedules, n_days)
+
+    soiling_sum = insol.sum() + (accumulated @ insol)[:, np.newaxis] - \
+        accumulated @ weights.T
+    recovered = soiling_sum[:, :-1] - soiling_sum[:, -1:]
+
+    half_ci = confidence_level / 2.0
+    low, high = np.percentile(recovered, [50 - half_ci, 50 + half_ci], axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        iwsr = soiling_sum[:, :-1].mean(axis=0) / insol.sum()
+    return pd.DataFrame({
+        'cleanings': (np.asarray(schedules.values, dtype=bool) &
+                      ~natural[:, np.newaxis]).sum(axis=0),
+        'energy_recovered': recovered.mean(axis=0),
+        'energy_recovered_low': low,
+        'energy_recovered_high': high,
+        'insolation_weighted_soiling_ratio': iwsr,
+    }, index=schedules.columns)
@@ -149,6 +149,18 @@ def test_sensor_analysis_energy(sensor_parameters, sensor_analysis):
     assert [-1, -1] == pytest.approx(ci, abs=1e-2)
 
 
+def test_sensor_analysis_analytic_uncertainty(sensor_parameters):
+    rd_analysis = TrendAnalysis(**sensor_parameters)
+    rd_analysis.sensor_analysis(analyses=['yoy_degradation'],
+                                yoy_kwargs={'uncertainty_method': 'analytic'})
+    yoy_results = rd_analysis.results['sensor']['yoy_degradation']
+    rd = yoy_results['p50_rd']
+    ci = yoy_results['rd_confidence_interval']
+
+    assert -1 == pytest.approx(rd, abs=1e-2)
+    assert [-1, -1] == pytest.approx(ci, abs=1e-2)
+
+
 def test_sensor_analysis_exp_power(sensor_analysis_exp_power):
     yoy_results = sensor_analysis_exp_power.results['sensor']['yoy_degradation']
     rd = yoy_results['p50_rd']
@@ -8,6 +8,12 @@ import numpy as np
 import logging
 
 from rdtools import degradation_ols, degradation_classical_decomposition, degradation_year_on_year
+from rdtools import degradation_year_on_year_multi, IncrementalYearOnYear, degradation_ols_multi
+from rdtools import degradation_year_on_year_rolling
+from rdtools.degradation import _bootstrap_medians, _median_order_statistic_percentiles
+from rdtools.degradation import _mk_test, _centered_moving_average
+from rdtools._ranks import count_non_increasing_pairs
+from rdtools.degradation import _degradation_CI
 
 
 class DegradationTestCase(unittest.TestCase):
@@ -153,6 +159,58 @@ class DegradationTestCase(unittest.TestCase):
             # actual rd is within confidence interval
             self.assertTrue(100.0 * self.rd > r2[1][0] and 100.0 * self.rd < r2[1][1])
 
+    def test_confidence_intervals_analytic(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        for func in [degradation_ols, degradation_classical_decomposition]:
+            for ci in [68.2, 95]:
+                np.random.seed(0)
+                rd, rd_ci, info = func(self.test_corr_energy['D'], confidence_level=ci)
+                rd_a, rd_ci_a, info_a = func(self.test_corr_energy['D'], confidence_level=ci,
+                                             uncertainty_method='analytic')
+                self.assertEqual(rd_a, rd)
+                # close to the Monte Carlo percentiles
+                np.testing.assert_allclose(rd_ci_a, rd_ci, rtol=0.01)
+
+            with self.assertRaises(ValueError):
+                func(self.test_corr_energy['D'], uncertainty_method='bootstrap')
+
+        # unbounded when the intercept is not significantly different from 0
+        np.testing.assert_array_equal(
+            _degradation_CI([0.01, -0.001], np.diag([1.0, 1e-6]), 68.2, method='analytic'),
+            [-np.inf, np.inf])
+
+    def test_degradation_ols_multi(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        energy = self.test_corr_energy['D']
+        systems = pd.DataFrame({'a': energy, 'b': energy.where(energy.index.day != 1),
+                                'c': energy[::-1].values, 'empty': np.nan})
+        results, calc_info = degradation_ols_multi(systems, uncertainty_method='analytic',
+                                                   return_ols_result=True)
+        self.assertEqual(list(results.index), list(systems.columns))
+        self.assertTrue(results.loc['empty'].isnull().all())
+        self.assertIsNone(calc_info['ols_result']['empty'])
+
+        for name in ['a', 'b', 'c']:
+            rd, ci, info = degradation_ols(systems[name].copy(), uncertainty_method='analytic')
+            rd_fast, ci_fast, info_fast = degradation_ols(
+                systems[name].copy(), uncertainty_method='analytic', return_ols_result=False)
+            self.assertNotIn('ols_result', info_fast)
+            self.assertAlmostEqual(results.loc[name, 'rd'], rd, places=10)
+            self.assertAlmostEqual(rd_fast, rd, places=10)
+            np.testing.assert_allclose(results.loc[name, ['rd_low', 'rd_high']], ci, rtol=1e-9)
+            np.testing.assert_allclose(ci_fast, ci, rtol=1e-9)
+            for key in ['slope', 'intercept', 'rmse', 'slope_stderr', 'intercept_stderr']:
+                self.assertAlmostEqual(calc_info[key][name], info[key], places=10)
+                self.assertAlmostEqual(info_fast[key], info[key], places=10)
+            pd.testing.assert_series_equal(calc_info['ols_result'][name].params,
+                                           info['ols_result'].params)
+
     def test_usage_of_points(self):
 
         funcName = sys._getframe().f_code.co_name
@@ -163,6 +221,221 @@ class DegradationTestCase(unittest.TestCase):
             self.test_corr_energy[input_freq])
         self.assertTrue((np.sum(rd_result[2]['usage_of_points'])) == 1462)
 
+    def test_year_on_year_bootstrap_chunks(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        energy = self.test_corr_energy['D']
+        np.random.seed(0)
+        rd, ci, info = degradation_year_on_year(energy)
+        results = [degradation_year_on_year(energy, reps=5000, chunk_size=700, n_jobs=n_jobs,
+                                            seed=1977) for n_jobs in [1, 3]]
+
+        # identical for any number of threads
+        np.testing.assert_array_equal(results[0][1], results[1][1])
+        self.assertEqual(results[0][2]['exceedance_level'],
+                         results[1][2]['exceedance_level'])
+        self.assertEqual(results[0][0], rd)
+        np.testing.assert_allclose(results[0][1], ci, rtol=0.05)
+
+        # a SeedSequence is not consumed
+        seed = np.random.SeedSequence(7)
+        ci1 = degradation_year_on_year(energy, reps=1000, seed=seed)[1]
+        ci2 = degradation_year_on_year(energy, reps=1000, seed=seed)[1]
+        np.testing.assert_array_equal(ci1, ci2)
+
+    def test_bootstrap_medians(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        for n in [1, 10, 11]:
+            values = np.random.default_rng(n).random(n)
+            medians = _bootstrap_medians(values, 25, chunk_size=10, seed=1977)
+            rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(1977).spawn(3)]
+            expected = np.concatenate([
+                np.median(values[rng.integers(0, n, (n, size))], axis=0)
+                for size, rng in zip([10, 10, 5], rngs)])
+            np.testing.assert_array_equal(medians, expected)
+
+    def test_year_on_year_analytic(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        energy = self.test_corr_energy['D']
+        np.random.seed(0)
+        rd, ci, info = degradation_year_on_year(energy, confidence_level=95)
+        rd_a, ci_a, info_a = degradation_year_on_year(
+            energy, confidence_level=95, uncertainty_method='analytic')
+
+        self.assertEqual(rd_a, rd)
+        self.assertTrue(ci_a[0] < rd_a < ci_a[1])
+        # close to the bootstrap percentiles
+        np.testing.assert_allclose(ci_a, ci, rtol=0.05)
+        self.assertAlmostEqual(info_a['exceedance_level'], info['exceedance_level'],
+                               delta=0.05 * abs(info['exceedance_level']))
+
+        with self.assertRaises(ValueError):
+            degradation_year_on_year(energy, uncertainty_method='jackknife')
+
+    def test_median_order_statistic_percentiles(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        for n in [1, 10, 11]:
+            values = np.random.default_rng(n).random(n)
+            result = _median_order_statistic_percentiles(values, [2.5, 50, 97.5])
+            self.assertAlmostEqual(result[1], np.median(values))
+            self.assertTrue(values.min() <= result[0] <= result[1])
+            self.assertTrue(result[1] <= result[2] <= values.max())
+
+        # exact binomial bounds: P(B <= 1) for B ~ Binomial(10, 0.5)
+        values = np.arange(10.0)
+        result = _median_order_statistic_percentiles(values, [100 * 11 / 1024])
+        self.assertAlmostEqual(result[0], 1.0)
+
+        # column-wise for 2-D values
+        values = np.random.default_rng(0).random((11, 3))
+        result = _median_order_statistic_percentiles(values, [15.9, 50, 84.1])
+        for k in range(3):
+            np.testing.assert_allclose(
+                result[:, k], _median_order_statistic_percentiles(values[:, k], [15.9, 50, 84.1]))
+
+    def test_year_on_year_multi(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        energy = self.test_corr_energy['D']
+        systems = pd.DataFrame({'a': energy, 'b': 2 * energy, 'c': energy[::-1].values,
+                                'short': energy.where(energy.index < energy.index[400]),
+                                'empty': np.nan})
+        for method in ['bootstrap', 'analytic']:
+            results, calc_info = degradation_year_on_year_multi(
+                systems, reps=1000, chunk_size=300, seed=1977, uncertainty_method=method)
+            self.assertEqual(list(results.index), list(systems.columns))
+
+            for name in ['a', 'b', 'c']:
+                rd, ci, info = degradation_year_on_year(
+                    systems[name], reps=1000, chunk_size=300, seed=1977,
+                    uncertainty_method=method)
+                self.assertEqual(results.loc[name, 'p50_rd'], rd)
+                np.testing.assert_allclose(results.loc[name, ['rd_low', 'rd_high']], ci,
+                                           rtol=1e-12)
+                self.assertAlmostEqual(results.loc[name, 'exceedance_level'],
+                                       info['exceedance_level'], places=12)
+                pd.testing.assert_series_equal(calc_info['YoY_values'][name].dropna(),
+                                               info['YoY_values'], check_names=False)
+                self.assertEqual(calc_info['renormalizing_factor'][name],
+                                 info['renormalizing_factor'])
+
+            # less than two years of data
+            self.assertTrue(results.loc[['short', 'empty']].isnull().all().all())
+
+        self.assertEqual(calc_info['usage_of_points']['a'].sum(), 1462)
+
+    def test_incremental_year_on_year(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        energy = self.test_corr_energy['D'].copy()
+        energy.iloc[::10] = np.nan
+        incremental = IncrementalYearOnYear()
+
+        rd, ci = incremental.update(energy.iloc[:500])
+        self.assertTrue(np.isnan(rd))
+
+        appended = 500
+        for end in [900, 901, 902, len(energy)]:
+            rd, ci = incremental.update(energy.iloc[appended:end])
+            appended = end
+            info = incremental.calc_info
+            expected = degradation_year_on_year(energy.iloc[:end], uncertainty_method='analytic')
+            self.assertEqual(rd, expected[0])
+            np.testing.assert_array_equal(ci, expected[1])
+            for key in ['renormalizing_factor', 'exceedance_level']:
+                self.assertEqual(info[key], expected[2][key])
+            np.testing.assert_array_equal(info['YoY_values'], expected[2]['YoY_values'])
+            np.testing.assert_array_equal(info['usage_of_points'],
+                                          expected[2]['usage_of_points'])
+
+        # data must follow the data already appended
+        with self.assertRaises(ValueError):
+            incremental.update(energy.iloc[-5:])
+
+    def test_year_on_year_rolling(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        # degradation accelerating from -0.5 %/year to -1 %/year
+        times = pd.date_range('2012-01-01', '2017-12-31', freq='D')
+        rate = np.where(times.year < 2015, -0.005, -0.01) / 365
+        energy = pd.Series(1 + np.cumsum(rate), index=times)
+        energy += np.random.default_rng(0).normal(0, 0.01, len(times))
+        energy.iloc[::10] = np.nan
+        results = degradation_year_on_year_rolling(energy, window=3, step='QS')
+        self.assertEqual(list(results.columns), ['window_end', 'p50_rd', 'rd_low', 'rd_high',
+                                                 'exceedance_level', 'n_pairs'])
+        self.assertTrue(len(results) > 1)
+        self.assertTrue((results.window_end <= energy.index[-1] + pd.Timedelta('1D')).all())
+
+        renorm = degradation_year_on_year(energy)[2]['renormalizing_factor']
+        for window_start, row in results.iterrows():
+            window = energy[(energy.index >= window_start) & (energy.index < row.window_end)]
+            rd, ci, info = degradation_year_on_year(window / renorm, recenter=False,
+                                                    uncertainty_method='analytic')
+            self.assertEqual(row.p50_rd, rd)
+            np.testing.assert_array_equal([row.rd_low, row.rd_high], ci)
+            self.assertEqual(row.exceedance_level, info['exceedance_level'])
+            self.assertEqual(row.n_pairs, len(info['YoY_values']))
+
+        self.assertAlmostEqual(results.p50_rd.iloc[0], -0.5, delta=0.15)
+        self.assertAlmostEqual(results.p50_rd.iloc[-1], -1, delta=0.15)
+
+    def test_mk_test(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        rng = np.random.default_rng(0)
+        for n in [1, 2, 7, 100]:
+            ranks = rng.integers(0, 5, n)
+            expected = sum(ranks[j] >= ranks[k] for j in range(n) for k in range(j + 1, n))
+            self.assertEqual(count_non_increasing_pairs(ranks), expected)
+
+        # S = 4 - 1 with a tied pair, var(S) = (4 * 3 * 13 + 2 * 1 * 9) / 18
+        trend, h, p, z = _mk_test(pd.Series([1.0, 3.0, 2.0, 3.0]))
+        self.assertEqual(trend, 'no trend')
+        self.assertFalse(h)
+        self.assertAlmostEqual(z, 2 / np.sqrt(174 / 18))
+
+        trend, h, p, z = _mk_test(np.arange(50.0))
+        self.assertEqual(trend, 'increasing')
+        self.assertTrue(h)
+
+    def test_centered_moving_average(self):
+
+        funcName = sys._getframe().f_code.co_name
+        logging.debug('Running {}'.format(funcName))
+
+        energy = self.test_corr_energy['W']
+        years = (energy.index - energy.index[0]).days.values / 365.0
+        result = _centered_moving_average(years, energy.values, 1.0)
+
+        expected = []
+        for y in years:
+            if y - 0.5 >= years.min() and y + 0.5 <= years.max():
+                expected.append(energy[(years <= y + 0.5) & (years >= y - 0.5)].mean())
+            else:
+                expected.append(np.nan)
+        np.testing.assert_allclose(result, expected, rtol=1e-12)
+        self.assertTrue(np.isnan(result[0]) and np.isnan(result[-1]))
+
 
 if __name__ == '__main__':
     # Initialize logger when run as a module:
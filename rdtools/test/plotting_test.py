@@ -129,6 +129,29 @@ def test_soiling_monte_carlo_plot_kwargs(soiling_normalized_daily,
     plt.close('all')
 
 
+@pytest.mark.parametrize('profile_format', ['array', 'lazy'])
+def test_soiling_monte_carlo_plot_formats(soiling_normalized_daily,
+                                          soiling_insolation, profile_format):
+    np.random.seed(1977)
+    _, _, soiling_info = soiling_srr(soiling_normalized_daily,
+                                     soiling_insolation, reps=10,
+                                     profile_format=profile_format)
+    result = soiling_monte_carlo_plot(soiling_info, soiling_normalized_daily,
+                                      profiles=5)
+    assert_isinstance(result, plt.Figure)
+    assert len(result.axes[0].lines) == 6
+    plt.close('all')
+
+
+def test_soiling_monte_carlo_plot_no_profiles(soiling_normalized_daily,
+                                              soiling_insolation):
+    _, _, soiling_info = soiling_srr(soiling_normalized_daily,
+                                     soiling_insolation, reps=10,
+                                     store_profiles=False)
+    with pytest.raises(ValueError, match='store_profiles=True'):
+        soiling_monte_carlo_plot(soiling_info, soiling_normalized_daily)
+
+
 def test_soiling_interval_plot(soiling_normalized_daily, soiling_info):
     # test defaults
     result = soiling_interval_plot(soiling_info, soiling_normalized_daily)
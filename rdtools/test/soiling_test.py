@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 import numpy as np
 from rdtools.soiling import soiling_srr
@@ -5,6 +6,10 @@ from rdtools.soiling import SRRAnalysis
 from rdtools.soiling import annual_soiling_ratios
 from rdtools.soiling import monthly_soiling_rates
 from rdtools.soiling import NoValidIntervalError
+from rdtools.soiling import StochasticSoilingProfiles
+from rdtools.soiling import OnlineSoilingEstimator
+from rdtools import soiling
+from scipy.stats import norm, theilslopes
 import pytest
 
 
@@ -157,6 +162,413 @@ def test_soiling_srr_method(soiling_normalized_daily, soiling_insolation, method
         f'Soiling ratio with method="{method}" different from expected value'
 
 
+def test_soiling_srr_vectorized_perfect_clean(soiling_normalized_daily, soiling_insolation):
+    'perfect_clean only draws slopes, in the same order for both engines'
+    np.random.seed(1977)
+    sr, sr_ci, info = soiling_srr(soiling_normalized_daily, soiling_insolation, reps=10,
+                                  method='perfect_clean')
+    np.random.seed(1977)
+    sr_v, sr_ci_v, info_v = soiling_srr(soiling_normalized_daily, soiling_insolation, reps=10,
+                                        method='perfect_clean', engine='vectorized')
+    assert sr == pytest.approx(sr_v, abs=1e-12)
+    assert sr_ci == pytest.approx(sr_ci_v, abs=1e-12)
+    assert len(info_v['stochastic_soiling_profiles']) == 10
+    for profile, profile_v in zip(info['stochastic_soiling_profiles'],
+                                  info_v['stochastic_soiling_profiles']):
+        pd.testing.assert_series_equal(profile, profile_v)
+
+
+@pytest.mark.filterwarnings("ignore:.*20% or more of the daily data.*:UserWarning")
+@pytest.mark.parametrize('method', ['half_norm_clean', 'random_clean', 'perfect_clean'])
+@pytest.mark.parametrize('max_relative_slope_error', [500.0, 20.0])
+def test_soiling_srr_vectorized(soiling_normalized_daily, soiling_insolation, method,
+                                max_relative_slope_error):
+    'The vectorized engine should be statistically equivalent to the loop engine'
+    kwargs = {'reps': 200, 'method': method,
+              'max_relative_slope_error': max_relative_slope_error}
+    np.random.seed(1977)
+    sr, sr_ci, _ = soiling_srr(soiling_normalized_daily, soiling_insolation, **kwargs)
+    np.random.seed(1977)
+    sr_v, sr_ci_v, _ = soiling_srr(soiling_normalized_daily, soiling_insolation,
+                                   engine='vectorized', **kwargs)
+    assert sr == pytest.approx(sr_v, abs=1e-2)
+    assert sr_ci == pytest.approx(sr_ci_v, abs=1e-2)
+
+
+@pytest.mark.filterwarnings("ignore:.*20% or more of the daily data.*:UserWarning")
+@pytest.mark.parametrize('method', ['half_norm_clean', 'random_clean', 'perfect_clean'])
+def test_soiling_srr_no_profiles(soiling_normalized_daily, soiling_insolation, method):
+    'Per-interval sums should reproduce the profile-based soiling ratios'
+    kwargs = {'reps': 10, 'method': method, 'max_relative_slope_error': 45.0,
+              'engine': 'vectorized'}
+    np.random.seed(1977)
+    sr, sr_ci, info = soiling_srr(soiling_normalized_daily, soiling_insolation, **kwargs)
+    np.random.seed(1977)
+    sr_s, sr_ci_s, info_s = soiling_srr(soiling_normalized_daily, soiling_insolation,
+                                        store_profiles=False, **kwargs)
+    assert sr == pytest.approx(sr_s, abs=1e-12)
+    assert sr_ci == pytest.approx(sr_ci_s, abs=1e-12)
+    assert info['exceedance_level'] == pytest.approx(info_s['exceedance_level'], abs=1e-12)
+    assert info_s['stochastic_soiling_profiles'] is None
+
+
+@pytest.mark.parametrize('store_profiles', [True, False])
+def test_soiling_srr_seed_n_jobs(soiling_normalized_daily, soiling_insolation, store_profiles):
+    'Seeded results should not depend on the number of workers'
+    kwargs = {'reps': 25, 'seed': 2022, 'batch_size': 10, 'store_profiles': store_profiles}
+    srr = SRRAnalysis(soiling_normalized_daily, soiling_insolation)
+    sr, sr_ci, info = srr.run(n_jobs=1, **kwargs)
+    losses = srr.monte_losses
+
+    srr_parallel = SRRAnalysis(soiling_normalized_daily, soiling_insolation)
+    sr_p, sr_ci_p, info_p = srr_parallel.run(n_jobs=3, **kwargs)
+
+    assert len(srr_parallel.monte_losses) == 25
+    np.testing.assert_array_equal(losses, srr_parallel.monte_losses)
+    assert sr == sr_p
+    np.testing.assert_array_equal(sr_ci, sr_ci_p)
+    if store_profiles:
+        assert len(info_p['stochastic_soiling_profiles']) == 25
+        for profile, profile_p in zip(info['stochastic_soiling_profiles'],
+                                      info_p['stochastic_soiling_profiles']):
+            pd.testing.assert_series_equal(profile, profile_p)
+
+    _ = srr.run(n_jobs=1, **dict(kwargs, seed=2023))
+    assert not np.array_equal(losses, srr.monte_losses)
+
+
+def test_soiling_srr_convergence(soiling_normalized_daily, soiling_insolation):
+    kwargs = {'reps': 5000, 'seed': 1977, 'batch_size': 50, 'convergence_tol': 1e-3,
+              'store_profiles': False}
+    sr, sr_ci, info = soiling_srr(soiling_normalized_daily, soiling_insolation, **kwargs)
+
+    trace = info['convergence_trace']
+    assert 100 <= info['reps'] < 5000
+    assert info['reps'] == trace['reps'].iloc[-1]
+    assert list(trace.columns) == ['reps', 'soiling_ratio_median', 'soiling_ratio_low',
+                                   'soiling_ratio_high', 'exceedance_level']
+    change = trace.drop(columns='reps').diff().abs().iloc[-1]
+    assert (change < 1e-3).all()
+    assert sr == trace['soiling_ratio_median'].iloc[-1]
+    assert 0.964 == pytest.approx(sr, abs=2e-3)
+
+    # the stopping point does not depend on the number of workers
+    sr_p, _, info_p = soiling_srr(soiling_normalized_daily, soiling_insolation, n_jobs=4,
+                                  **kwargs)
+    assert sr == sr_p
+    pd.testing.assert_frame_equal(trace, info_p['convergence_trace'])
+
+    _, _, info = soiling_srr(soiling_normalized_daily, soiling_insolation, reps=10)
+    assert 'convergence_trace' not in info
+
+
+@pytest.mark.parametrize('engine', ['loop', 'vectorized'])
+def test_soiling_srr_profile_array(soiling_normalized_daily, soiling_insolation, engine):
+    np.random.seed(1977)
+    sr, sr_ci, info = soiling_srr(soiling_normalized_daily, soiling_insolation, reps=10,
+                                  engine=engine)
+    np.random.seed(1977)
+    sr_a, sr_ci_a, info_a = soiling_srr(soiling_normalized_daily, soiling_insolation, reps=10,
+                                        engine=engine, profile_format='array')
+    assert sr_a == sr
+    np.testing.assert_array_equal(sr_ci_a, sr_ci)
+
+    profiles = info_a['stochastic_soiling_profiles']
+    assert isinstance(profiles, pd.DataFrame)
+    assert profiles.shape == (len(soiling_normalized_daily), 10)
+    assert (profiles.dtypes == np.float32).all()
+    expected = pd.concat(info['stochastic_soiling_profiles'], axis=1)
+    np.testing.assert_allclose(profiles.values, expected.values, rtol=1e-6)
+    pd.testing.assert_index_equal(profiles.index, expected.index)
+
+    pd.testing.assert_frame_equal(
+        annual_soiling_ratios(profiles, soiling_insolation),
+        annual_soiling_ratios(info['stochastic_soiling_profiles'], soiling_insolation),
+        check_exact=False, rtol=1e-6)
+
+
+@pytest.mark.parametrize('engine', ['loop', 'vectorized'])
+def test_soiling_srr_profile_lazy(soiling_normalized_daily, soiling_insolation, engine):
+    kwargs = {'reps': 20, 'engine': engine}
+    if engine == 'vectorized':
+        kwargs['seed'] = 1977
+    np.random.seed(1977)
+    sr, _, info = soiling_srr(soiling_normalized_daily, soiling_insolation, **kwargs)
+    np.random.seed(1977)
+    sr_l, _, info_l = soiling_srr(soiling_normalized_daily, soiling_insolation,
+                                  profile_format='lazy', **kwargs)
+    assert sr_l == pytest.approx(sr, abs=1e-12)
+
+    profiles = info['stochastic_soiling_profiles']
+    lazy = info_l['stochastic_soiling_profiles']
+    assert isinstance(lazy, StochasticSoilingProfiles)
+    assert len(lazy) == 20
+    assert lazy.run_slope.shape == (20, len(info['soiling_interval_summary']))
+    for profile, profile_l in zip(profiles, lazy):
+        pd.testing.assert_series_equal(profile_l, profile)
+    pd.testing.assert_series_equal(lazy[-1], profiles[-1])
+
+    # subsets of realizations and days
+    subset = lazy[5:8]
+    assert isinstance(subset, StochasticSoilingProfiles)
+    assert len(subset) == 3
+    window = lazy.to_frame(reps=[2, 7], start='2019-02-01', end='2019-02-10')
+    assert list(window.columns) == [2, 7]
+    expected = pd.concat([profiles[2], profiles[7]], axis=1)['2019-02-01':'2019-02-10']
+    np.testing.assert_array_equal(window.values, expected.values)
+    pd.testing.assert_index_equal(window.index, expected.index)
+
+    pd.testing.assert_frame_equal(annual_soiling_ratios(lazy, soiling_insolation),
+                                  annual_soiling_ratios(profiles, soiling_insolation))
+
+
+def test_soiling_srr_profile_dir(soiling_normalized_daily, soiling_insolation, tmp_path):
+    kwargs = {'reps': 250, 'seed': 1977, 'batch_size': 100}
+    sr, _, info = soiling_srr(soiling_normalized_daily, soiling_insolation,
+                              profile_format='array', **kwargs)
+    sr_m, _, info_m = soiling_srr(soiling_normalized_daily, soiling_insolation,
+                                  profile_format='array', profile_dir=str(tmp_path), **kwargs)
+    assert sr_m == sr
+    pd.testing.assert_frame_equal(info_m['stochastic_soiling_profiles'],
+                                  info['stochastic_soiling_profiles'])
+
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    assert os.path.samefile(info_m['profile_file'], files[0])
+    assert 'profile_file' not in info
+    stored = np.memmap(files[0], dtype=np.float32, mode='r', order='F',
+                       shape=info['stochastic_soiling_profiles'].shape)
+    np.testing.assert_array_equal(stored, info['stochastic_soiling_profiles'].values)
+
+    # stopping early keeps only the realizations calculated
+    for profile_dir in [None, str(tmp_path)]:
+        _, _, info_c = soiling_srr(soiling_normalized_daily, soiling_insolation,
+                                   profile_format='array', profile_dir=profile_dir,
+                                   convergence_tol=1, **kwargs)
+        profiles = info_c['stochastic_soiling_profiles']
+        assert info_c['reps'] == 200
+        assert profiles.shape == (len(soiling_normalized_daily), 200)
+        np.testing.assert_array_equal(profiles.values,
+                                      info['stochastic_soiling_profiles'].values[:, :200])
+    assert os.path.getsize(info_c['profile_file']) == profiles.values.nbytes
+
+    with pytest.raises(ValueError, match="profile_dir requires profile_format='array'"):
+        soiling_srr(soiling_normalized_daily, soiling_insolation, profile_dir=str(tmp_path),
+                    **kwargs)
+    with pytest.raises(ValueError, match='profile_format must be one of'):
+        soiling_srr(soiling_normalized_daily, soiling_insolation, profile_format='frame',
+                    **kwargs)
+
+
+@pytest.mark.parametrize('kwargs', [{'engine': 'loop'},
+                                    {'engine': 'vectorized', 'seed': 1977, 'batch_size': 3},
+                                    {'engine': 'vectorized', 'seed': 1977, 'n_jobs': 2,
+                                     'profile_format': 'array'}])
+def test_soiling_srr_rollups(soiling_normalized_daily, soiling_insolation, kwargs):
+    periods = ['month', pd.to_datetime(['2019-01-01', '2019-02-10', '2019-04-01'])]
+    np.random.seed(1977)
+    sr, sr_ci, info = soiling_srr(soiling_normalized_daily, soiling_insolation, reps=10,
+                                  rollup_periods=periods, daily_percentiles=[5, 50, 95],
+                                  **kwargs)
+    np.random.seed(1977)
+    sr_s, sr_ci_s, info_s = soiling_srr(soiling_normalized_daily, soiling_insolation,
+                                        reps=10, **kwargs)
+    assert sr == sr_s
+    profiles = info_s['stochastic_soiling_profiles']
+
+    assert len(info['period_soiling_ratios']) == 2
+    for period, result in zip(periods, info['period_soiling_ratios']):
+        expected = annual_soiling_ratios(profiles, soiling_insolation, period=period)
+        pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-10)
+
+    percentiles = info['daily_soiling_ratio_percentiles']
+    assert list(percentiles.columns) == [5, 50, 95]
+    if isinstance(profiles, list):
+        profiles = pd.concat(profiles, axis=1)
+    pd.testing.assert_index_equal(percentiles.index, profiles.index)
+    # the running estimates bracket the median within the daily range
+    assert (percentiles[5] <= percentiles[50]).all()
+    assert (percentiles[50] <= percentiles[95]).all()
+    assert (percentiles[5] >= profiles.min(axis=1) - 1e-12).all()
+    assert (percentiles[95] <= profiles.max(axis=1) + 1e-12).all()
+
+
+def test_soiling_srr_rollups_few_reps(soiling_normalized_daily, soiling_insolation):
+    # the daily percentiles are exact for up to five realizations
+    sr, sr_ci, info = soiling_srr(soiling_normalized_daily, soiling_insolation, reps=4,
+                                  engine='vectorized', seed=1977, daily_percentiles=[10, 50],
+                                  store_profiles=True, profile_format='array')
+    profiles = info['stochastic_soiling_profiles']
+    expected = np.percentile(profiles.values.astype(float), [10, 50], axis=1).T
+    np.testing.assert_allclose(info['daily_soiling_ratio_percentiles'].values, expected,
+                               rtol=1e-6)
+    assert 'period_soiling_ratios' not in info
+
+    with pytest.raises(ValueError, match='daily_percentiles must be between 0 and 100'):
+        soiling_srr(soiling_normalized_daily, soiling_insolation, reps=4,
+                    daily_percentiles=[50, 101])
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'clean_criterion': 'precip_and_shift'},
+                                    {'clean_threshold': 0.005, 'recenter': False}])
+def test_soiling_srr_multi(soiling_normalized_daily, soiling_insolation, kwargs):
+    pm = pd.DataFrame({'a': soiling_normalized_daily,
+                       'b': soiling_normalized_daily * 0.98,
+                       'c': soiling_normalized_daily,
+                       'd': np.nan})
+    pm.iloc[:5, 1] = np.nan
+    pm.iloc[30:40, 2] = np.nan
+    precip = pd.Series(0.0, soiling_insolation.index)
+    precip.iloc[[25, 51]] = 0.1
+    kwargs = dict(kwargs, reps=20, seed=1977)
+
+    results, info = soiling.soiling_srr_multi(pm, soiling_insolation, precip, n_jobs=2,
+                                              **kwargs)
+    pd.testing.assert_index_equal(results.index, pm.columns)
+    assert list(results.columns) == ['soiling_ratio', 'soiling_ratio_low',
+                                     'soiling_ratio_high', 'exceedance_level']
+    for system in 'abc':
+        sr, sr_ci, calc_info = soiling_srr(pm[system], soiling_insolation,
+                                           precipitation_daily=precip,
+                                           store_profiles=False, **kwargs)
+        assert results.loc[system, 'soiling_ratio'] == sr
+        np.testing.assert_array_equal(
+            results.loc[system, ['soiling_ratio_low', 'soiling_ratio_high']], sr_ci)
+        assert results.loc[system, 'exceedance_level'] == calc_info['exceedance_level']
+        pd.testing.assert_frame_equal(info[system]['soiling_interval_summary'],
+                                      calc_info['soiling_interval_summary'])
+    assert results.loc['d'].isnull().all()
+    assert info['d'] is None
+
+
+def test_soiling_srr_multi_argument_checks(soiling_normalized_daily, soiling_insolation):
+    pm = pd.DataFrame({'a': soiling_normalized_daily, 'b': soiling_normalized_daily})
+    with pytest.raises(ValueError, match='must have the same columns'):
+        soiling.soiling_srr_multi(pm, pm[['a']], reps=10)
+    with pytest.raises(ValueError, match='n_reps is not a parameter of soiling_srr'):
+        soiling.soiling_srr_multi(pm, soiling_insolation, n_reps=10)
+
+
+def test_running_percentiles():
+    rng = np.random.default_rng(1977)
+    data = rng.standard_normal((5000, 20))
+    running = soiling._RunningPercentiles(np.array([5.0, 50.0, 95.0]), 20)
+    for x in data:
+        running.update(x)
+    expected = np.percentile(data, [5, 50, 95], axis=0).T
+    np.testing.assert_allclose(running.estimate(), expected, atol=0.1)
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'trim': True}, {'clean_threshold': 0.005},
+                                    {'method': 'perfect_clean', 'day_scale': 7}])
+@pytest.mark.parametrize('n_new', [1, 30])
+def test_srr_update(soiling_normalized_daily, soiling_insolation, kwargs, n_new):
+    # two years of data, so that the recentering does not change
+    times = pd.date_range('2019-01-01', periods=750, freq='D', tz='Etc/GMT+7')
+    pm = pd.Series(np.tile(soiling_normalized_daily.values, 10), index=times)
+    insol = pd.Series(np.tile(soiling_insolation.values, 10), index=times)
+    kwargs = dict(kwargs, reps=50, seed=1977, store_profiles=False)
+
+    srr = SRRAnalysis(pm, insol)
+    sr, sr_ci, info = srr.run(**kwargs)
+
+    srr_update = SRRAnalysis(pm[:-n_new], insol[:-n_new])
+    srr_update.run(**kwargs)
+    sr_u, sr_ci_u, info_u = srr_update.update(pm[-n_new:], insol[-n_new:])
+
+    pd.testing.assert_series_equal(srr_update.pm, pm)
+    pd.testing.assert_frame_equal(srr_update.daily_df, srr.daily_df)
+    pd.testing.assert_frame_equal(info_u['soiling_interval_summary'],
+                                  info['soiling_interval_summary'])
+    assert sr_u == sr
+    np.testing.assert_array_equal(sr_ci_u, sr_ci)
+
+
+def test_srr_update_short_history(soiling_normalized_daily, soiling_insolation):
+    # less than a year of data is recentered again from scratch
+    np.random.seed(1977)
+    sr, sr_ci, info = SRRAnalysis(soiling_normalized_daily, soiling_insolation).run(reps=10)
+
+    srr = SRRAnalysis(soiling_normalized_daily[:-5], soiling_insolation[:-5])
+    srr.run(reps=10)
+    np.random.seed(1977)
+    sr_u, sr_ci_u, info_u = srr.update(soiling_normalized_daily[-5:], soiling_insolation[-5:])
+    assert sr_u == sr
+    assert info_u['renormalizing_factor'] == info['renormalizing_factor']
+
+
+def test_srr_update_argument_checks(soiling_normalized_daily, soiling_insolation):
+    srr = SRRAnalysis(soiling_normalized_daily[:-5], soiling_insolation[:-5])
+    with pytest.raises(ValueError, match='run must be called before update'):
+        srr.update(soiling_normalized_daily[-5:], soiling_insolation[-5:])
+
+    srr.run(reps=10)
+    with pytest.raises(ValueError, match='must follow the existing data'):
+        srr.update(soiling_normalized_daily[-10:], soiling_insolation[-10:])
+    with pytest.raises(ValueError, match='must have daily frequency'):
+        srr.update(soiling_normalized_daily[-3:], soiling_insolation[-3:])
+    pd.testing.assert_series_equal(srr.pm, soiling_normalized_daily[:-5])
+
+
+def test_srr_sweep(soiling_normalized_daily, soiling_insolation):
+    parameters = {'day_scale': [11, 13], 'outlier_factor': [1.0, 1.5],
+                  'max_relative_slope_error': [20.0, 500.0]}
+    srr = SRRAnalysis(soiling_normalized_daily, soiling_insolation)
+    with pytest.warns(UserWarning, match='20% or more of the daily data'):
+        sweep = srr.sweep(parameters, n_jobs=2, reps=50, seed=1977)
+
+    assert len(sweep) == 8
+    assert list(sweep.columns) == ['day_scale', 'outlier_factor', 'max_relative_slope_error',
+                                   'soiling_ratio', 'soiling_ratio_low', 'soiling_ratio_high',
+                                   'exceedance_level']
+    for _, row in sweep.iterrows():
+        kwargs = {name: row[name] for name in parameters}
+        kwargs['day_scale'] = int(kwargs['day_scale'])
+        sr, sr_ci, info = soiling_srr(soiling_normalized_daily, soiling_insolation, reps=50,
+                                      seed=1977, store_profiles=False, **kwargs)
+        assert row['soiling_ratio'] == sr
+        assert row['soiling_ratio_low'] == sr_ci[0]
+        assert row['soiling_ratio_high'] == sr_ci[1]
+        assert row['exceedance_level'] == info['exceedance_level']
+
+
+def test_srr_sweep_no_valid_interval(soiling_normalized_daily, soiling_insolation):
+    srr = SRRAnalysis(soiling_normalized_daily, soiling_insolation)
+    sweep = srr.sweep({'min_interval_length': [7, 100]}, reps=10, seed=1977)
+    assert sweep['soiling_ratio'].notnull().tolist() == [True, False]
+
+    with pytest.raises(ValueError, match='not a parameter of SRRAnalysis.run'):
+        srr.sweep({'day_scales': [7, 13]})
+
+
+@pytest.fixture()
+def theil_sen_segments():
+    np.random.seed(1977)
+    segments = []
+    for n, decimals in [(2, 8), (9, 2), (30, 8), (45, 3), (60, 2)]:
+        x = np.arange(n, dtype=float)
+        x[1:3] = 1  # tied x values
+        y = np.round(1 - 0.003 * x + 0.01 * np.random.randn(n), decimals)
+        segments.append((y, x))
+    return segments
+
+
+@pytest.mark.parametrize('max_enumerated', [2000, 10])
+def test_theil_sen(monkeypatch, theil_sen_segments, max_enumerated):
+    'Compare the batched Theil-Sen estimator with scipy, also for long segments'
+    monkeypatch.setattr(soiling, '_THEIL_SEN_MAX_ENUMERATED', max_enumerated)
+    y = np.concatenate([y for y, x in theil_sen_segments])
+    x = np.concatenate([x for y, x in theil_sen_segments])
+    bounds = np.cumsum([0] + [len(y) for y, x in theil_sen_segments])
+
+    result = np.array(soiling._theil_sen(y, x, bounds))
+    expected = np.array([theilslopes(y, x) for y, x in theil_sen_segments]).T
+    if max_enumerated == 2000:
+        np.testing.assert_array_equal(result, expected)
+    else:
+        np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-15)
+
+
 def test_soiling_srr_min_interval_length(soiling_normalized_daily, soiling_insolation):
     'Test that a long minimum interval length prevents finding shorter intervals'
     with pytest.raises(NoValidIntervalError):
@@ -305,6 +717,75 @@ def test_soiling_srr_argument_checks(soiling_normalized_daily, soiling_insolatio
     with pytest.raises(ValueError, match='Invalid method specification'):
         _ = soiling_srr(method='bad', **kwargs)
 
+    with pytest.raises(ValueError, match='Invalid method specification'):
+        _ = soiling_srr(method='bad', engine='vectorized', **kwargs)
+
+    with pytest.raises(ValueError, match='engine must be one of'):
+        _ = soiling_srr(engine='bad', **kwargs)
+
+
+# ##############################
+# OnlineSoilingEstimator tests
+# ##############################
+
+
+def test_online_soiling_estimator(soiling_normalized_daily, soiling_insolation):
+    np.random.seed(1977)
+    sr, sr_ci, info = soiling_srr(soiling_normalized_daily, soiling_insolation, reps=10,
+                                  method='perfect_clean')
+    summary = info['soiling_interval_summary']
+
+    estimator = OnlineSoilingEstimator(renorm_factor=info['renormalizing_factor'])
+    result = estimator.update(soiling_normalized_daily, soiling_insolation)
+    pd.testing.assert_index_equal(result.index, soiling_normalized_daily.index)
+
+    # cleaning events start the SRR soiling intervals
+    pd.testing.assert_index_equal(result.index[result['clean_event']],
+                                  pd.DatetimeIndex(summary['start'].iloc[1:]),
+                                  check_names=False)
+    # the soiling rate at the end of each interval is within the SRR interval
+    ends = result.loc[summary['end'], 'soiling_rate'].values
+    assert (ends >= summary['soiling_rate_low'].values).all()
+    assert (ends <= summary['soiling_rate_high'].values).all()
+
+    np.testing.assert_allclose(result['soiling_ratio'], info['soiling_ratio_perfect_clean'],
+                               atol=0.01)
+    assert result['insolation_weighted_soiling_ratio'].iloc[-1] == pytest.approx(sr, abs=0.002)
+
+
+def test_online_soiling_estimator_incremental(soiling_normalized_daily, soiling_insolation):
+    expected = OnlineSoilingEstimator().update(soiling_normalized_daily, soiling_insolation)
+
+    estimator = OnlineSoilingEstimator()
+    result = pd.concat([estimator.update(soiling_normalized_daily.iloc[i:i + 1],
+                                         soiling_insolation)
+                        for i in range(len(soiling_normalized_daily))])
+    pd.testing.assert_frame_equal(result, expected)
+
+    with pytest.raises(ValueError, match='must be consecutive days'):
+        estimator.update(soiling_normalized_daily.iloc[-3:], soiling_insolation)
+
+
+def test_online_soiling_estimator_precip_and_gaps(soiling_normalized_daily,
+                                                  soiling_insolation):
+    precip = pd.Series(0, index=soiling_insolation.index)
+    precip.iloc[10] = 0.1
+    estimator = OnlineSoilingEstimator(clean_criterion='precip')
+    result = estimator.update(soiling_normalized_daily, soiling_insolation, precip)
+    assert list(np.flatnonzero(result['clean_event'])) == [10]
+
+    # outages longer than max_gap are cleaning events
+    pm = soiling_normalized_daily.copy()
+    pm.iloc[:3] = np.nan
+    pm.iloc[5:15] = np.nan
+    result = OnlineSoilingEstimator(max_gap=5).update(pm, soiling_insolation)
+    assert result['soiling_ratio'].iloc[:3].isnull().all()
+    assert list(np.flatnonzero(result['clean_event'])) == [15, 25, 50]
+    assert result['days_since_clean'].iloc[15] == 0
+
+    with pytest.raises(ValueError, match='clean_criterion must be one of'):
+        OnlineSoilingEstimator(clean_criterion='rain')
+
 
 # ###########################
 # annual_soiling_ratios tests
@@ -363,6 +844,50 @@ def test_annual_soiling_ratios_warning(multi_year_profiles):
         _ = annual_soiling_ratios(srr_profiles, insolation)
 
 
+@pytest.mark.parametrize('period, freq', [('quarter', 'Q'), ('month', 'M')])
+def test_annual_soiling_ratios_period(multi_year_profiles, period, freq):
+    srr_profiles, insolation = multi_year_profiles
+    result = annual_soiling_ratios(srr_profiles, insolation, period=period)
+
+    profiles = pd.concat(srr_profiles, axis=1)
+    insolation = insolation.reindex(profiles.index)
+    key = profiles.index.to_period(freq)
+    weighted = profiles.mul(insolation, axis=0).groupby(key).sum()
+    iwsr = weighted.div(insolation.groupby(key).sum(), axis=0)
+    expected = pd.DataFrame({
+        'period': iwsr.index,
+        'soiling_ratio_median': iwsr.quantile(0.5, axis=1).values,
+        'soiling_ratio_low': iwsr.quantile(0.5 - 0.682/2, axis=1).values,
+        'soiling_ratio_high': iwsr.quantile(0.5 + 0.682/2, axis=1).values,
+    })
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_annual_soiling_ratios_bins(multi_year_profiles):
+    srr_profiles, insolation = multi_year_profiles
+    profiles = pd.concat(srr_profiles, axis=1)
+    # a 2-D array is aligned with insolation_daily
+    insolation = insolation.reindex(profiles.index)
+    edges = pd.to_datetime(['2018-01-01', '2018-07-01', '2019-01-01', '2020-01-01'])
+    result = annual_soiling_ratios(profiles.values, insolation, period=edges)
+
+    assert list(result['period']) == list(edges[:-1])
+    np.testing.assert_allclose(result['soiling_ratio_median'], [4.5, 4.5, 14.5])
+    annual = annual_soiling_ratios(profiles, insolation)
+    pd.testing.assert_frame_equal(result.iloc[[2], 1:].reset_index(drop=True),
+                                  annual.iloc[[1], 1:].reset_index(drop=True))
+
+
+def test_annual_soiling_ratios_invalid_period(multi_year_profiles):
+    srr_profiles, insolation = multi_year_profiles
+    with pytest.raises(ValueError, match="period must be 'year'"):
+        annual_soiling_ratios(srr_profiles, insolation, period='week')
+    with pytest.raises(ValueError, match='bin edges must be increasing'):
+        annual_soiling_ratios(srr_profiles, insolation, period=['2019-01-01'])
+    with pytest.raises(ValueError, match='must be 2-D'):
+        annual_soiling_ratios(np.ones((10, 3)), insolation)
+
+
 # ###########################
 # monthly_soiling_rates tests
 # ###########################
@@ -479,3 +1004,94 @@ def test_monthly_soiling_rates_reps(soiling_interval_summary):
     expected = _build_monthly_summary(expected)
 
     pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('confidence_level', [68.2, 95])
+def test_monthly_soiling_rates_exact(soiling_interval_summary, confidence_level):
+    np.random.seed(1977)
+    sampled = monthly_soiling_rates(soiling_interval_summary, reps=1000000,
+                                    confidence_level=confidence_level)
+    result = monthly_soiling_rates(soiling_interval_summary, method='exact',
+                                   confidence_level=confidence_level)
+
+    pd.testing.assert_frame_equal(result, sampled, check_dtype=False, atol=2e-5)
+
+
+def test_monthly_soiling_rates_exact_point_mass(soiling_interval_summary):
+    # a degenerate interval is a point mass in the monthly distribution
+    summary = soiling_interval_summary.iloc[[0]].copy()
+    summary['soiling_rate_low'] = -0.005
+    summary['soiling_rate_high'] = -0.005
+    result = monthly_soiling_rates(summary, method='exact')
+    assert result.loc[0, 'soiling_rate_median'] == pytest.approx(-0.005)
+    assert result.loc[0, 'soiling_rate_low'] == pytest.approx(-0.005)
+    assert result.loc[0, 'soiling_rate_high'] == pytest.approx(-0.005)
+    assert result['soiling_rate_median'].iloc[1:].isnull().all()
+
+
+def test_monthly_soiling_rates_invalid_method(soiling_interval_summary):
+    with pytest.raises(ValueError, match='method must be'):
+        monthly_soiling_rates(soiling_interval_summary, method='bootstrap')
+
+
+# #################################
+# simulate_cleaning_schedules tests
+# #################################
+
+
+def test_simulate_cleaning_schedules(soiling_interval_summary):
+    monthly = monthly_soiling_rates(soiling_interval_summary, method='exact')
+    times = pd.date_range('2019-01-01', '2019-06-30', freq='D', tz='America/Denver')
+    insolation = pd.Series(np.linspace(5000, 7000, len(times)), times)
+    insolation.iloc[10] = np.nan
+    schedules = pd.DataFrame(False, index=times, columns=['none', 'monthly', 'weekly'])
+    schedules.loc[times.day == 1, 'monthly'] = True
+    schedules.loc[times.dayofweek == 0, 'weekly'] = True
+    natural = times[[40, 100]]
+
+    result = soiling.simulate_cleaning_schedules(monthly, insolation, schedules,
+                                                 natural_cleanings=natural, reps=50,
+                                                 seed=1977)
+    pd.testing.assert_index_equal(result.index, schedules.columns)
+    assert list(result['cleanings']) == [0, 6, 25]
+    assert result.loc['none', 'energy_recovered'] == 0
+    assert 0 < result.loc['monthly', 'energy_recovered'] < \
+        result.loc['weekly', 'energy_recovered']
+    assert (result['energy_recovered_low'] <= result['energy_recovered_high']).all()
+
+    # compare with a day by day simulation using the same random numbers
+    rng = soiling._batch_generators(1977, 1)[0]
+    draws = rng.standard_normal((50, 6))
+    rates = monthly.set_index('month')
+    median = rates['soiling_rate_median'].values
+    std = (rates['soiling_rate_high'] - rates['soiling_rate_low']).values / 2 / \
+        norm.ppf(0.841)
+    median[4:] = median[:4].mean()
+    std[4:] = std[:4].mean()
+    month = times.month.values - 1
+    daily_rates = median[month] + std[month] * draws[:, month]
+    weights = insolation.fillna(0).values
+    for schedule in schedules:
+        clean = schedules[schedule].values | times.isin(natural)
+        totals = []
+        for rep in range(50):
+            ratio = 1 + np.cumsum(np.where(clean, 0, np.r_[0, daily_rates[rep, 1:]]))
+            # reset to 1 at each cleaning
+            last = np.maximum.accumulate(np.where(clean, np.arange(len(times)), 0))
+            ratio = ratio - ratio[last] + 1
+            totals.append(ratio @ weights)
+        expected = np.mean(totals) / weights.sum()
+        assert result.loc[schedule, 'insolation_weighted_soiling_ratio'] == \
+            pytest.approx(expected, rel=1e-4)
+
+
+def test_simulate_cleaning_schedules_errors(soiling_interval_summary):
+    monthly = monthly_soiling_rates(soiling_interval_summary, method='exact')
+    times = pd.date_range('2019-01-01', '2019-02-28', freq='D')
+    insolation = pd.Series(1.0, times)
+    schedules = pd.DataFrame(False, index=times[:-1], columns=['a'])
+    with pytest.raises(ValueError, match='must have the index of insolation_daily'):
+        soiling.simulate_cleaning_schedules(monthly, insolation, schedules)
+    monthly[['soiling_rate_median', 'soiling_rate_low', 'soiling_rate_high']] = np.nan
+    with pytest.raises(ValueError, match='has no soiling rates'):
+        soiling.simulate_cleaning_schedules(monthly, insolation, schedules.reindex(times))